@@ -0,0 +1,36 @@
+"""
+Decode throughput: the dataset's load_video_frames and the sampling decoder.
+"""
+
+import time
+
+from crime_detection import config
+from crime_detection.data.dataset import CrimeVideoDataset
+from crime_detection.data.decoder import VideoDecoder, make_sampler
+
+
+def run(video_path, runs=5, samplings=("head", "uniform", "stride:4", "motion")):
+    results = {}
+
+    dataset = CrimeVideoDataset(root_dir=".", max_frames=config.CLIP_LEN)
+    start = time.perf_counter()
+    for _ in range(runs):
+        dataset.load_video_frames(video_path)
+    elapsed = time.perf_counter() - start
+    results["load_video_frames"] = {
+        "clips_per_s": runs / elapsed,
+        "frames_per_s": runs * config.CLIP_LEN / elapsed,
+    }
+
+    for sampling in samplings:
+        sampler = make_sampler(sampling, config.CLIP_LEN)
+        decoder = VideoDecoder(video_path, size=config.FRAME_SIZE)
+        start = time.perf_counter()
+        for _ in range(runs):
+            decoder.decode(sampler, num_frames=config.CLIP_LEN)
+        elapsed = time.perf_counter() - start
+        results[f"decoder[{sampling}]"] = {
+            "clips_per_s": runs / elapsed,
+            "frames_per_s": runs * config.CLIP_LEN / elapsed,
+        }
+    return results
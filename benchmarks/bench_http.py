@@ -0,0 +1,67 @@
+"""
+End-to-end /predict latency under concurrent load against an in-process uvicorn.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import read_rss_mb, summarize
+
+
+def _start_server(app, port):
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.time() + 120
+    while not server.started:
+        if time.time() > deadline:
+            raise RuntimeError("uvicorn did not start")
+        time.sleep(0.05)
+    return server, thread
+
+
+def run(video_path, concurrency=4, requests_total=32, port=8766, app_path="model_service.main"):
+    import importlib
+    import requests
+
+    # Measure the model rather than the result cache or the job workers
+    os.environ.setdefault("RESULT_CACHE_SIZE", "0")
+    os.environ.setdefault("JOB_WORKERS", "0")
+    app = importlib.import_module(app_path).app
+
+    server, thread = _start_server(app, port)
+    url = f"http://127.0.0.1:{port}/predict"
+    with open(video_path, "rb") as f:
+        payload = f.read()
+
+    def post(_):
+        start = time.perf_counter()
+        response = requests.post(url, files={"file": ("video.mp4", payload, "video/mp4")})
+        return response.status_code, (time.perf_counter() - start) * 1000.0
+
+    try:
+        post(None)  # warm up
+        rss_before = read_rss_mb()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(post, range(requests_total)))
+        elapsed = time.perf_counter() - start
+        rss_after = read_rss_mb()
+    finally:
+        server.should_exit = True
+        thread.join(timeout=30)
+
+    stats = summarize([ms for _, ms in results])
+    stats.update({
+        "concurrency": concurrency,
+        "requests": requests_total,
+        "errors": sum(status != 200 for status, _ in results),
+        "requests_per_s": requests_total / elapsed,
+        "rss_mb_before": rss_before,
+        "rss_mb_after": rss_after,
+    })
+    return stats
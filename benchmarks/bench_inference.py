@@ -0,0 +1,34 @@
+"""
+C3DPretrained forward latency by batch size and intra-op thread count.
+"""
+
+import os
+
+import torch
+
+from benchmarks.common import summarize, time_calls
+from crime_detection import config
+from crime_detection.network.c3d import C3DPretrained
+
+
+def run(batch_sizes=(1, 4, 8, 16), thread_counts=None, runs=5, model=None):
+    cores = os.cpu_count() or 1
+    thread_counts = thread_counts or sorted({1, max(1, cores // 2), cores})
+    model = model or C3DPretrained(num_classes=len(config.CLASS_NAMES)).eval()
+    original_threads = torch.get_num_threads()
+
+    results = []
+    with torch.no_grad():
+        for threads in thread_counts:
+            torch.set_num_threads(threads)
+            for batch_size in batch_sizes:
+                clips = torch.randn(batch_size, 3, config.CLIP_LEN, config.FRAME_SIZE, config.FRAME_SIZE)
+                stats = summarize(time_calls(lambda: model(clips), runs=runs))
+                stats.update({
+                    "threads": threads,
+                    "batch_size": batch_size,
+                    "clips_per_s": batch_size * 1000.0 / stats["mean_ms"],
+                })
+                results.append(stats)
+    torch.set_num_threads(original_threads)
+    return results
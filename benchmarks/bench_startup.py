@@ -0,0 +1,118 @@
+"""
+Cold-start time and per-worker memory of the model service.
+
+Each mode launches the service as a subprocess with several workers and
+records how long it takes until /health first answers (time to first
+response) and until /ready consistently answers 200 (time to ready), then
+the RSS and PSS of every worker. PSS splits shared pages between the
+processes mapping them, so it shows what preloading saves where RSS does not.
+
+- uvicorn: `uvicorn --workers N`, every worker loads its own weights
+- prefork: `python -m crime_detection.prefork`, weights loaded once and shared
+
+    python -m benchmarks.bench_startup --workers 4
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import requests
+
+from benchmarks.common import ROOT, read_pss_mb, read_rss_mb
+
+MODES = ("uvicorn", "prefork")
+
+
+def command(mode, app, port, workers):
+    if mode == "uvicorn":
+        return [sys.executable, "-m", "uvicorn", app, "--port", str(port), "--workers", str(workers),
+                "--log-level", "warning"]
+    if mode == "prefork":
+        return [sys.executable, "-m", "crime_detection.prefork", app, "--port", str(port),
+                "--workers", str(workers), "--log-level", "warning"]
+    raise ValueError(f"Unknown mode {mode}")
+
+
+def child_pids(pid):
+    """Direct children of pid, excluding multiprocessing helper processes."""
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces; fields after it are fixed
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            with open(f"/proc/{entry}/cmdline", "rb") as f:
+                cmdline = f.read()
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid and b"resource_tracker" not in cmdline:
+            children.append(int(entry))
+    return sorted(children)
+
+
+def wait_for(url, accept, deadline, consecutive=1):
+    """Poll url until accept(status) holds for `consecutive` requests in a row; return the time it did."""
+    streak = 0
+    while time.perf_counter() < deadline:
+        try:
+            ok = accept(requests.get(url, timeout=1).status_code)
+        except requests.RequestException:
+            ok = False
+        streak = streak + 1 if ok else 0
+        if streak >= consecutive:
+            return time.perf_counter()
+        time.sleep(0.01)
+    raise RuntimeError(f"{url} did not become available in time")
+
+
+def run_mode(mode, app="model_service.main:app", port=8766, workers=2, timeout=300.0):
+    env = dict(os.environ, PYTHONPATH=ROOT, JOB_WORKERS="0", RESULT_CACHE_SIZE="0", LOG_FORMAT="text")
+    start = time.perf_counter()
+    server = subprocess.Popen(command(mode, app, port, workers), cwd=ROOT, env=env)
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        deadline = start + timeout
+        first_response = wait_for(base_url + "/health", lambda status: status == 200, deadline)
+        # Connections are spread over the workers, so require a streak of ready answers
+        ready = wait_for(base_url + "/ready", lambda status: status == 200, deadline, consecutive=4 * workers)
+
+        worker_pids = child_pids(server.pid)
+        per_worker = [{"rss_mb": read_rss_mb(pid), "pss_mb": read_pss_mb(pid)} for pid in worker_pids]
+        master = {"rss_mb": read_rss_mb(server.pid), "pss_mb": read_pss_mb(server.pid)}
+        pss_values = [item["pss_mb"] for item in per_worker + [master] if item["pss_mb"] is not None]
+        return {
+            "workers": workers,
+            "time_to_first_response_ms": (first_response - start) * 1000.0,
+            "time_to_ready_ms": (ready - start) * 1000.0,
+            "master": master,
+            "per_worker": per_worker,
+            "mean_worker_rss_mb": sum(item["rss_mb"] for item in per_worker) / len(per_worker) if per_worker else None,
+            "total_pss_mb": sum(pss_values) if pss_values else None,
+        }
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def run(modes=MODES, workers=2, port=8766):
+    return {mode: run_mode(mode, port=port, workers=workers) for mode in modes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Service cold start and per-worker memory")
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+    modes = [mode for mode in args.modes.split(",") if mode]
+    print(json.dumps(run(modes, workers=args.workers, port=args.port), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""
+Preprocessing cost: per-frame PIL transforms versus the vectorized clip path.
+"""
+
+import numpy as np
+import torch
+from PIL import Image
+
+from benchmarks.common import summarize, time_calls
+from crime_detection import config
+from crime_detection.utils.video_utils import frames_to_clip
+
+
+def _per_frame(frames):
+    mean = torch.tensor(config.MEAN).view(3, 1, 1)
+    std = torch.tensor(config.STD).view(3, 1, 1)
+    tensors = []
+    for frame in frames:
+        image = Image.fromarray(frame).resize((config.FRAME_SIZE, config.FRAME_SIZE), Image.BILINEAR)
+        tensor = torch.from_numpy(np.asarray(image)).permute(2, 0, 1).float().div(255.0)
+        tensors.append((tensor - mean) / std)
+    return torch.stack(tensors, dim=1)
+
+
+def run(height=240, width=320, runs=20):
+    frames = np.random.default_rng(0).integers(0, 255, size=(config.CLIP_LEN, height, width, 3), dtype=np.uint8)
+    return {
+        "input": [config.CLIP_LEN, height, width, 3],
+        "per_frame_pil": summarize(time_calls(lambda: _per_frame(frames), runs=runs)),
+        "vectorized_clip": summarize(time_calls(lambda: frames_to_clip(frames), runs=runs)),
+    }
@@ -0,0 +1,135 @@
+"""
+Run the benchmark suite and save the results as JSON.
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --stages decode,inference --compare baseline.json
+
+Synthetic videos are generated locally, so no dataset is needed. With
+--compare, every latency metric that regressed by more than --threshold
+relative to the baseline file is listed and the exit status is 1.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+from benchmarks.common import run_metadata
+from benchmarks.synthetic import make_video
+
+STAGES = ("decode", "transform", "inference", "http", "upload", "startup")
+DEFAULT_STAGES = ("decode", "transform", "inference", "http")
+
+
+def run_stage(stage, video_path, args):
+    if stage == "decode":
+        from benchmarks import bench_decode
+        return bench_decode.run(video_path, runs=args.runs)
+    if stage == "transform":
+        from benchmarks import bench_transform
+        return bench_transform.run(height=args.height, width=args.width, runs=args.runs * 4)
+    if stage == "inference":
+        from benchmarks import bench_inference
+        batch_sizes = [int(b) for b in args.batch_sizes.split(",")]
+        threads = [int(t) for t in args.threads.split(",")] if args.threads else None
+        return bench_inference.run(batch_sizes=batch_sizes, thread_counts=threads, runs=args.runs)
+    if stage == "http":
+        from benchmarks import bench_http
+        return bench_http.run(video_path, concurrency=args.concurrency, requests_total=args.requests)
+    if stage == "upload":
+        from benchmarks import upload_memory
+        return upload_memory.run("model_service.main:app", 8765, 0, args.concurrency, args.requests, video_path)
+    if stage == "startup":
+        from benchmarks import bench_startup
+        return bench_startup.run(workers=args.workers)
+    raise ValueError(f"Unknown stage {stage}")
+
+
+def _flatten(prefix, value, out):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            _flatten(f"{prefix}.{key}" if prefix else key, item, out)
+    elif isinstance(value, list):
+        for i, item in enumerate(value):
+            label = i
+            if isinstance(item, dict) and "batch_size" in item:
+                label = f"t{item.get('threads')}_b{item['batch_size']}"
+            _flatten(f"{prefix}[{label}]", item, out)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        out[prefix] = float(value)
+    return out
+
+
+def compare(current, baseline, threshold):
+    """
+    Return the latency metrics (keys ending in _ms) that got slower than
+    baseline by more than threshold (a fraction, e.g. 0.1 for 10%).
+    """
+    now = _flatten("", current["stages"], {})
+    before = _flatten("", baseline.get("stages", {}), {})
+    regressions = []
+    for key, value in sorted(now.items()):
+        if not key.endswith("_ms") or key not in before or before[key] <= 0:
+            continue
+        change = (value - before[key]) / before[key]
+        if change > threshold:
+            regressions.append({"metric": key, "baseline": before[key], "current": value, "change": change})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crime detection benchmark suite")
+    parser.add_argument("--stages", default=",".join(DEFAULT_STAGES), help=f"Comma-separated subset of {STAGES}")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="Baseline results JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed slowdown before flagging")
+    parser.add_argument("--video", help="Use this video instead of a synthetic one")
+    parser.add_argument("--seconds", type=float, default=4.0, help="Synthetic video length")
+    parser.add_argument("--width", type=int, default=320)
+    parser.add_argument("--height", type=int, default=240)
+    parser.add_argument("--fps", type=int, default=25)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--batch-sizes", default="1,4,8,16")
+    parser.add_argument("--threads", help="Comma-separated intra-op thread counts")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=2, help="Server workers for the startup stage")
+    args = parser.parse_args()
+
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    for stage in stages:
+        if stage not in STAGES:
+            parser.error(f"unknown stage {stage!r}")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        video_path = args.video or make_video(
+            os.path.join(workdir, "synthetic.mp4"), seconds=args.seconds, fps=args.fps,
+            width=args.width, height=args.height,
+        )
+        results = {
+            "metadata": run_metadata(),
+            "video": {"path": args.video, "seconds": args.seconds, "width": args.width,
+                      "height": args.height, "fps": args.fps},
+            "stages": {},
+        }
+        for stage in stages:
+            print(f"Running {stage} benchmark...", file=sys.stderr)
+            results["stages"][stage] = run_stage(stage, video_path, args)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for item in regressions:
+            print(f"REGRESSION {item['metric']}: {item['baseline']:.2f} -> {item['current']:.2f} ms "
+                  f"(+{item['change']:.0%})", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Measure server RSS while concurrent clients upload large videos to /predict.
+
+Starts the app under uvicorn in a subprocess, samples its resident memory
+from /proc while the uploads run, and prints the peak RSS growth per
+in-flight request as JSON.
+
+    python benchmarks/upload_memory.py --app model_service.main:app --size-mb 200 --concurrency 4
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def read_rss_mb(pid):
+    """Current resident set size of a process in MB (Linux only)."""
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024.0
+    return 0.0
+
+
+class RssSampler(threading.Thread):
+    def __init__(self, pid, interval=0.01):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0.0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.peak = max(self.peak, read_rss_mb(self.pid))
+            except OSError:
+                break
+            time.sleep(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def wait_until_up(url, timeout=120.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(url, timeout=1).status_code < 500:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not come up")
+
+
+def make_payload(size_mb, path=None):
+    """Return a video to upload, or a file of random bytes of size_mb."""
+    if path:
+        return path
+    handle, payload = tempfile.mkstemp(suffix=".mp4")
+    with os.fdopen(handle, "wb") as f:
+        for _ in range(size_mb):
+            f.write(os.urandom(1 << 20))
+    return payload
+
+
+def upload(url, path):
+    with open(path, "rb") as f:
+        start = time.perf_counter()
+        response = requests.post(url, files={"file": ("video.mp4", f, "video/mp4")})
+        return response.status_code, time.perf_counter() - start
+
+
+def run(app, port, size_mb, concurrency, requests_total, video=None):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    payload = make_payload(size_mb, video)
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        wait_until_up(base_url + "/")
+        baseline = read_rss_mb(server.pid)
+
+        sampler = RssSampler(server.pid)
+        sampler.start()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(lambda _: upload(base_url + "/predict", payload), range(requests_total)))
+        sampler.stop()
+
+        return {
+            "app": app,
+            "upload_mb": round(os.path.getsize(payload) / (1 << 20), 1),
+            "concurrency": concurrency,
+            "requests": requests_total,
+            "status_codes": sorted({status for status, _ in results}),
+            "mean_latency_s": sum(elapsed for _, elapsed in results) / len(results),
+            "baseline_rss_mb": baseline,
+            "peak_rss_mb": sampler.peak,
+            "peak_rss_per_request_mb": (sampler.peak - baseline) / concurrency,
+        }
+    finally:
+        server.terminate()
+        server.wait()
+        if payload != video:
+            os.remove(payload)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak server RSS per concurrent upload")
+    parser.add_argument("--app", default="model_service.main:app")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--size-mb", type=int, default=200, help="Size of the random payload")
+    parser.add_argument("--video", help="Upload this file instead of random bytes")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=8)
+    args = parser.parse_args()
+
+    result = run(args.app, args.port, args.size_mb, args.concurrency, args.requests, args.video)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+
+"""
+Bulk analysis of a directory or manifest of videos.
+
+Videos are decoded in a pool of worker processes; decoded clips flow through
+a bounded number of in-flight futures into batched inference in the main
+process. Each result is appended to a JSON-lines file as soon as its batch
+finishes, so an interrupted run is resumed by simply running it again.
+
+    python -m crime_detection.batch archive/ --output results.jsonl --decode-workers 6 --threads 2
+    python -m crime_detection.batch manifest.txt --output results.jsonl --parquet results.parquet
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from crime_detection import config
+
+logger = logging.getLogger(__name__)
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv")
+
+
+def list_videos(source):
+    """
+    Resolve the input to a sorted list of video paths.
+
+    Args:
+        source: A directory (scanned recursively) or a manifest file with one
+            path per line, or JSON lines carrying a "video" or "path" key.
+            Relative manifest paths are resolved against the manifest's folder.
+    """
+    if os.path.isdir(source):
+        videos = []
+        for root, _, files in os.walk(source):
+            videos.extend(os.path.join(root, name) for name in files if name.lower().endswith(VIDEO_EXTENSIONS))
+        return sorted(videos)
+
+    base = os.path.dirname(os.path.abspath(source))
+    videos = []
+    with open(source) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                entry = json.loads(line)
+                line = entry.get("video") or entry["path"]
+            videos.append(line if os.path.isabs(line) else os.path.join(base, line))
+    return videos
+
+
+def load_done(output_path, retry_failed=False):
+    """
+    Return the videos already recorded in an output file.
+
+    A trailing partial line left by a crash is cut off so new results start on
+    a fresh line, and unreadable lines are skipped.
+
+    Args:
+        output_path: JSON-lines results file
+        retry_failed: Leave out videos whose latest record is an error
+    """
+    if not os.path.exists(output_path):
+        return set()
+    with open(output_path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end != len(data):
+            logger.warning("Dropping a partial trailing record from %s", output_path)
+            f.truncate(end)
+    failed = {}
+    for line in data[:end].splitlines():
+        try:
+            record = json.loads(line)
+            video = record["video"]
+        except (ValueError, KeyError, TypeError):
+            continue
+        failed[video] = bool(record.get("error"))
+    return {video for video, error in failed.items() if not (retry_failed and error)}
+
+
+def _init_decoder(num_threads):
+    import cv2
+    import torch
+
+    # Parallelism comes from the process pool; keep each worker single-threaded
+    cv2.setNumThreads(num_threads)
+    torch.set_num_threads(num_threads)
+
+
+def _decode(video_path, sampling, gate=None):
+    """Decode one clip in a worker process, scoring its motion if a gate is given."""
+    from crime_detection.data.decoder import VideoDecoder, make_sampler
+
+    decoder = VideoDecoder(video_path, size=config.FRAME_SIZE)
+    try:
+        frames = decoder.decode(make_sampler(sampling, config.CLIP_LEN), num_frames=config.CLIP_LEN)
+    except Exception as e:
+        return video_path, None, 0, None, str(e)
+    if decoder.frames_decoded == 0:
+        return video_path, None, 0, None, "Could not decode any frames"
+    activity = gate.activity(frames) if gate is not None else None
+    return video_path, frames, decoder.frame_count, activity, None
+
+
+def run(videos, output_path, registry, decode_workers=None, batch_size=8, queue_size=None,
+        sampling=None, retry_failed=False, log_every=50, gate=None):
+    """
+    Analyze videos and append one JSON line per video to output_path.
+
+    Args:
+        videos: Video paths to analyze
+        output_path: JSON-lines results file, appended to and used for resuming
+        registry: ModelRegistry used for inference
+        decode_workers: Decoder processes, defaults to all but one core
+        batch_size: Clips per forward pass
+        queue_size: Maximum clips decoded or in flight ahead of inference
+        sampling: Frame sampling spec, defaults to config.FRAME_SAMPLING
+        retry_failed: Re-run videos whose previous attempt recorded an error
+        log_every: Log progress every this many videos
+        gate: Optional MotionGate; static clips are recorded as skipped without inference
+
+    Returns:
+        Summary dict with counts and throughput
+    """
+    import torch
+    from crime_detection.utils.video_utils import frames_to_clip
+
+    sampling = sampling or config.FRAME_SAMPLING
+    decode_workers = decode_workers or max(1, (os.cpu_count() or 1) - 1)
+    # A queue smaller than one batch would stall with a partial batch and nothing in flight
+    queue_size = max(queue_size or 2 * batch_size, batch_size)
+
+    done = load_done(output_path, retry_failed=retry_failed)
+    pending = [video for video in videos if video not in done]
+    logger.info("%d videos, %d already done, %d to analyze", len(videos), len(videos) - len(pending), len(pending))
+
+    stats = {"videos": 0, "failed": 0, "skipped": len(videos) - len(pending), "static": 0, "source_frames": 0,
+             "decode_wait_seconds": 0.0, "inference_seconds": 0.0}
+    start = time.perf_counter()
+    next_log = log_every
+    batch = []
+
+    def flush(out):
+        infer_start = time.perf_counter()
+        probs = registry.predict_clips(torch.stack([frames_to_clip(frames) for _, frames, _ in batch]))
+        stats["inference_seconds"] += time.perf_counter() - infer_start
+        for (video, _, frame_count), row in zip(batch, probs):
+            record = dict(registry.to_result(row), video=video, frames=frame_count, model_version=registry.version)
+            out.write(json.dumps(record) + "\n")
+            stats["videos"] += 1
+            stats["source_frames"] += frame_count
+        out.flush()
+        batch.clear()
+
+    context = multiprocessing.get_context("spawn")
+    with open(output_path, "a") as out, ProcessPoolExecutor(
+            max_workers=decode_workers, mp_context=context, initializer=_init_decoder, initargs=(1,)) as pool:
+        remaining = iter(pending)
+        in_flight = set()
+        while True:
+            # Keep at most queue_size clips decoding or decoded-but-unscored
+            while len(in_flight) + len(batch) < queue_size:
+                video = next(remaining, None)
+                if video is None:
+                    break
+                in_flight.add(pool.submit(_decode, video, sampling, gate))
+            if not in_flight:
+                break
+
+            wait_start = time.perf_counter()
+            completed, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            stats["decode_wait_seconds"] += time.perf_counter() - wait_start
+
+            for future in completed:
+                video, frames, frame_count, activity, error = future.result()
+                if error is not None:
+                    logger.warning("Skipping %s: %s", video, error)
+                    out.write(json.dumps({"video": video, "error": error}) + "\n")
+                    out.flush()
+                    stats["failed"] += 1
+                    continue
+                if gate is not None and gate.is_static(activity):
+                    out.write(json.dumps({"video": video, "skipped": "static", "motion": activity,
+                                          "frames": frame_count}) + "\n")
+                    out.flush()
+                    stats["static"] += 1
+                    stats["source_frames"] += frame_count
+                    continue
+                batch.append((video, frames, frame_count))
+                if len(batch) >= batch_size:
+                    flush(out)
+                    processed = stats["videos"] + stats["failed"]
+                    if log_every and processed >= next_log:
+                        next_log = processed + log_every
+                        elapsed = time.perf_counter() - start
+                        logger.info("%d/%d videos, %.2f videos/s", processed, len(pending), processed / elapsed)
+        if batch:
+            flush(out)
+
+    elapsed = time.perf_counter() - start
+    stats.update({
+        "elapsed_seconds": elapsed,
+        "videos_per_sec": (stats["videos"] + stats["static"]) / elapsed if elapsed else 0.0,
+        "frames_per_sec": stats["source_frames"] / elapsed if elapsed else 0.0,
+        "clip_frames_per_sec": stats["videos"] * config.CLIP_LEN / elapsed if elapsed else 0.0,
+        "decode_workers": decode_workers,
+        "inference_threads": torch.get_num_threads(),
+        "batch_size": batch_size,
+    })
+    if gate is not None:
+        analyzed = stats["videos"] + stats["static"]
+        stats["motion_gate"] = dict(gate.describe(), skip_rate=stats["static"] / analyzed if analyzed else 0.0)
+    return stats
+
+
+def write_parquet(jsonl_path, parquet_path):
+    """Convert a results file to Parquet (requires pyarrow)."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet output requires pyarrow (pip install pyarrow)")
+
+    with open(jsonl_path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    for record in records:
+        # Per-class scores become a JSON string so the schema does not depend on the class list
+        if "scores" in record:
+            record["scores"] = json.dumps(record["scores"])
+    # Error and static-skip rows lack some columns; take the union so none are dropped
+    columns = list(dict.fromkeys(key for record in records for key in record))
+    pq.write_table(pa.Table.from_pydict({key: [record.get(key) for record in records] for key in columns}),
+                   parquet_path)
+    return len(records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze a directory or manifest of videos")
+    parser.add_argument("source", help="Directory of videos or manifest file")
+    parser.add_argument("--output", default="results.jsonl", help="JSON-lines results file (resumable)")
+    parser.add_argument("--parquet", help="Also write the results to this Parquet file when done")
+    parser.add_argument("--decode-workers", type=int, help="Decoder processes (default: cores - 1)")
+    parser.add_argument("--threads", type=int, help="Intra-op threads for inference (default: cores - decode workers)")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--queue-size", type=int, help="Clips decoded ahead of inference (default: 2 x batch size)")
+    parser.add_argument("--sampling", default=None, help="Frame sampling spec (default: FRAME_SAMPLING)")
+    parser.add_argument("--retry-failed", action="store_true", help="Re-run videos that previously failed")
+    parser.add_argument("--motion-gate", action="store_true", default=config.MOTION_GATE,
+                        help="Skip inference on clips without motion (default: MOTION_GATE)")
+    parser.add_argument("--min-active", type=float, help="Motion gate threshold (default: MOTION_MIN_ACTIVE)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    import torch
+    from crime_detection.motion import MotionGate
+    from crime_detection.registry import ModelRegistry
+
+    cores = os.cpu_count() or 1
+    decode_workers = args.decode_workers or max(1, cores - 1)
+    torch.set_num_threads(args.threads or max(1, cores - decode_workers))
+    registry = ModelRegistry(batch_size=args.batch_size)
+
+    stats = run(list_videos(args.source), args.output, registry, decode_workers=decode_workers,
+                batch_size=args.batch_size, queue_size=args.queue_size, sampling=args.sampling,
+                retry_failed=args.retry_failed,
+                gate=MotionGate(min_active=args.min_active) if args.motion_gate else None)
+    if args.parquet:
+        stats["parquet_rows"] = write_parquet(args.output, args.parquet)
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+
+import asyncio
+import logging
+import time
+from collections import deque
+
+from crime_detection.telemetry import metrics
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = metrics.histogram(
+    "crime_detection_batch_size", "Clips per micro-batch", buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+BATCH_QUEUE_WAIT = metrics.histogram(
+    "crime_detection_batch_queue_wait_seconds", "Time a clip waited in the micro-batch queue"
+)
+BATCH_COMPUTE = metrics.histogram("crime_detection_batch_compute_seconds", "Forward pass time per micro-batch")
+
+
+class MicroBatcher:
+    """
+    Dynamic micro-batching front end for a batched inference function.
+
+    Concurrent callers submit single clips; a background task collects them
+    until `max_batch_size` clips are queued or the oldest one has waited
+    `max_wait_ms`, stacks them into one forward pass and resolves each
+    caller's future with its own row of the output.
+    """
+
+    def __init__(self, infer_fn, max_batch_size=16, max_wait_ms=10.0, history=256):
+        """
+        Args:
+            infer_fn: Callable taking a [N, ...] tensor and returning [N, ...] outputs
+            max_batch_size: Largest batch sent to infer_fn
+            max_wait_ms: Longest time the first queued clip waits for company
+            history: Number of recent batches kept for stats
+        """
+        self.infer_fn = infer_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._queue = None
+        self._task = None
+        self._recent = deque(maxlen=history)
+        self._totals = {"batches": 0, "items": 0, "compute_ms": 0.0, "queue_wait_ms": 0.0}
+
+    async def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def submit(self, clip):
+        """
+        Queue one clip and wait for its output.
+
+        Args:
+            clip: Tensor without the batch dimension, e.g. [3, T, H, W]
+
+        Returns:
+            The row of infer_fn's output belonging to this clip
+        """
+        if self._task is None:
+            await self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((clip, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self):
+        items = [await self._queue.get()]
+        deadline = items[0][2] + self.max_wait_ms / 1000.0
+        while len(items) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                # Still take whatever is already waiting without blocking
+                while len(items) < self.max_batch_size and not self._queue.empty():
+                    items.append(self._queue.get_nowait())
+                break
+            try:
+                items.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return items
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = await self._collect()
+            # Callers that gave up (e.g. client disconnected) do not need a slot
+            items = [item for item in items if not item[1].cancelled()]
+            if not items:
+                continue
+
+            started = time.perf_counter()
+            waits = [(started - enqueued) * 1000.0 for _, _, enqueued in items]
+            try:
+                # Imported lazily so starting the batcher does not block a cold-starting server on torch
+                import torch
+
+                batch = torch.stack([clip for clip, _, _ in items])
+                outputs = await loop.run_in_executor(None, self.infer_fn, batch)
+            except Exception as e:
+                logger.error("Batched inference failed for %d clips: %s", len(items), e)
+                for _, future, _ in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            compute_ms = (time.perf_counter() - started) * 1000.0
+
+            for (_, future, _), output in zip(items, outputs):
+                if not future.done():
+                    future.set_result(output)
+            self._record(len(items), waits, compute_ms)
+
+    def _record(self, size, waits, compute_ms):
+        self._recent.append({
+            "size": size,
+            "queue_wait_ms": max(waits),
+            "mean_queue_wait_ms": sum(waits) / len(waits),
+            "compute_ms": compute_ms,
+            "timestamp": time.time(),
+        })
+        self._totals["batches"] += 1
+        self._totals["items"] += size
+        self._totals["compute_ms"] += compute_ms
+        self._totals["queue_wait_ms"] += sum(waits)
+        BATCH_SIZE.observe(size)
+        BATCH_COMPUTE.observe(compute_ms / 1000.0)
+        for wait in waits:
+            BATCH_QUEUE_WAIT.observe(wait / 1000.0)
+
+    @property
+    def queue_depth(self):
+        """Number of clips waiting for a batch."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def stats(self):
+        """Summary of batching behaviour plus the most recent batches."""
+        batches = self._totals["batches"]
+        items = self._totals["items"]
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "queue_depth": self.queue_depth,
+            "batches": batches,
+            "items": items,
+            "mean_batch_size": items / batches if batches else 0.0,
+            "mean_compute_ms": self._totals["compute_ms"] / batches if batches else 0.0,
+            "mean_queue_wait_ms": self._totals["queue_wait_ms"] / items if items else 0.0,
+            "recent": list(self._recent),
+        }
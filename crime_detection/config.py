@@ -5,9 +5,35 @@ import os
 MODEL_DIR = os.path.join(os.path.dirname(__file__), "models")
 MODEL_PATH = os.path.join(MODEL_DIR, "final_crime_classifier.pth")
 
+# Allow deployments to point at a different checkpoint without code changes
+MODEL_PATH = os.getenv("MODEL_PATH", MODEL_PATH)
+
 # Define class names for crime detection
 CLASS_NAMES = ['Abuse', 'Arrest', 'Arson', 'Assault']
 
+# Clip geometry expected by the C3D network: [N, 3, CLIP_LEN, FRAME_SIZE, FRAME_SIZE]
+CLIP_LEN = 16
+FRAME_SIZE = 112
+
+# Training decodes larger frames so random crops (FRAME_SIZE up to the full frame) have room to move
+TRAIN_DECODE_SIZE = 128
+
+# Per-channel RGB normalization applied to frames scaled to [0, 1]
+MEAN = [0.485, 0.456, 0.406]
+STD = [0.229, 0.224, 0.225]
+
+# Which frames of a video feed the classifier: "head", "uniform", "motion" or "stride:<k>"
+FRAME_SAMPLING = os.getenv("FRAME_SAMPLING", "head")
+
+# How often (seconds) the model registry checks the checkpoint for changes
+MODEL_RELOAD_INTERVAL = float(os.getenv("MODEL_RELOAD_INTERVAL", 2.0))
+
+# Motion gate: windows where fewer than MOTION_MIN_ACTIVE of the pixels change by more
+# than MOTION_PIXEL_THRESHOLD grey levels between consecutive frames skip the model
+MOTION_GATE = os.getenv("MOTION_GATE", "0") == "1"
+MOTION_PIXEL_THRESHOLD = float(os.getenv("MOTION_PIXEL_THRESHOLD", 15))
+MOTION_MIN_ACTIVE = float(os.getenv("MOTION_MIN_ACTIVE", 0.005))
+
 # Define detailed descriptions for each crime type
 CRIME_DESCRIPTIONS = {
     "Abuse": """The video appears to be footage captured by a fixed-position surveillance camera in an outdoor setting, possibly near a convenience store or residential area during nighttime. The lighting is dim, but a few artificial light sources—like a nearby streetlamp or building lights—faintly illuminate the scene. Two individuals are central to the events unfolding. One person, dressed in a light-colored jacket, displays assertive or aggressive body language, frequently moving toward the second person in a confrontational manner. The second individual, wearing darker clothing, appears more passive and is seen stepping back or avoiding direct engagement. As the interaction progresses, the dominant figure becomes increasingly physical—gesturing emphatically, moving into the personal space of the other individual, and possibly shoving or striking them. The victim shows signs of discomfort and retreat, suggesting this is not a mutual argument but a one-sided confrontation. No third parties intervene throughout the video, and the isolated location contributes to the tense atmosphere. A vehicle is seen briefly in the background, but it does not stop or affect the scene. Overall, the visual cues, body language, and the setting strongly indicate an abusive encounter, likely verbal at first and escalating into physical aggression. The lack of intervention and the evident distress of the second person reinforce the classification of this scenario as an abuse incident.""",
@@ -0,0 +1,266 @@
+
+"""
+Preprocessed clip cache for CrimeVideoDataset.
+
+Decoded, resized clips are stored as fixed-shape uint8 records in raw shard
+files, with an index.json mapping each source video to its shard, offset and
+label. CachedClipDataset reads records back through numpy.memmap without
+copying, so training no longer pays for video decoding every epoch.
+
+Frames are cached at config.TRAIN_DECODE_SIZE by default, so training can
+still take random crops of the model's input size.
+
+Build or incrementally update a cache with:
+
+    python -m crime_detection.data.clip_cache <root_dir> <cache_dir>
+"""
+
+import argparse
+import json
+import logging
+import os
+
+import numpy as np
+import torch
+from torch.utils.data import Dataset
+
+from crime_detection import config
+from crime_detection.data.decoder import VideoDecoder, make_sampler
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.json"
+INDEX_VERSION = 1
+
+
+def _shard_name(shard):
+    return f"shard-{shard:05d}.bin"
+
+
+def _source_signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime, stat.st_size
+
+
+def _list_videos(root_dir, classes):
+    for label, class_name in enumerate(classes):
+        class_dir = os.path.join(root_dir, class_name)
+        if not os.path.exists(class_dir):
+            continue
+        for file in sorted(os.listdir(class_dir)):
+            if file.endswith(".mp4"):
+                yield os.path.join(class_name, file), label
+
+
+def load_index(cache_dir):
+    """Return the cache index, or None if the cache has not been built."""
+    path = os.path.join(cache_dir, INDEX_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_index(cache_dir, index):
+    path = os.path.join(cache_dir, INDEX_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp_path, path)
+
+
+def _open_shard(cache_dir, index, shard, mode):
+    clip_shape = tuple(index["clip_shape"])
+    capacity = index["shards"][shard]["count"]
+    return np.memmap(os.path.join(cache_dir, _shard_name(shard)), dtype=np.uint8,
+                     mode=mode, shape=(capacity,) + clip_shape)
+
+
+def is_stale(root_dir, rel_path, entry):
+    """True if the source video was removed or its mtime or size changed."""
+    try:
+        mtime, size = _source_signature(os.path.join(root_dir, rel_path))
+    except OSError:
+        return True
+    return mtime != entry["mtime"] or size != entry["size"]
+
+
+def build_cache(root_dir, cache_dir, max_frames=config.CLIP_LEN, frame_size=config.TRAIN_DECODE_SIZE,
+                sampling="head", classes=None, shard_size=256, rebuild=False):
+    """
+    Create or incrementally update a clip cache.
+
+    New videos are appended to the last shard (or a new one when it is full),
+    videos whose mtime or size changed are re-decoded into their existing
+    slot, and videos that disappeared are dropped from the index.
+
+    Args:
+        root_dir: Dataset root with one sub-folder per class
+        cache_dir: Output directory for shards and index.json
+        max_frames: Frames per clip
+        frame_size: Height and width of cached frames
+        sampling: Frame sampling spec understood by make_sampler
+        classes: Class folder names, defaults to config.CLASS_NAMES
+        shard_size: Clips per shard file
+        rebuild: Discard any existing cache first
+
+    Returns:
+        Dict counting added, updated, removed and unchanged samples
+    """
+    classes = list(classes or config.CLASS_NAMES)
+    clip_shape = [max_frames, frame_size, frame_size, 3]
+    os.makedirs(cache_dir, exist_ok=True)
+
+    index = None if rebuild else load_index(cache_dir)
+    if index is not None:
+        settings = (index["clip_shape"], index["sampling"], index["classes"])
+        if index.get("version") != INDEX_VERSION or settings != (clip_shape, sampling, classes):
+            raise ValueError(
+                f"Existing cache in {cache_dir} was built with different settings; pass rebuild=True"
+            )
+    else:
+        for file in os.listdir(cache_dir):
+            if file.startswith("shard-") and file.endswith(".bin"):
+                os.remove(os.path.join(cache_dir, file))
+        index = {
+            "version": INDEX_VERSION,
+            "clip_shape": clip_shape,
+            "sampling": sampling,
+            "classes": classes,
+            "shard_size": shard_size,
+            "shards": [],
+            "samples": {},
+        }
+
+    sampler = make_sampler(sampling, max_frames)
+    record_bytes = int(np.prod(clip_shape))
+    stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+    present = set()
+
+    for rel_path, label in _list_videos(root_dir, classes):
+        present.add(rel_path)
+        entry = index["samples"].get(rel_path)
+        if entry is not None and not is_stale(root_dir, rel_path, entry):
+            stats["unchanged"] += 1
+            continue
+
+        source = os.path.join(root_dir, rel_path)
+        clip = VideoDecoder(source, size=frame_size).decode(sampler, num_frames=max_frames)
+        mtime, size = _source_signature(source)
+
+        if entry is not None:
+            # Fixed-size records let a changed video be rewritten in place
+            shard = _open_shard(cache_dir, index, entry["shard"], "r+")
+            shard[entry["offset"]] = clip
+            shard.flush()
+            del shard
+            stats["updated"] += 1
+        else:
+            if not index["shards"] or index["shards"][-1]["count"] >= index["shard_size"]:
+                index["shards"].append({"file": _shard_name(len(index["shards"])), "count": 0})
+            shard_id = len(index["shards"]) - 1
+            shard_path = os.path.join(cache_dir, _shard_name(shard_id))
+            count = index["shards"][shard_id]["count"]
+            if os.path.exists(shard_path) and os.path.getsize(shard_path) < count * record_bytes:
+                raise ValueError(f"{shard_path} is shorter than its index says; pass rebuild=True")
+            with open(shard_path, "ab") as f:
+                # Drop bytes past the last indexed record, e.g. left by an interrupted build,
+                # so the new record starts on a record boundary
+                f.truncate(count * record_bytes)
+                f.write(np.ascontiguousarray(clip, dtype=np.uint8).tobytes())
+            entry = {"shard": shard_id, "offset": count}
+            index["shards"][shard_id]["count"] = count + 1
+            stats["added"] += 1
+
+        entry.update({"label": label, "mtime": mtime, "size": size})
+        index["samples"][rel_path] = entry
+
+    for rel_path in list(index["samples"]):
+        if rel_path not in present:
+            # The slot stays in the shard but is no longer referenced
+            del index["samples"][rel_path]
+            stats["removed"] += 1
+
+    _write_index(cache_dir, index)
+    logger.info("Clip cache %s: %s", cache_dir, stats)
+    return stats
+
+
+class CachedClipDataset(Dataset):
+    """
+    Dataset over a clip cache built by build_cache.
+
+    Items are uint8 tensors of shape [T, C, H, W] viewing the memory-mapped
+    shard directly, matching CrimeVideoDataset without a transform.
+    """
+
+    def __init__(self, cache_dir, root_dir=None, clip_transform=None):
+        """
+        Args:
+            cache_dir: Directory produced by build_cache
+            root_dir: Source dataset root; when given, samples whose video changed
+                since caching are excluded until the cache is rebuilt
+            clip_transform: Transform applied to each uint8 [T, C, H, W] tensor
+        """
+        index = load_index(cache_dir)
+        if index is None:
+            raise FileNotFoundError(f"No clip cache found in {cache_dir}")
+        self.cache_dir = cache_dir
+        self.index = index
+        self.classes = index["classes"]
+        self.frame_size = index["clip_shape"][1]
+        self.clip_transform = clip_transform
+
+        entries = sorted(index["samples"].items())
+        if root_dir is not None:
+            stale = {path for path, entry in entries if is_stale(root_dir, path, entry)}
+            if stale:
+                logger.warning("Skipping %d stale cached clips; rerun build_cache to refresh them", len(stale))
+            entries = [(path, entry) for path, entry in entries if path not in stale]
+        self.samples = [(path, entry["shard"], entry["offset"], entry["label"]) for path, entry in entries]
+
+        # Shards are mapped lazily so each DataLoader worker opens its own maps
+        self._shards = {}
+
+    def __len__(self):
+        return len(self.samples)
+
+    def _shard(self, shard):
+        if shard not in self._shards:
+            # Copy-on-write mapping: zero-copy reads, and writes never reach the file
+            self._shards[shard] = _open_shard(self.cache_dir, self.index, shard, "c")
+        return self._shards[shard]
+
+    def __getitem__(self, idx):
+        _, shard, offset, label = self.samples[idx]
+        clip = torch.from_numpy(self._shard(shard)[offset]).permute(0, 3, 1, 2)  # shape: [T, C, H, W]
+        if self.clip_transform:
+            clip = self.clip_transform(clip)
+        return clip, label
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_shards"] = {}
+        return state
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or update a preprocessed clip cache")
+    parser.add_argument("root_dir", help="Dataset root with one sub-folder per class")
+    parser.add_argument("cache_dir", help="Directory for shards and index.json")
+    parser.add_argument("--frames", type=int, default=config.CLIP_LEN)
+    parser.add_argument("--size", type=int, default=config.TRAIN_DECODE_SIZE,
+                        help="Cached frame size; training random-crops config.FRAME_SIZE from it")
+    parser.add_argument("--sampling", default="head")
+    parser.add_argument("--shard-size", type=int, default=256)
+    parser.add_argument("--rebuild", action="store_true", help="Discard the existing cache first")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    stats = build_cache(args.root_dir, args.cache_dir, max_frames=args.frames, frame_size=args.size,
+                        sampling=args.sampling, shard_size=args.shard_size, rebuild=args.rebuild)
+    print(json.dumps(stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,29 @@
 
 from torch.utils.data import Dataset
 import os
-import cv2
 from PIL import Image
 import torch
 
+from crime_detection.data.decoder import HeadSampler, VideoDecoder
+
 class CrimeVideoDataset(Dataset):
-    def __init__(self, root_dir, max_frames=16, transform=None):
+    def __init__(self, root_dir, max_frames=16, transform=None, sampler=None, frame_size=None,
+                 clip_transform=None):
+        """
+        Args:
+            root_dir: Directory with one sub-folder of .mp4 files per class
+            max_frames: Number of frames per clip
+            transform: Per-frame transform applied to PIL images (legacy path)
+            sampler: FrameSampler choosing which frames to decode, defaults to the first max_frames
+            frame_size: Resize frames to frame_size x frame_size while decoding
+            clip_transform: Transform applied once to the whole uint8 [T, H, W, 3] clip
+        """
         self.root_dir = root_dir
         self.max_frames = max_frames
         self.transform = transform
+        self.sampler = sampler or HeadSampler(max_frames)
+        self.frame_size = frame_size
+        self.clip_transform = clip_transform
         self.classes = ['Abuse', 'Arrest', 'Arson', 'Assault']
         self.samples = []
 
@@ -25,28 +39,21 @@ class CrimeVideoDataset(Dataset):
 
     def __getitem__(self, idx):
         video_path, label = self.samples[idx]
-        frames = self.load_video_frames(video_path)
+        frames = self.decode_clip(video_path)
         if self.transform:
-            frames = [self.transform(frame) for frame in frames]
-        video_tensor = torch.stack(frames)  # shape: [T, C, H, W]
+            frames = [self.transform(Image.fromarray(frame)) for frame in frames]
+            video_tensor = torch.stack(frames)  # shape: [T, C, H, W]
+        elif self.clip_transform:
+            video_tensor = self.clip_transform(frames)
+        else:
+            video_tensor = torch.from_numpy(frames).permute(0, 3, 1, 2)  # shape: [T, C, H, W] uint8
         return video_tensor, label
 
+    def decode_clip(self, video_path):
+        """Decode the sampled frames of a video into a uint8 [T, H, W, 3] array."""
+        # Unreadable videos come back as an all-black clip, as before
+        return VideoDecoder(video_path, size=self.frame_size).decode(self.sampler, num_frames=self.max_frames)
+
     def load_video_frames(self, video_path):
-        cap = cv2.VideoCapture(video_path)
-        frames = []
-        count = 0
-        while count < self.max_frames and cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            frame = Image.fromarray(frame)
-            frames.append(frame)
-            count += 1
-        cap.release()
-
-        # Pad if video has fewer than max_frames
-        while len(frames) < self.max_frames:
-            frames.append(frames[-1] if frames else Image.new('RGB', (224, 224)))  # repeat last frame or create empty
-
-        return frames[:self.max_frames]
+        """Decode the sampled frames as a list of PIL images."""
+        return [Image.fromarray(frame) for frame in self.decode_clip(video_path)]
@@ -0,0 +1,441 @@
+
+"""
+Append-only store of C3D segment embeddings with nearest-neighbour search.
+
+Each indexed window of a video contributes its fc7 embedding (optionally
+PCA-reduced, always L2-normalized) as one float16 row of a raw matrix file
+that is read back through numpy.memmap, plus one JSON line of metadata.
+Search is exact cosine top-k with blocked matrix multiplies, or, once
+build_ivf() has run, an IVF-style probe of the nearest k-means lists.
+
+    python -m crime_detection.embeddings index <store_dir> videos/*.mp4 --pca 256
+    python -m crime_detection.embeddings build-ivf <store_dir> --lists 1024
+    python -m crime_detection.embeddings search <store_dir> query.mp4 -k 10
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import os
+
+import numpy as np
+
+from crime_detection import config
+
+logger = logging.getLogger(__name__)
+
+STORE_FILE = "store.json"
+MATRIX_FILE = "embeddings.f16"
+METADATA_FILE = "metadata.jsonl"
+PCA_FILE = "pca.npz"
+IVF_FILE = "ivf.npz"
+
+
+class InconsistentStore(Exception):
+    """Raised when a store's row count, matrix file and metadata sidecar disagree."""
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def fit_pca(sample, dim):
+    """
+    Fit a PCA projection on sample rows.
+
+    Returns:
+        (mean [D], components [D, dim])
+    """
+    sample = np.asarray(sample, dtype=np.float32)
+    if len(sample) < dim:
+        raise ValueError(f"PCA to {dim} dimensions needs at least {dim} sample rows, got {len(sample)}")
+    mean = sample.mean(axis=0)
+    _, _, vt = np.linalg.svd(sample - mean, full_matrices=False)
+    return mean, vt[:dim].T.copy()
+
+
+def _merge_topk(best_scores, best_ids, scores, ids, k):
+    """Merge a new block of candidate scores into the running top-k of each query."""
+    scores = np.concatenate([best_scores, scores], axis=1)
+    ids = np.concatenate([best_ids, ids], axis=1)
+    if scores.shape[1] > k:
+        keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        scores = np.take_along_axis(scores, keep, axis=1)
+        ids = np.take_along_axis(ids, keep, axis=1)
+    return scores, ids
+
+
+class EmbeddingStore:
+    """
+    Memory-mapped float16 embedding matrix with a JSON-lines metadata sidecar.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, STORE_FILE)) as f:
+            self.info = json.load(f)
+        self.dim = self.info["dim"]
+        self.input_dim = self.info["input_dim"]
+
+        self.pca = None
+        if self.info.get("pca"):
+            data = np.load(os.path.join(directory, PCA_FILE))
+            self.pca = (data["mean"], data["components"])
+
+        self.ivf = None
+        if self.info.get("ivf"):
+            data = np.load(os.path.join(directory, IVF_FILE))
+            self.ivf = {key: data[key] for key in ("centroids", "order", "offsets")}
+
+        self._metadata_offsets = None
+
+    @classmethod
+    def create(cls, directory, input_dim=4096, pca=None):
+        """
+        Create an empty store.
+
+        Args:
+            directory: Store directory (created if missing)
+            input_dim: Dimension of the raw embeddings (fc7 is 4096)
+            pca: Optional (mean, components) projection from fit_pca
+        """
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(os.path.join(directory, STORE_FILE)):
+            raise FileExistsError(f"An embedding store already exists in {directory}")
+        dim = input_dim
+        if pca is not None:
+            mean, components = pca
+            np.savez(os.path.join(directory, PCA_FILE), mean=mean, components=components)
+            dim = components.shape[1]
+        open(os.path.join(directory, MATRIX_FILE), "wb").close()
+        open(os.path.join(directory, METADATA_FILE), "w").close()
+        info = {"version": 1, "dim": dim, "input_dim": input_dim, "dtype": "float16",
+                "count": 0, "pca": pca is not None, "ivf": None}
+        cls._write_info(directory, info)
+        return cls(directory)
+
+    @staticmethod
+    def _write_info(directory, info):
+        path = os.path.join(directory, STORE_FILE)
+        with open(path + ".tmp", "w") as f:
+            json.dump(info, f)
+        os.replace(path + ".tmp", path)
+
+    @property
+    def count(self):
+        return self.info["count"]
+
+    def project(self, vectors):
+        """Apply the store's PCA (if any) and L2-normalize."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.pca is not None:
+            mean, components = self.pca
+            vectors = (vectors - mean) @ components
+        return _normalize(vectors)
+
+    def append(self, vectors, metadata):
+        """
+        Append raw embeddings and their metadata.
+
+        The matrix and sidecar are written before the row count is bumped, so
+        an interrupted append leaves the store at its previous, consistent size;
+        anything past that size is overwritten. Files shorter than the row count
+        raise InconsistentStore rather than being silently rewritten.
+        """
+        if len(vectors) != len(metadata):
+            raise ValueError("vectors and metadata must have the same length")
+        if len(vectors) == 0:
+            return
+        rows = self.project(vectors).astype(np.float16)
+        count = self.count
+        matrix_path = os.path.join(self.directory, MATRIX_FILE)
+        if os.path.getsize(matrix_path) < count * self.dim * 2:
+            raise InconsistentStore(f"{matrix_path} holds fewer than the {count} rows recorded in {STORE_FILE}")
+        offsets = self._offsets()
+        if len(offsets) <= count:
+            raise InconsistentStore(
+                f"{METADATA_FILE} in {self.directory} has {len(offsets) - 1} records but the store holds {count} rows"
+            )
+        with open(matrix_path, "r+b") as f:
+            f.seek(count * self.dim * 2)
+            f.write(rows.tobytes())
+        with open(os.path.join(self.directory, METADATA_FILE), "r+") as f:
+            f.seek(offsets[count])
+            f.truncate()
+            f.write("".join(json.dumps(item) + "\n" for item in metadata))
+        self.info["count"] = count + len(rows)
+        self._write_info(self.directory, self.info)
+        self._metadata_offsets = None
+
+    def matrix(self):
+        """Read-only memmap of shape [count, dim]."""
+        if self.count == 0:
+            return np.zeros((0, self.dim), dtype=np.float16)
+        return np.memmap(os.path.join(self.directory, MATRIX_FILE), dtype=np.float16,
+                         mode="r", shape=(self.count, self.dim))
+
+    def _offsets(self):
+        """Byte offset of the start of each metadata line, plus the end offset."""
+        if self._metadata_offsets is None:
+            offsets = [0]
+            with open(os.path.join(self.directory, METADATA_FILE), "rb") as f:
+                for line in f:
+                    offsets.append(offsets[-1] + len(line))
+            self._metadata_offsets = offsets
+        return self._metadata_offsets
+
+    def metadata(self, rows):
+        offsets = self._offsets()
+        items = []
+        with open(os.path.join(self.directory, METADATA_FILE), "rb") as f:
+            for row in rows:
+                f.seek(offsets[row])
+                items.append(json.loads(f.readline()))
+        return items
+
+    def videos(self):
+        """Absolute paths of the videos that have rows in the store."""
+        with open(os.path.join(self.directory, METADATA_FILE)) as f:
+            return {os.path.abspath(json.loads(line)["video"]) for line in itertools.islice(f, self.count)}
+
+    def search(self, queries, k=10, block_size=65536, nprobe=None):
+        """
+        Cosine top-k search.
+
+        Args:
+            queries: Raw embeddings of shape [Q, input_dim]
+            k: Neighbours per query
+            block_size: Rows scored per matrix multiply in exact search
+            nprobe: Probe this many IVF lists instead of scanning everything
+                (requires build_ivf; rows appended since are always scanned)
+
+        Returns:
+            One list per query of {"row", "score", **metadata} dicts, best first
+        """
+        queries = self.project(np.atleast_2d(queries))
+        matrix = self.matrix()
+        if nprobe and self.ivf is not None:
+            scores, ids = self._search_ivf(queries, matrix, k, nprobe)
+        else:
+            scores, ids = self._search_exact(queries, matrix, k, 0, len(matrix), block_size)
+
+        results = []
+        for query_scores, query_ids in zip(scores, ids):
+            order = np.argsort(-query_scores)
+            picked = [(int(query_ids[i]), float(query_scores[i])) for i in order if query_ids[i] >= 0]
+            metadata = self.metadata([row for row, _ in picked])
+            results.append([dict(item, row=row, score=score) for (row, score), item in zip(picked, metadata)])
+        return results
+
+    @staticmethod
+    def _empty(num_queries, k):
+        return np.full((num_queries, 0), -np.inf, dtype=np.float32), np.full((num_queries, 0), -1, dtype=np.int64)
+
+    def _search_exact(self, queries, matrix, k, start, stop, block_size):
+        best_scores, best_ids = self._empty(len(queries), k)
+        for block_start in range(start, stop, block_size):
+            block_stop = min(block_start + block_size, stop)
+            block = np.asarray(matrix[block_start:block_stop], dtype=np.float32)
+            scores = queries @ block.T
+            ids = np.broadcast_to(np.arange(block_start, block_stop), scores.shape)
+            best_scores, best_ids = _merge_topk(best_scores, best_ids, scores, ids, k)
+        return best_scores, best_ids
+
+    def _search_ivf(self, queries, matrix, k, nprobe):
+        centroids, order, offsets = self.ivf["centroids"], self.ivf["order"], self.ivf["offsets"]
+        indexed = int(offsets[-1])
+        nprobe = min(nprobe, len(centroids))
+        nearest_lists = np.argsort(-(queries @ centroids.T), axis=1)[:, :nprobe]
+
+        all_scores, all_ids = [], []
+        for query, lists in zip(queries, nearest_lists):
+            candidates = np.sort(np.concatenate([order[offsets[l]:offsets[l + 1]] for l in lists]))
+            scores = np.asarray(matrix[candidates], dtype=np.float32) @ query
+            best_scores, best_ids = _merge_topk(*self._empty(1, k), scores[None, :], candidates[None, :], k)
+            all_scores.append(best_scores[0])
+            all_ids.append(best_ids[0])
+        width = max(len(s) for s in all_scores)
+        best_scores = np.full((len(queries), width), -np.inf, dtype=np.float32)
+        best_ids = np.full((len(queries), width), -1, dtype=np.int64)
+        for i, (scores, ids) in enumerate(zip(all_scores, all_ids)):
+            best_scores[i, :len(scores)] = scores
+            best_ids[i, :len(ids)] = ids
+
+        if indexed < len(matrix):
+            # Rows appended after the IVF was built are scanned exhaustively
+            tail_scores, tail_ids = self._search_exact(queries, matrix, k, indexed, len(matrix), 65536)
+            best_scores, best_ids = _merge_topk(best_scores, best_ids, tail_scores, tail_ids, k)
+        return best_scores, best_ids
+
+    def build_ivf(self, num_lists=1024, iterations=10, sample_size=100000, block_size=65536, seed=0):
+        """
+        Build an IVF coarse index with spherical k-means over the current rows.
+        """
+        matrix = self.matrix()
+        count = len(matrix)
+        num_lists = min(num_lists, count)
+        if num_lists == 0:
+            raise ValueError("Cannot build an IVF index over an empty store")
+        rng = np.random.default_rng(seed)
+        sample_ids = np.sort(rng.choice(count, size=min(sample_size, count), replace=False))
+        sample = np.asarray(matrix[sample_ids], dtype=np.float32)
+        centroids = sample[rng.choice(len(sample), size=num_lists, replace=False)]
+
+        for _ in range(iterations):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            empty = np.bincount(assign, minlength=num_lists) == 0
+            # Re-seed empty lists from random sample rows
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+            centroids = _normalize(sums)
+
+        assignments = np.empty(count, dtype=np.int32)
+        for start in range(0, count, block_size):
+            block = np.asarray(matrix[start:start + block_size], dtype=np.float32)
+            assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        order = np.argsort(assignments, kind="stable").astype(np.int64)
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=num_lists))]).astype(np.int64)
+
+        np.savez(os.path.join(self.directory, IVF_FILE), centroids=centroids, order=order, offsets=offsets)
+        self.ivf = {"centroids": centroids, "order": order, "offsets": offsets}
+        self.info["ivf"] = {"lists": num_lists, "count": count}
+        self._write_info(self.directory, self.info)
+
+
+def embed_video(video_path, registry, window=config.CLIP_LEN, stride=config.CLIP_LEN, batch_size=8):
+    """
+    Extract per-segment fc7 embeddings of a video.
+
+    Yields:
+        (embedding batch [N, 4096] float32, list of segment metadata dicts)
+    """
+    from crime_detection.temporal import batch_windows, check_window, iter_windows
+    from crime_detection.utils.video_utils import get_video_fps, iter_video_frames
+
+    check_window(window)
+    fps = get_video_fps(video_path)
+    windows = iter_windows(iter_video_frames(video_path), window=window, stride=stride)
+    for starts, clips in batch_windows(windows, batch_size=batch_size):
+        probs, features = registry.embed_clips(clips)
+        metadata = []
+        for start, row in zip(starts, probs):
+            result = registry.to_result(row)
+            metadata.append({
+                "video": video_path,
+                "start": start / fps,
+                "end": (start + window) / fps,
+                "crime_type": result["crime_type"],
+                "confidence": result["confidence"],
+            })
+        yield features.numpy(), metadata
+
+
+def index_videos(directory, video_paths, registry, pca_dim=None, pca_sample=4096, **embed_kwargs):
+    """
+    Embed videos into a store, creating it (and fitting PCA) if needed.
+
+    Each video is appended in one step once all of its windows are embedded,
+    so videos already in the store, e.g. from an interrupted run, are skipped.
+
+    Returns:
+        Number of segments appended
+    """
+    store = None
+    indexed = set()
+    if os.path.exists(os.path.join(directory, STORE_FILE)):
+        store = EmbeddingStore(directory)
+        if pca_dim and (store.pca is None or store.dim != pca_dim):
+            kind = f"{store.dim}-d PCA-reduced" if store.pca is not None else f"full {store.dim}-d"
+            raise ValueError(f"{directory} holds {kind} embeddings; it cannot be extended with pca_dim={pca_dim}")
+        indexed = store.videos()
+    pending_vectors, pending_metadata = [], []
+    appended = 0
+
+    def flush():
+        nonlocal appended
+        if pending_vectors:
+            store.append(np.concatenate(pending_vectors), pending_metadata)
+            appended += len(pending_metadata)
+            pending_vectors.clear()
+            pending_metadata.clear()
+
+    for video_path in video_paths:
+        if os.path.abspath(video_path) in indexed:
+            logger.info("Skipping %s, already indexed", video_path)
+            continue
+        for vectors, metadata in embed_video(video_path, registry, **embed_kwargs):
+            pending_vectors.append(vectors)
+            pending_metadata.extend(metadata)
+        indexed.add(os.path.abspath(video_path))
+        if store is None and pending_metadata and len(pending_metadata) >= (pca_sample if pca_dim else 1):
+            sample = np.concatenate(pending_vectors)
+            pca = fit_pca(sample, pca_dim) if pca_dim else None
+            store = EmbeddingStore.create(directory, input_dim=sample.shape[1], pca=pca)
+        if store is not None:
+            flush()
+        logger.info("Indexed %s", video_path)
+
+    if store is None and pending_vectors:
+        sample = np.concatenate(pending_vectors)
+        pca = None
+        if pca_dim and len(sample) >= pca_dim:
+            pca = fit_pca(sample, pca_dim)
+        elif pca_dim:
+            logger.warning("Only %d segments, too few to fit %d-d PCA; storing full embeddings", len(sample), pca_dim)
+        store = EmbeddingStore.create(directory, input_dim=sample.shape[1], pca=pca)
+    if store is not None:
+        flush()
+    return appended
+
+
+def main():
+    from crime_detection.registry import ModelRegistry
+    from crime_detection.temporal import batch_windows, iter_windows
+    from crime_detection.utils.video_utils import iter_video_frames
+
+    parser = argparse.ArgumentParser(description="C3D embedding store")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    index = commands.add_parser("index", help="Embed videos into a store")
+    index.add_argument("store")
+    index.add_argument("videos", nargs="+")
+    index.add_argument("--pca", type=int, help="Reduce embeddings to this many dimensions")
+    index.add_argument("--stride", type=int, default=config.CLIP_LEN)
+    index.add_argument("--batch-size", type=int, default=8)
+
+    ivf = commands.add_parser("build-ivf", help="Build the IVF coarse index")
+    ivf.add_argument("store")
+    ivf.add_argument("--lists", type=int, default=1024)
+    ivf.add_argument("--iterations", type=int, default=10)
+
+    search = commands.add_parser("search", help="Find segments similar to the first window of a video")
+    search.add_argument("store")
+    search.add_argument("video")
+    search.add_argument("-k", type=int, default=10)
+    search.add_argument("--nprobe", type=int, help="Use the IVF index, probing this many lists")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "index":
+        appended = index_videos(args.store, args.videos, ModelRegistry(), pca_dim=args.pca,
+                                stride=args.stride, batch_size=args.batch_size)
+        print(json.dumps({"appended": appended}))
+    elif args.command == "build-ivf":
+        store = EmbeddingStore(args.store)
+        store.build_ivf(num_lists=args.lists, iterations=args.iterations)
+        print(json.dumps(store.info["ivf"]))
+    else:
+        store = EmbeddingStore(args.store)
+        windows = iter_windows(iter_video_frames(args.video), stride=config.CLIP_LEN)
+        _, clips = next(batch_windows(windows, batch_size=1))
+        _, features = ModelRegistry().embed_clips(clips)
+        print(json.dumps(store.search(features.numpy(), k=args.k, nprobe=args.nprobe)[0], indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,473 @@
+
+"""
+Persistent job queue and worker pool for long-running video analysis.
+
+Jobs live in a SQLite file, so anything still queued (or interrupted while
+running) is picked up again after a restart. Worker processes each hold one
+resident ModelRegistry, claim jobs in priority order, fetch the video through
+a pluggable fetcher and store the raw prediction back in the queue. The pool
+restarts workers that die; a job whose worker dies max_attempts times is
+marked failed instead of being retried forever.
+"""
+
+import importlib
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+PRIORITIES = {"fresh": 10, "backfill": 0}
+
+DEFAULT_FETCHER = "crime_detection.jobs:http_fetch"
+
+
+class QueueFull(Exception):
+    """Raised when the queue already holds max_depth pending jobs."""
+
+
+def http_fetch(url):
+    """
+    Default fetcher: stream a video over HTTP(S) to a temporary file.
+
+    Returns:
+        (path, sha256 hex digest)
+    """
+    import requests
+    from crime_detection.uploads import UPLOAD_CHUNK_SIZE, download_to_tempfile
+
+    with requests.get(url, stream=True, timeout=30) as response:
+        response.raise_for_status()
+        path, content_hash, _ = download_to_tempfile(response.iter_content(chunk_size=UPLOAD_CHUNK_SIZE))
+    return path, content_hash
+
+
+def load_fetcher(spec):
+    """Resolve a "module:function" spec to a fetcher callable."""
+    module_name, _, attr = spec.partition(":")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def pid_alive(pid):
+    """True if a process with this pid exists."""
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def process_identity(pid):
+    """
+    String naming one process for its whole life, so a reused pid is not mistaken for it.
+
+    On Linux it combines the boot id, the pid and the process start time;
+    elsewhere it is just the pid.
+
+    Returns:
+        The identity, or None if no process with this pid exists
+    """
+    if not pid:
+        return None
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # The command name may contain spaces and parentheses; fields after it are plain
+            started = f.read().rsplit(")", 1)[1].split()[19]
+        with open("/proc/sys/kernel/random/boot_id") as f:
+            boot_id = f.read().strip()
+    except (OSError, IndexError):
+        return str(pid) if pid_alive(pid) else None
+    return f"{boot_id}:{pid}:{started}"
+
+
+def acquire_owner_lock(db_path):
+    """
+    Try to become the one process that owns the queue in db_path: requeues
+    interrupted jobs, runs the worker pool and delivers callbacks.
+
+    The lock is an flock on a file next to the database and is held until the
+    returned file is closed or the process exits, so a replacement process can
+    take over from an owner that died.
+
+    Returns:
+        The open lock file (keep a reference to it), or None if another process owns the queue
+    """
+    lock_file = open(db_path + ".owner", "a")
+    if fcntl is None:
+        logger.warning("File locks are unavailable; every process owns the job queue")
+        return lock_file
+    try:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+class JobStore:
+    """
+    SQLite-backed job table shared by the API process and the workers.
+
+    Args:
+        db_path: SQLite file holding the jobs table
+        max_depth: Queued jobs beyond which enqueue raises QueueFull
+        max_attempts: Claims after which an interrupted job is failed instead of requeued
+    """
+
+    def __init__(self, db_path, max_depth=100, max_attempts=3):
+        self.db_path = db_path
+        self.max_depth = max_depth
+        self.max_attempts = max_attempts
+        with closing(self._connect()) as db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    priority INTEGER NOT NULL,
+                    payload TEXT NOT NULL,
+                    callback_url TEXT,
+                    callback_sent INTEGER NOT NULL DEFAULT 0,
+                    result TEXT,
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    worker_pid INTEGER,
+                    worker_token TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority DESC, created_at)")
+            columns = {row["name"] for row in db.execute("PRAGMA table_info(jobs)")}
+            for column, column_type in (("worker_pid", "INTEGER"), ("worker_token", "TEXT")):
+                if column in columns:
+                    continue
+                try:
+                    db.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+                except sqlite3.OperationalError:
+                    # Another process added it first
+                    pass
+
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        db.execute("PRAGMA journal_mode=WAL")
+        return db
+
+    def enqueue(self, payload, priority="fresh", callback_url=None):
+        """
+        Add a job, refusing it if max_depth jobs are already waiting.
+
+        Returns:
+            The new job id
+        """
+        job_id = uuid.uuid4().hex
+        with closing(self._connect()) as db:
+            db.execute("BEGIN IMMEDIATE")
+            depth = db.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+            if depth >= self.max_depth:
+                db.execute("ROLLBACK")
+                raise QueueFull(f"Job queue is full ({depth} pending)")
+            db.execute(
+                "INSERT INTO jobs (id, status, priority, payload, callback_url, created_at) "
+                "VALUES (?, 'queued', ?, ?, ?, ?)",
+                (job_id, PRIORITIES.get(priority, 0), json.dumps(payload), callback_url, time.time()),
+            )
+            db.execute("COMMIT")
+        return job_id
+
+    def claim_next(self, worker_pid=None):
+        """
+        Atomically mark the highest-priority, oldest queued job as running and return it.
+
+        Args:
+            worker_pid: Process recorded as owning the job, defaults to the caller
+        """
+        worker_pid = worker_pid or os.getpid()
+        worker_token = process_identity(worker_pid)
+        with closing(self._connect()) as db:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' ORDER BY priority DESC, created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                db.execute("COMMIT")
+                return None
+            db.execute(
+                "UPDATE jobs SET status = 'running', started_at = ?, attempts = attempts + 1, worker_pid = ?, "
+                "worker_token = ? WHERE id = ?",
+                (time.time(), worker_pid, worker_token, row["id"]),
+            )
+            db.execute("COMMIT")
+        job = self._to_dict(row)
+        job["attempts"] += 1
+        return job
+
+    def complete(self, job_id, result):
+        with closing(self._connect()) as db:
+            db.execute(
+                "UPDATE jobs SET status = 'done', result = ?, finished_at = ? WHERE id = ?",
+                (json.dumps(result), time.time(), job_id),
+            )
+
+    def fail(self, job_id, error):
+        with closing(self._connect()) as db:
+            db.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ?",
+                (error, time.time(), job_id),
+            )
+
+    def requeue_running(self, worker_pids=None):
+        """
+        Return jobs interrupted by a dead worker to the queue.
+
+        Jobs that were already claimed max_attempts times are marked failed
+        instead, so a video that crashes its worker is not retried forever.
+
+        Args:
+            worker_pids: Only consider jobs claimed by these (dead) workers; by
+                default every running job whose worker process no longer exists,
+                including one whose pid now belongs to an unrelated process
+
+        Returns:
+            Number of jobs requeued
+        """
+        requeued = 0
+        with closing(self._connect()) as db:
+            db.execute("BEGIN IMMEDIATE")
+            rows = db.execute(
+                "SELECT id, attempts, worker_pid, worker_token FROM jobs WHERE status = 'running'"
+            ).fetchall()
+            for row in rows:
+                if worker_pids is not None:
+                    if row["worker_pid"] not in worker_pids:
+                        continue
+                elif row["worker_token"] is not None:
+                    # After a restart the pid may have been reused; the start time tells them apart
+                    if process_identity(row["worker_pid"]) == row["worker_token"]:
+                        continue
+                elif pid_alive(row["worker_pid"]):
+                    continue
+                if row["attempts"] >= self.max_attempts:
+                    logger.error("Job %s interrupted %d times, giving up", row["id"], row["attempts"])
+                    db.execute(
+                        "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ?",
+                        (f"Worker exited while processing the job ({row['attempts']} attempts)", time.time(), row["id"]),
+                    )
+                else:
+                    db.execute(
+                        "UPDATE jobs SET status = 'queued', worker_pid = NULL, worker_token = NULL WHERE id = ?",
+                        (row["id"],),
+                    )
+                    requeued += 1
+            db.execute("COMMIT")
+        return requeued
+
+    def get(self, job_id):
+        with closing(self._connect()) as db:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row is not None else None
+
+    def pending_callbacks(self, limit=20):
+        with closing(self._connect()) as db:
+            rows = db.execute(
+                "SELECT * FROM jobs WHERE status IN ('done', 'failed') AND callback_url IS NOT NULL "
+                "AND callback_sent = 0 ORDER BY finished_at LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def claim_callback(self, job_id):
+        """Mark a job's callback as sent; False if another process claimed it first."""
+        with closing(self._connect()) as db:
+            return db.execute(
+                "UPDATE jobs SET callback_sent = 1 WHERE id = ? AND callback_sent = 0", (job_id,)
+            ).rowcount == 1
+
+    def stats(self):
+        with closing(self._connect()) as db:
+            counts = dict(db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {
+            "queued": counts.get("queued", 0),
+            "running": counts.get("running", 0),
+            "done": counts.get("done", 0),
+            "failed": counts.get("failed", 0),
+            "max_depth": self.max_depth,
+        }
+
+    @staticmethod
+    def _to_dict(row):
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+
+def deliver_pending_callbacks(store, post, limit=20):
+    """
+    Notify the callback URLs of finished jobs.
+
+    Each callback is claimed atomically before it is sent, so concurrent
+    deliverers never POST the same job twice. Delivery is best effort: a
+    callback that fails is logged and not retried, since the caller can
+    still poll the job.
+
+    Args:
+        store: JobStore holding the jobs
+        post: Callable taking a job dict and notifying its callback_url
+        limit: Callbacks sent per call
+
+    Returns:
+        Number of callbacks attempted
+    """
+    attempted = 0
+    for job in store.pending_callbacks(limit):
+        if not store.claim_callback(job["id"]):
+            continue
+        attempted += 1
+        try:
+            post(job)
+        except Exception as e:
+            logger.warning("Callback for job %s failed: %s", job["id"], e)
+    return attempted
+
+
+def run_job(store, job, fetch, registry, cache=None):
+    """Fetch and classify one claimed job and record its result or error."""
+    from crime_detection import config
+    from crime_detection.result_cache import make_key
+
+    path = None
+    try:
+        path, content_hash = fetch(job["payload"]["video_url"])
+        key = make_key(content_hash, registry.version, config.FRAME_SAMPLING)
+        result = cache.get(key) if cache else None
+        if result is None:
+            result = registry.predict(path)
+            if cache:
+                cache.put(key, result)
+        store.complete(job["id"], result)
+        logger.info("Job %s done: %s", job["id"], result["crime_type"])
+    except Exception as e:
+        logger.error("Job %s failed: %s", job["id"], e)
+        store.fail(job["id"], str(e))
+    finally:
+        if path and os.path.exists(path):
+            os.remove(path)
+
+
+def _worker_main(db_path, fetcher_spec, num_threads, poll_interval, cache_db_path):
+    """Entry point of one worker process: load the model once, then drain the queue."""
+    import torch
+    from crime_detection.registry import ModelRegistry
+    from crime_detection.result_cache import ResultCache
+
+    logging.basicConfig(level=logging.INFO)
+    # Exit with the process that started the pool instead of outliving it as an orphan
+    parent = os.getppid()
+    torch.set_num_threads(num_threads)
+    store = JobStore(db_path)
+    fetch = load_fetcher(fetcher_spec)
+    registry = ModelRegistry()
+    cache = ResultCache(db_path=cache_db_path) if cache_db_path else None
+    logger.info("Job worker %d ready with %d threads", os.getpid(), num_threads)
+
+    while os.getppid() == parent:
+        job = store.claim_next()
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+        run_job(store, job, fetch, registry, cache)
+
+
+class WorkerPool:
+    """
+    Pool of worker processes, each with its own resident model.
+
+    A monitor thread replaces workers that exit (a decoder segfault, the OOM
+    killer) and requeues only the jobs those workers held.
+    """
+
+    def __init__(self, db_path, num_workers=None, fetcher=DEFAULT_FETCHER, threads_per_worker=None,
+                 poll_interval=0.5, cache_db_path=None, max_attempts=3, monitor_interval=2.0):
+        cores = os.cpu_count() or 1
+        self.db_path = db_path
+        self.num_workers = cores if num_workers is None else num_workers
+        self.fetcher = fetcher
+        self.threads_per_worker = threads_per_worker or max(1, cores // max(1, self.num_workers))
+        self.poll_interval = poll_interval
+        self.cache_db_path = cache_db_path
+        self.max_attempts = max_attempts
+        self.monitor_interval = monitor_interval
+        self.restarts = 0
+        self._processes = []
+        self._stopping = threading.Event()
+        self._monitor = None
+        # Spawn rather than fork so workers do not inherit the server's event loop or torch state
+        self._context = multiprocessing.get_context("spawn")
+
+    def _spawn(self):
+        process = self._context.Process(
+            target=_worker_main,
+            args=(self.db_path, self.fetcher, self.threads_per_worker, self.poll_interval, self.cache_db_path),
+            daemon=True,
+        )
+        process.start()
+        return process
+
+    def start(self):
+        if self.num_workers == 0:
+            return
+        self._stopping.clear()
+        self._processes = [self._spawn() for _ in range(self.num_workers)]
+        self._monitor = threading.Thread(target=self._supervise, name="job-pool-monitor", daemon=True)
+        self._monitor.start()
+        logger.info("Started %d job workers", self.num_workers)
+
+    def _supervise(self):
+        store = JobStore(self.db_path, max_attempts=self.max_attempts)
+        while not self._stopping.wait(self.monitor_interval):
+            try:
+                self.restart_dead(store)
+            except Exception as e:
+                logger.error("Error supervising job workers: %s", e)
+
+    def restart_dead(self, store):
+        """Replace exited workers and requeue (or fail) the jobs they held."""
+        for index, process in enumerate(self._processes):
+            if process.is_alive() or self._stopping.is_set():
+                continue
+            requeued = store.requeue_running(worker_pids=[process.pid])
+            logger.warning("Job worker %d exited with code %s (%d jobs requeued), restarting",
+                           process.pid, process.exitcode, requeued)
+            self._processes[index] = self._spawn()
+            self.restarts += 1
+
+    def stop(self):
+        self._stopping.set()
+        if self._monitor is not None:
+            self._monitor.join(timeout=10)
+            self._monitor = None
+        for process in self._processes:
+            process.terminate()
+        for process in self._processes:
+            process.join(timeout=10)
+        self._processes = []
+
+    def alive(self):
+        return sum(process.is_alive() for process in self._processes)
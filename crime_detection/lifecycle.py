@@ -0,0 +1,89 @@
+
+"""
+Background model loading and readiness reporting.
+
+Importing this module does not import torch, cv2 or numpy, so a server can
+bind its port and answer liveness probes while the weights load in a
+background thread. Readiness endpoints report ModelLoader.describe().
+"""
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def _load_registry():
+    from crime_detection.registry import get_registry
+
+    # A server started by plain uvicorn has no thread budget of its own, so it follows the
+    # artifact's tuned count; under the prefork launcher the registry already exists
+    return get_registry(apply_thread_hint=True)
+
+
+class ModelLoader:
+    """
+    Loads the model registry once in a background thread and tracks its state.
+
+    States move from "idle" to "loading" to either "ready" or "failed".
+    """
+
+    def __init__(self, load_fn=_load_registry):
+        self.load_fn = load_fn
+        self.state = "idle"
+        self.error = None
+        self.registry = None
+        self.started_at = None
+        self.finished_at = None
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Begin loading unless a load is already running or finished."""
+        with self._lock:
+            if self.state != "idle":
+                return
+            self.state = "loading"
+            self.started_at = time.time()
+        threading.Thread(target=self._run, name="model-loader", daemon=True).start()
+
+    def _run(self):
+        try:
+            self.registry = self.load_fn()
+            self.state = "ready"
+        except Exception as e:
+            logger.exception("Model failed to load")
+            self.error = str(e)
+            self.state = "failed"
+        finally:
+            self.finished_at = time.time()
+            self._done.set()
+
+    @property
+    def ready(self):
+        return self.state == "ready"
+
+    def wait(self, timeout=None):
+        """Block until loading finished; True if the model is ready."""
+        self._done.wait(timeout)
+        return self.ready
+
+    def describe(self):
+        info = {"state": self.state}
+        if self.started_at is not None:
+            end = self.finished_at or time.time()
+            info["seconds_since_start" if self.finished_at is None else "load_seconds"] = end - self.started_at
+        if self.error:
+            info["error"] = self.error
+        if self.registry is not None:
+            info.update({
+                "version": self.registry.version,
+                "model_path": self.registry.model_path,
+                "device": str(self.registry.device),
+                "loaded_at": self.registry.loaded_at,
+            })
+        return info
+
+
+model_loader = ModelLoader()
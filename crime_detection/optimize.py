@@ -0,0 +1,239 @@
+
+"""
+Export a CPU-optimized C3D inference artifact.
+
+The fp32 checkpoint is converted to a frozen TorchScript graph with int8
+dynamic quantization of fc6/fc7/fc8, channels_last_3d convolutions, dropout
+stripped, and a tuned intra-op thread count stored alongside. Point
+MODEL_PATH at the resulting .pt file to serve it instead of the raw .pth.
+
+    python -m crime_detection.optimize --output crime_detection/models/c3d_cpu.pt
+"""
+
+import argparse
+import copy
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+
+import torch
+import torch.nn as nn
+
+from crime_detection import config
+from crime_detection.network.c3d import C3DPretrained
+from crime_detection.registry import load_model_file
+
+logger = logging.getLogger(__name__)
+
+METADATA_FILE = "inference.json"
+
+
+class ChannelsLast3d(nn.Module):
+    """Convert the input to channels_last_3d so Conv3d runs on the NDHWC kernels."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, x):
+        return self.model(x.contiguous(memory_format=torch.channels_last_3d))
+
+
+def load_fp32(model_path, num_classes):
+    if os.path.exists(model_path):
+        model, _ = load_model_file(model_path, torch.device("cpu"), num_classes)
+        return model
+    logger.warning("Model file not found at %s, exporting an initialized model", model_path)
+    return C3DPretrained(num_classes=num_classes).eval()
+
+
+def build_optimized(model, example):
+    """
+    Quantize, convert and freeze a copy of an fp32 model.
+
+    Returns:
+        Frozen TorchScript module
+    """
+    model = copy.deepcopy(model).eval()
+    model = model.to(memory_format=torch.channels_last_3d)
+    # fc6 alone is 8192x4096 fp32 (128 MB); int8 weights are a quarter of that
+    model = torch.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+    wrapped = ChannelsLast3d(model).eval()
+    with torch.no_grad():
+        traced = torch.jit.trace(wrapped, example)
+    try:
+        # Freezing inlines weights and removes the eval-mode dropout nodes
+        return torch.jit.freeze(traced)
+    except RuntimeError as e:
+        logger.warning("Could not freeze the traced graph, saving it unfrozen: %s", e)
+        return traced
+
+
+def measure_latency(model, example, runs=10, warmup=2):
+    with torch.no_grad():
+        for _ in range(warmup):
+            model(example)
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            model(example)
+            timings.append((time.perf_counter() - start) * 1000.0)
+    timings.sort()
+    return {"mean_ms": sum(timings) / len(timings), "p50_ms": timings[len(timings) // 2]}
+
+
+def tune_threads(model, example, candidates=None, runs=5):
+    """Pick the intra-op thread count with the lowest latency."""
+    cores = os.cpu_count() or 1
+    candidates = candidates or sorted({1, 2, 4, cores // 2, cores} - {0})
+    original = torch.get_num_threads()
+    results = {}
+    for threads in candidates:
+        if threads > cores:
+            continue
+        torch.set_num_threads(threads)
+        results[threads] = measure_latency(model, example, runs=runs)["mean_ms"]
+    torch.set_num_threads(original)
+    best = min(results, key=results.get)
+    return best, results
+
+
+def compare_accuracy(fp32_model, optimized_model, data_dir=None, num_clips=16, batch_size=4):
+    """
+    Compare fp32 and optimized predictions.
+
+    With data_dir, top-1 accuracy of both models is measured on
+    CrimeVideoDataset; otherwise random clips are used and only prediction
+    agreement and probability drift are reported.
+    """
+    if data_dir:
+        from crime_detection.data.dataset import CrimeVideoDataset
+        from crime_detection.utils.video_utils import frames_to_clip
+
+        dataset = CrimeVideoDataset(data_dir, max_frames=config.CLIP_LEN, frame_size=config.FRAME_SIZE)
+
+        def batches():
+            for start in range(0, len(dataset), batch_size):
+                items = [dataset.decode_clip(path) for path, _ in dataset.samples[start:start + batch_size]]
+                labels = [label for _, label in dataset.samples[start:start + batch_size]]
+                yield torch.stack([frames_to_clip(frames) for frames in items]), torch.tensor(labels)
+    else:
+        generator = torch.Generator().manual_seed(0)
+        shape = (batch_size, 3, config.CLIP_LEN, config.FRAME_SIZE, config.FRAME_SIZE)
+
+        def batches():
+            for _ in range(max(1, num_clips // batch_size)):
+                yield torch.randn(shape, generator=generator), None
+
+    total = agree = fp32_correct = opt_correct = 0
+    max_drift = 0.0
+    with torch.no_grad():
+        for clips, labels in batches():
+            fp32_probs = torch.softmax(fp32_model(clips), dim=1)
+            opt_probs = torch.softmax(optimized_model(clips), dim=1)
+            fp32_pred, opt_pred = fp32_probs.argmax(1), opt_probs.argmax(1)
+            total += len(clips)
+            agree += (fp32_pred == opt_pred).sum().item()
+            max_drift = max(max_drift, (fp32_probs - opt_probs).abs().max().item())
+            if labels is not None:
+                fp32_correct += (fp32_pred == labels).sum().item()
+                opt_correct += (opt_pred == labels).sum().item()
+
+    report = {"samples": total, "agreement": agree / total if total else 0.0, "max_prob_drift": max_drift}
+    if data_dir and total:
+        report["fp32_accuracy"] = fp32_correct / total
+        report["optimized_accuracy"] = opt_correct / total
+        report["accuracy_delta"] = report["optimized_accuracy"] - report["fp32_accuracy"]
+    return report
+
+
+_RSS_PROBE = """
+import sys, torch
+from crime_detection.registry import load_model_file
+load_model_file(sys.argv[1], torch.device("cpu"), int(sys.argv[2]))
+with open("/proc/self/status") as f:
+    print(next(int(line.split()[1]) for line in f if line.startswith("VmRSS:")))
+"""
+
+
+def measure_rss_mb(model_path, num_classes):
+    """Resident memory (MB) of a fresh interpreter after loading a model file; Linux only."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=root)
+    try:
+        output = subprocess.check_output([sys.executable, "-c", _RSS_PROBE, model_path, str(num_classes)], env=env)
+    except (subprocess.CalledProcessError, OSError) as e:
+        logger.warning("Could not measure RSS for %s: %s", model_path, e)
+        return None
+    return int(output.strip()) / 1024.0
+
+
+def export(model_path, output_path, data_dir=None, batch_size=1, class_names=None):
+    """
+    Build, save and evaluate the optimized artifact.
+
+    Returns:
+        Report dict with thread tuning, latency, accuracy and memory figures
+    """
+    class_names = list(class_names or config.CLASS_NAMES)
+    example = torch.randn(batch_size, 3, config.CLIP_LEN, config.FRAME_SIZE, config.FRAME_SIZE)
+
+    fp32_model = load_fp32(model_path, len(class_names))
+    optimized = build_optimized(fp32_model, example)
+
+    threads, thread_sweep = tune_threads(optimized, example)
+    torch.set_num_threads(threads)
+    fp32_latency = measure_latency(fp32_model, example)
+    optimized_latency = measure_latency(optimized, example)
+    accuracy = compare_accuracy(fp32_model, optimized, data_dir=data_dir)
+
+    metadata = {
+        "format": "c3d-cpu-int8",
+        "source": os.path.abspath(model_path),
+        "class_names": class_names,
+        "clip_shape": [3, config.CLIP_LEN, config.FRAME_SIZE, config.FRAME_SIZE],
+        "num_threads": threads,
+    }
+    torch.jit.save(optimized, output_path, _extra_files={METADATA_FILE: json.dumps(metadata)})
+
+    report = {
+        "output": output_path,
+        "num_threads": threads,
+        "thread_sweep_ms": thread_sweep,
+        "batch_size": batch_size,
+        "fp32_latency": fp32_latency,
+        "optimized_latency": optimized_latency,
+        "speedup": fp32_latency["mean_ms"] / optimized_latency["mean_ms"],
+        "accuracy": accuracy,
+        "file_size_mb": {
+            "fp32": os.path.getsize(model_path) / (1 << 20) if os.path.exists(model_path) else None,
+            "optimized": os.path.getsize(output_path) / (1 << 20),
+        },
+    }
+    if os.path.exists(model_path):
+        fp32_rss = measure_rss_mb(model_path, len(class_names))
+        optimized_rss = measure_rss_mb(output_path, len(class_names))
+        report["rss_mb"] = {"fp32": fp32_rss, "optimized": optimized_rss}
+        if fp32_rss and optimized_rss:
+            report["rss_mb"]["reduction"] = fp32_rss - optimized_rss
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a CPU-optimized C3D inference artifact")
+    parser.add_argument("--model", default=config.MODEL_PATH, help="fp32 .pth checkpoint")
+    parser.add_argument("--output", default=os.path.join(config.MODEL_DIR, "c3d_cpu.pt"))
+    parser.add_argument("--data", help="CrimeVideoDataset root for measuring the accuracy delta")
+    parser.add_argument("--batch-size", type=int, default=1, help="Batch size used for tracing and timing")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    report = export(args.model, args.output, data_dir=args.data, batch_size=args.batch_size)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
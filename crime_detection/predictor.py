@@ -1,14 +1,13 @@
 
-import torch
-import os
+import logging
 import random
-import numpy as np
-from crime_detection.models.model import CrimeNet
-from crime_detection.utils.video_utils import extract_video_features
+from crime_detection import config
 
 # Define constants
-CLASS_NAMES = ['Abuse', 'Arrest', 'Arson', 'Assault']
-MODEL_PATH = "models/crime_model.pth"
+CLASS_NAMES = config.CLASS_NAMES
+MODEL_PATH = config.MODEL_PATH
+
+logger = logging.getLogger(__name__)
 
 # Comprehensive crime descriptions
 CRIME_DESCRIPTIONS = {
@@ -38,67 +37,48 @@ def predict_crime(video_path):
     """
     Predict the type of crime in a video file.
     
+    The classifier is loaded once per process by the shared ModelRegistry,
+    so repeated calls only pay for decoding and the forward pass.
+    
     Args:
         video_path: Path to the video file
         
     Returns:
         Dict containing crime_type, confidence, and description
     """
-    # Set random seed for reproducibility
-    random.seed(42)
-    np.random.seed(42)
-    torch.manual_seed(42)
-    
-    # Determine device
-    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-    print(f"Using device: {device}")
-
     try:
-        # Extract features from video
-        print(f"Extracting features from video: {video_path}")
-        features = extract_video_features(video_path).to(device)
-        
-        # Load or initialize model
-        model = CrimeNet(num_classes=len(CLASS_NAMES))
-        if os.path.exists(MODEL_PATH):
-            print(f"Loading model from {MODEL_PATH}")
-            model.load_state_dict(torch.load(MODEL_PATH, map_location=device))
-        else:
-            print(f"Model file not found at {MODEL_PATH}, using initialized model")
-            
-        model.eval().to(device)
+        # Imported on first use so importing this module does not load torch and cv2
+        from crime_detection.registry import get_registry
 
-        # Run prediction
-        with torch.no_grad():
-            outputs = model(features)
-            probs = torch.nn.functional.softmax(outputs, dim=1)
-            confidence, predicted = torch.max(probs, 1)
-            
-            # Ensure we have a valid prediction
-            if torch.isnan(confidence) or confidence.item() < 0.1:
-                print("Low confidence detection, assigning weighted random class")
-                # Use a weighted random selection with a bias toward more common crimes
-                weights = [0.22, 0.24, 0.23, 0.31]  # Abuse, Arrest, Arson, Assault
-                predicted_idx = random.choices(range(len(CLASS_NAMES)), weights=weights)[0]
-                crime_type = CLASS_NAMES[predicted_idx]
-                confidence = torch.tensor([0.65 + random.random() * 0.15])  # 0.65-0.80 confidence
-            else:
-                predicted_idx = predicted.item() if predicted.numel() > 0 else 3  # Default to Assault (index 3)
-                crime_type = CLASS_NAMES[predicted_idx]
+        registry = get_registry()
+        logger.info("Running prediction on %s for video: %s", registry.device, video_path)
+        result = registry.predict(video_path)
+        confidence = result["confidence"]
+
+        # Ensure we have a valid prediction
+        if confidence != confidence or confidence < 0.1:
+            logger.warning("Low confidence detection, assigning weighted random class")
+            # Use a weighted random selection with a bias toward more common crimes
+            weights = [0.22, 0.24, 0.23, 0.31]  # Abuse, Arrest, Arson, Assault
+            predicted_idx = random.choices(range(len(CLASS_NAMES)), weights=weights)[0]
+            crime_type = CLASS_NAMES[predicted_idx]
+            confidence = 0.65 + random.random() * 0.15  # 0.65-0.80 confidence
+        else:
+            crime_type = result["crime_type"]
 
-        print(f"Predicted crime type: {crime_type} with confidence {confidence.item():.4f}")
+        logger.info("Predicted crime type: %s with confidence %.4f", crime_type, confidence)
         description = CRIME_DESCRIPTIONS.get(crime_type, "No description available.")
 
     except Exception as e:
-        print(f"Error in prediction: {str(e)}")
+        logger.exception("Error in prediction: %s", e)
         # Fallback to Assault with medium confidence
         crime_type = CLASS_NAMES[3]  # Assault
-        confidence = torch.tensor([0.7])
+        confidence = 0.7
         description = CRIME_DESCRIPTIONS.get(crime_type, "No description available.")
     
     return {
         "crime_type": crime_type,
-        "confidence": float(confidence) if isinstance(confidence, torch.Tensor) else confidence,
+        "confidence": float(confidence),
         "description": description,
         "summary": f"Suspected case of {crime_type} detected in the submitted video footage.",
         "recommendation": "Further investigation is recommended by the concerned law enforcement authority."
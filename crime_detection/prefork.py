@@ -0,0 +1,139 @@
+
+"""
+Preload-then-fork launcher for the model service.
+
+The master process loads the weights once, moves them into shared memory
+and then forks the uvicorn workers, which serve from the same physical copy
+instead of each loading their own. Workers that exit are re-forked from the
+master, so they also start without reloading. Linux/macOS only (needs fork).
+
+    python -m crime_detection.prefork model_service.main:app --workers 4 --port 8000
+
+A worker that hot-reloads a changed checkpoint holds a private copy of the
+new weights until the service is restarted.
+"""
+
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def bind_socket(host, port, backlog=2048):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def preload():
+    """Load the shared registry in the master process."""
+    import torch
+    from crime_detection.registry import preload_registry
+
+    # With one thread, loading runs inline and no OpenMP pool exists to be broken by fork
+    torch.set_num_threads(1)
+    start = time.perf_counter()
+    registry = preload_registry(share_memory=True)
+    logger.info("Preloaded model version %s in %.2fs", registry.version, time.perf_counter() - start)
+    return registry
+
+
+def serve_worker(app, sock, index, threads, log_level):
+    """Body of a forked worker: size its thread pool, warm up, then run uvicorn on the shared socket."""
+    import torch
+    import uvicorn
+    from crime_detection.registry import get_registry
+
+    torch.set_num_threads(threads)
+    # Only the first worker owns the job queue: its worker pool, requeueing and callbacks
+    os.environ["JOB_POOL_OWNER"] = "1" if index == 0 else "0"
+    if index > 0:
+        os.environ["JOB_WORKERS"] = "0"
+    get_registry().warmup()
+
+    server = uvicorn.Server(uvicorn.Config(app, log_level=log_level))
+    server.run(sockets=[sock])
+
+
+def run(app, host="0.0.0.0", port=8000, workers=2, threads_per_worker=None, log_level="info"):
+    """
+    Preload the model, fork workers and supervise them until SIGINT/SIGTERM.
+    """
+    threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+    preload()
+    sock = bind_socket(host, port)
+    # Keep objects created so far out of the cyclic GC, whose bookkeeping writes would un-share their pages
+    gc.freeze()
+
+    children = {}
+    stopping = False
+
+    def spawn(index):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            code = 0
+            try:
+                serve_worker(app, sock, index, threads_per_worker, log_level)
+            except Exception:
+                logger.exception("Worker %d crashed", index)
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = index
+        logger.info("Started worker %d (pid %d) with %d threads", index, pid, threads_per_worker)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    for index in range(workers):
+        spawn(index)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        index = children.pop(pid, None)
+        if index is None or stopping:
+            continue
+        logger.warning("Worker %d (pid %d) exited with status %d, restarting", index, pid, status)
+        time.sleep(1.0)
+        spawn(index)
+    sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve an app from workers forked after loading the model")
+    parser.add_argument("app", nargs="?", default="model_service.main:app", help="ASGI app as module:attribute")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", 8000)))
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, help="Intra-op threads per worker (default: cores / workers)")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    run(args.app, host=args.host, port=args.port, workers=args.workers,
+        threads_per_worker=args.threads, log_level=args.log_level)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+
+import json
+import logging
+import os
+import random
+import threading
+import time
+import zipfile
+
+import numpy as np
+import torch
+
+from crime_detection import config
+from crime_detection.network.c3d import C3DPretrained
+from crime_detection.telemetry import metrics, span
+from crime_detection.utils.video_utils import extract_video_features
+
+logger = logging.getLogger(__name__)
+
+MODEL_LOAD_SECONDS = metrics.gauge("crime_detection_model_load_seconds", "Duration of the last model load")
+
+
+def _extract_state_dict(checkpoint):
+    """Accept either a bare state_dict or a training checkpoint wrapping one."""
+    if isinstance(checkpoint, dict):
+        for key in ("model_state_dict", "state_dict"):
+            if key in checkpoint and isinstance(checkpoint[key], dict):
+                return checkpoint[key]
+    return checkpoint
+
+
+def is_torchscript(path):
+    """True if path is a TorchScript archive (e.g. from crime_detection.optimize) rather than a checkpoint."""
+    if not zipfile.is_zipfile(path):
+        return False
+    with zipfile.ZipFile(path) as archive:
+        return any("/code/" in name for name in archive.namelist())
+
+
+def load_model_file(path, device, num_classes):
+    """
+    Load either a state_dict checkpoint or an optimized TorchScript artifact.
+
+    Returns:
+        (model in eval mode, metadata dict)
+    """
+    if is_torchscript(path):
+        extra_files = {"inference.json": ""}
+        model = torch.jit.load(path, map_location=device, _extra_files=extra_files)
+        metadata = json.loads(extra_files["inference.json"] or "{}")
+        return model.eval(), metadata
+
+    model = C3DPretrained(num_classes=num_classes)
+    checkpoint = torch.load(path, map_location=device)
+    model.load_state_dict(_extract_state_dict(checkpoint))
+    return model.eval().to(device), {}
+
+
+class ModelRegistry:
+    """
+    Long-lived holder for the crime classifier.
+
+    Weights are loaded once, warmed up, and kept resident. The checkpoint file
+    is polled at most every `reload_interval` seconds and the model is swapped
+    atomically when its mtime or size changes.
+
+    The intra-op thread count is process-wide and belongs to the caller.
+    Optimized artifacts record the count they were tuned for as thread_hint;
+    it is only applied when apply_thread_hint is set, for entry points that
+    have no thread budget of their own.
+    """
+
+    def __init__(self, model_path=None, device=None, class_names=None,
+                 batch_size=8, reload_interval=None, warmup=True, apply_thread_hint=False):
+        self.model_path = model_path or config.MODEL_PATH
+        self.device = torch.device(device or ('cuda' if torch.cuda.is_available() else 'cpu'))
+        self.class_names = list(class_names or config.CLASS_NAMES)
+        self.batch_size = batch_size
+        self.reload_interval = config.MODEL_RELOAD_INTERVAL if reload_interval is None else reload_interval
+        self.warmup_enabled = warmup
+        self.apply_thread_hint = apply_thread_hint
+
+        self.model = None
+        self.metadata = {}
+        self.loaded_at = None
+        self.load_seconds = None
+        self._signature = None
+        self._failed_signature = None
+        self._missing_warned = False
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+
+        # Seed once so an uninitialized model is reproducible across restarts
+        random.seed(42)
+        np.random.seed(42)
+        torch.manual_seed(42)
+
+        self.load()
+
+    @property
+    def thread_hint(self):
+        """Intra-op thread count an optimized artifact was tuned for, or None."""
+        return self.metadata.get("num_threads")
+
+    @property
+    def version(self):
+        """Identifier of the weights currently being served."""
+        if self._signature is None:
+            return "initialized"
+        mtime, size = self._signature
+        return f"{int(mtime)}-{size}"
+
+    def _checkpoint_signature(self):
+        try:
+            stat = os.stat(self.model_path)
+        except OSError:
+            return None
+        return (stat.st_mtime, stat.st_size)
+
+    def _build_model(self):
+        """
+        Returns:
+            (model in eval mode, metadata dict)
+        """
+        if not os.path.exists(self.model_path):
+            # Random weights are only acceptable before anything was served
+            if self.model is not None:
+                raise FileNotFoundError(f"Model file not found at {self.model_path}")
+            logger.warning("Model file not found at %s, using initialized model", self.model_path)
+            return C3DPretrained(num_classes=len(self.class_names)).eval().to(self.device), {}
+
+        logger.info("Loading model from %s", self.model_path)
+        model, metadata = load_model_file(self.model_path, self.device, len(self.class_names))
+        threads = metadata.get("num_threads")
+        if self.apply_thread_hint and threads:
+            torch.set_num_threads(threads)
+        return model, metadata
+
+    def load(self):
+        """(Re)load weights from disk and swap them in."""
+        start = time.perf_counter()
+        signature = self._checkpoint_signature()
+        model, metadata = self._build_model()
+        if self.warmup_enabled:
+            self._warmup(model)
+        with self._lock:
+            self.model = model
+            self.metadata = metadata
+            self._signature = signature
+            self.loaded_at = time.time()
+            self.load_seconds = time.perf_counter() - start
+        MODEL_LOAD_SECONDS.set(self.load_seconds)
+        logger.info("Model ready on %s in %.2fs (version %s)", self.device, self.load_seconds, self.version)
+
+    def warmup(self):
+        """Run one dummy forward pass on the current model."""
+        self._warmup(self.model)
+
+    def share_memory(self):
+        """
+        Move the weights into shared memory, so processes forked afterwards
+        map the same physical pages instead of holding a copy each.
+        """
+        try:
+            self.model.share_memory()
+        except RuntimeError as e:
+            # Packed quantized weights cannot move; forked workers still share them copy-on-write
+            logger.warning("Could not move weights to shared memory: %s", e)
+        return self
+
+    def _warmup(self, model):
+        dummy = torch.zeros(1, 3, config.CLIP_LEN, config.FRAME_SIZE, config.FRAME_SIZE, device=self.device)
+        with torch.no_grad():
+            model(dummy)
+
+    def maybe_reload(self):
+        """Reload the model if the checkpoint changed since it was loaded."""
+        now = time.monotonic()
+        if now - self._last_check < self.reload_interval:
+            return False
+        self._last_check = now
+        signature = self._checkpoint_signature()
+        if signature is None:
+            # A checkpoint deleted or moved while serving leaves the current weights in place
+            if self._signature is not None and not self._missing_warned:
+                logger.warning("Checkpoint %s disappeared, keeping model version %s", self.model_path, self.version)
+                self._missing_warned = True
+            return False
+        self._missing_warned = False
+        # A file that already failed to load is retried once it changes again
+        if signature == self._signature or signature == self._failed_signature:
+            return False
+        # Only one caller reloads; the others keep using the current weights
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+        try:
+            logger.info("Checkpoint %s changed, reloading", self.model_path)
+            self.load()
+        except Exception as e:
+            # Keep serving (and reporting the version of) the previous weights if the
+            # new file is half-written or corrupt
+            logger.error("Reload failed, keeping previous model: %s", e)
+            self._failed_signature = signature
+            return False
+        finally:
+            self._reload_lock.release()
+        return True
+
+    def predict_clips(self, clips):
+        """
+        Run the classifier on a batch of preprocessed clips.
+
+        Args:
+            clips: Tensor of shape [N, 3, T, H, W]
+
+        Returns:
+            Tensor of class probabilities with shape [N, num_classes]
+        """
+        self.maybe_reload()
+        model = self.model
+        with span("forward"), torch.no_grad():
+            outputs = model(clips.to(self.device))
+            return torch.nn.functional.softmax(outputs, dim=1).cpu()
+
+    def embed_clips(self, clips):
+        """
+        Run the classifier and also return the fc7 embedding of each clip.
+
+        Args:
+            clips: Tensor of shape [N, 3, T, H, W]
+
+        Returns:
+            (class probabilities [N, num_classes], fc7 features [N, 4096])
+        """
+        self.maybe_reload()
+        model = self.model
+        if not isinstance(model, C3DPretrained):
+            raise ValueError("Embeddings need the fp32 C3DPretrained checkpoint, not an optimized TorchScript artifact")
+        with span("forward"), torch.no_grad():
+            features = model.c3d(clips.to(self.device))
+            probs = torch.nn.functional.softmax(model.fc8(features), dim=1)
+        return probs.cpu(), features.cpu()
+
+    def to_result(self, probs):
+        """Turn one row of class probabilities into a result dict."""
+        confidence, predicted = torch.max(probs, 0)
+        return {
+            "crime_type": self.class_names[predicted.item()],
+            "confidence": float(confidence),
+            "scores": {name: float(p) for name, p in zip(self.class_names, probs.tolist())},
+        }
+
+    def predict(self, video_path):
+        """
+        Classify a single video file.
+
+        Returns:
+            Dict containing crime_type, confidence and per-class scores
+        """
+        with span("decode"):
+            clip = extract_video_features(video_path)
+        return self.to_result(self.predict_clips(clip)[0])
+
+    def predict_many(self, video_paths):
+        """
+        Classify several video files, batching their clips through the model.
+
+        A video that cannot be decoded does not fail the others: its slot holds
+        {"error": message} instead of a result.
+
+        Returns:
+            List of result dicts in the same order as video_paths
+        """
+        results = [None] * len(video_paths)
+        for start in range(0, len(video_paths), self.batch_size):
+            indices, clips = [], []
+            for index in range(start, min(start + self.batch_size, len(video_paths))):
+                try:
+                    with span("decode"):
+                        clips.append(extract_video_features(video_paths[index]))
+                    indices.append(index)
+                except Exception as e:
+                    logger.warning("Could not decode %s: %s", video_paths[index], e)
+                    results[index] = {"error": str(e)}
+            if clips:
+                probs = self.predict_clips(torch.cat(clips))
+                for index, p in zip(indices, probs):
+                    results[index] = self.to_result(p)
+        return results
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry(apply_thread_hint=False):
+    """
+    Return the process-wide ModelRegistry, creating it on first use.
+
+    Args:
+        apply_thread_hint: If this call creates the registry, adopt the thread
+            count of an optimized artifact (see ModelRegistry)
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry(apply_thread_hint=apply_thread_hint)
+    return _registry
+
+
+def preload_registry(share_memory=True):
+    """
+    Build the process-wide ModelRegistry ahead of forking worker processes.
+
+    Warm-up is skipped: a forward pass would start the intra-op thread pool,
+    which does not survive fork, so workers warm up after forking instead.
+    """
+    global _registry
+    with _registry_lock:
+        _registry = ModelRegistry(warmup=False)
+        if share_memory:
+            _registry.share_memory()
+    return _registry
@@ -0,0 +1,138 @@
+
+import copy
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def make_key(content_hash, model_version, sampling):
+    """Cache key for one video analysed by one model with one sampling config."""
+    return f"{content_hash}:{model_version}:{sampling}"
+
+
+class ResultCache:
+    """
+    LRU + TTL cache of analysis results keyed by video content.
+
+    An optional SQLite file acts as a second tier that survives restarts;
+    entries found there are promoted back into memory. The file may be shared
+    by several processes: it runs in WAL mode with a busy timeout, and a disk
+    error is logged and treated as a miss rather than failing the analysis.
+    Disk lookups block, so async callers should run get/put in a thread.
+    """
+
+    def __init__(self, max_entries=1024, ttl_seconds=24 * 3600, db_path=None, busy_timeout=5.0):
+        """
+        Args:
+            max_entries: Entries kept in memory before the least recently used is evicted
+            ttl_seconds: Lifetime of an entry in both tiers
+            db_path: SQLite file for the persistent tier, or None for memory only
+            busy_timeout: Seconds to wait for another process's write lock on db_path
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Disk I/O has its own lock so memory hits never wait behind SQLite
+        self._db_lock = threading.Lock()
+        self._counters = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expirations": 0,
+                          "disk_errors": 0}
+
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, timeout=busy_timeout, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT, expires_at REAL)"
+            )
+            self._db.commit()
+            try:
+                self._db.execute("DELETE FROM results WHERE expires_at < ?", (time.time(),))
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.warning("Could not purge expired results from %s: %s", db_path, e)
+
+    def get(self, key):
+        """Return a copy of the cached result for key, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None:
+                value, expires_at = item
+                if expires_at >= now:
+                    self._entries.move_to_end(key)
+                    self._counters["hits"] += 1
+                    return copy.deepcopy(value)
+                del self._entries[key]
+                self._counters["expirations"] += 1
+
+        row = None
+        try:
+            with self._db_lock:
+                if self._db is not None:
+                    row = self._db.execute(
+                        "SELECT value, expires_at FROM results WHERE key = ?", (key,)
+                    ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("Result cache lookup failed, treating as a miss: %s", e)
+            self._count("disk_errors")
+
+        with self._lock:
+            if row is not None and row[1] >= now:
+                value = json.loads(row[0])
+                self._store(key, value, row[1])
+                self._counters["disk_hits"] += 1
+                return copy.deepcopy(value)
+            self._counters["misses"] += 1
+            return None
+
+    def put(self, key, value):
+        """Store a copy of a JSON-serializable result under key."""
+        expires_at = time.time() + self.ttl_seconds
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._store(key, value, expires_at)
+        try:
+            with self._db_lock:
+                if self._db is not None:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO results (key, value, expires_at) VALUES (?, ?, ?)",
+                        (key, json.dumps(value), expires_at),
+                    )
+                    self._db.commit()
+        except sqlite3.Error as e:
+            # The result stays cached in memory; only persistence is lost
+            logger.warning("Could not persist result to %s: %s", self.db_path, e)
+            self._count("disk_errors")
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _store(self, key, value, expires_at):
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["entries"] = len(self._entries)
+            stats["max_entries"] = self.max_entries
+            stats["ttl_seconds"] = self.ttl_seconds
+            stats["persistent"] = self._db is not None
+        return stats
+
+    def close(self):
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
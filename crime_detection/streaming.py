@@ -0,0 +1,473 @@
+
+"""
+Live analysis of RTSP/HTTP camera streams, device indices or looping files.
+
+Each stream has a reader thread that decodes frames with cv2.VideoCapture,
+resizes them to the clip size and writes them into a fixed-size ring buffer,
+so a slow consumer only ever loses the oldest frames. A single inference
+thread shared by all streams takes the most recent window of every stream
+that is due (one window per `stride` new frames), stacks them into one batch
+and publishes alerts for confident predictions to subscribers. Windows that
+go stale while the model is busy are dropped rather than queued, so latency
+stays bounded under overload.
+
+    python -m crime_detection.streaming rtsp://camera/stream --threshold 0.8
+    python -m crime_detection.streaming sample.mp4 --loop
+
+cv2.VideoCapture opens whatever it is given, so a server that accepts sources
+from clients passes a SourcePolicy that limits them to allowed URL schemes,
+one directory of video files and, optionally, local cameras.
+"""
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
+
+import cv2
+import numpy as np
+
+from crime_detection import config
+from crime_detection.telemetry import metrics
+
+logger = logging.getLogger(__name__)
+
+STREAM_LATENCY = metrics.histogram(
+    "crime_detection_stream_latency_seconds", "Time from the last frame of a window being captured to its prediction"
+)
+
+
+class StreamLimitReached(Exception):
+    """Raised when the analyzer already runs max_streams streams."""
+
+
+class SourcePolicy:
+    """
+    Which stream sources may be opened.
+
+    Args:
+        schemes: URL schemes allowed for network sources
+        file_dir: Directory whose video files may be streamed; None allows no files
+        allow_cameras: Whether camera indices ("0", "1", ...) may be opened
+    """
+
+    def __init__(self, schemes=("rtsp", "rtsps", "http", "https"), file_dir=None, allow_cameras=False):
+        self.schemes = {scheme.lower() for scheme in schemes}
+        self.file_dir = os.path.realpath(file_dir) if file_dir else None
+        self.allow_cameras = allow_cameras
+
+    def check(self, source):
+        """
+        Validate a source.
+
+        Returns:
+            The source to open: the URL, the camera index as a string, or the resolved file path
+        """
+        source = source.strip()
+        if source.isdigit():
+            if not self.allow_cameras:
+                raise ValueError("Camera sources are not allowed")
+            return source
+        if "://" in source:
+            parts = urlsplit(source)
+            if parts.scheme.lower() not in self.schemes or not parts.hostname:
+                raise ValueError(f"Stream URLs must use one of: {', '.join(sorted(self.schemes))}")
+            return source
+        if self.file_dir is None:
+            raise ValueError("File sources are not allowed")
+        path = os.path.realpath(os.path.join(self.file_dir, source))
+        if os.path.commonpath([path, self.file_dir]) != self.file_dir or not os.path.isfile(path):
+            raise ValueError(f"No video file {source} in the stream directory")
+        return path
+
+
+class StreamReader:
+    """
+    Background decoder filling a ring buffer with the latest frames of a source.
+
+    Args:
+        source: RTSP/HTTP URL, file path, or camera index
+        size: Frames are resized to size x size RGB
+        capacity: Frames kept in the ring buffer
+        loop: Rewind file sources at the end instead of stopping
+        realtime: Pace file sources at their frame rate, like a live camera
+        reconnect_delay: Seconds to wait before reopening a failed live source
+    """
+
+    def __init__(self, source, size=config.FRAME_SIZE, capacity=config.CLIP_LEN * 4, loop=False,
+                 realtime=True, reconnect_delay=2.0):
+        self.source = int(source) if isinstance(source, str) and source.isdigit() else source
+        self.size = size
+        self.capacity = capacity
+        self.loop = loop
+        self.realtime = realtime
+        self.reconnect_delay = reconnect_delay
+
+        self.frames = np.zeros((capacity, size, size, 3), dtype=np.uint8)
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.frames_read = 0
+        self.fps = None
+        self.error = None
+        self.finished = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def is_file(self):
+        return isinstance(self.source, str) and "://" not in self.source
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f"stream-reader-{self.source}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _open(self):
+        cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            raise IOError(f"Could not open stream {self.source}")
+        if not self.is_file:
+            # Keep the capture backend from queueing frames we would only drop later
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        self.fps = fps if fps and fps > 0 else 25.0
+        return cap
+
+    def _run(self):
+        cap = None
+        next_frame_at = time.monotonic()
+        while not self._stop.is_set():
+            if cap is None:
+                try:
+                    cap = self._open()
+                    self.error = None
+                except IOError as e:
+                    self.error = str(e)
+                    if self.is_file:
+                        logger.error("%s", e)
+                        break
+                    logger.warning("%s, retrying in %.0fs", e, self.reconnect_delay)
+                    self._stop.wait(self.reconnect_delay)
+                    continue
+
+            ret, frame = cap.read()
+            if not ret:
+                if self.is_file and self.loop:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    continue
+                cap.release()
+                cap = None
+                if self.is_file:
+                    break
+                logger.warning("Stream %s stalled, reconnecting", self.source)
+                continue
+
+            frame = cv2.resize(frame, (self.size, self.size), interpolation=cv2.INTER_AREA)
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            with self._lock:
+                slot = self.frames_read % self.capacity
+                self.frames[slot] = frame
+                self.timestamps[slot] = time.time()
+                self.frames_read += 1
+
+            if self.is_file and self.realtime:
+                next_frame_at += 1.0 / self.fps
+                delay = next_frame_at - time.monotonic()
+                if delay > 0:
+                    self._stop.wait(delay)
+                else:
+                    next_frame_at = time.monotonic()
+
+        if cap is not None:
+            cap.release()
+        self.finished = True
+
+    def latest_window(self, length=config.CLIP_LEN):
+        """
+        Copy of the most recent `length` frames.
+
+        Returns:
+            (index one past the last frame, capture time of the last frame,
+            uint8 array [length, H, W, 3]), or None until enough frames arrived
+        """
+        if length > self.capacity:
+            raise ValueError(f"A window of {length} frames does not fit a ring buffer of {self.capacity}")
+        with self._lock:
+            end = self.frames_read
+            if end < length:
+                return None
+            slots = np.arange(end - length, end) % self.capacity
+            return end, float(self.timestamps[slots[-1]]), self.frames[slots]
+
+
+class LiveStream:
+    """Per-stream scoring settings and counters."""
+
+    def __init__(self, stream_id, reader, stride, threshold, cooldown, gate):
+        self.stream_id = stream_id
+        self.reader = reader
+        self.stride = stride
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.gate = gate
+        self.last_end = 0
+        self.windows_scored = 0
+        self.windows_dropped = 0
+        self.windows_static = 0
+        self.alerts = 0
+        self.last_alert = {}
+        self.last_result = None
+        self.created_at = time.time()
+
+    def due(self):
+        return self.reader.frames_read - self.last_end >= self.stride
+
+    def exhausted(self, window):
+        """True once the reader stopped and no window is left to score."""
+        frames_read = self.reader.frames_read
+        return self.reader.finished and (frames_read - self.last_end < self.stride or frames_read < window)
+
+    def describe(self):
+        return {
+            "stream_id": self.stream_id,
+            "source": str(self.reader.source),
+            "stride": self.stride,
+            "threshold": self.threshold,
+            "frames_read": self.reader.frames_read,
+            "fps": self.reader.fps,
+            "windows_scored": self.windows_scored,
+            "windows_dropped": self.windows_dropped,
+            "windows_static": self.windows_static,
+            "alerts": self.alerts,
+            "last_result": self.last_result,
+            "error": self.reader.error,
+            "finished": self.reader.finished,
+        }
+
+
+class StreamAnalyzer:
+    """
+    Runs many live streams through one shared, batched inference thread.
+
+    Args:
+        registry_fn: Callable returning the ModelRegistry (called from the inference thread)
+        max_streams: Largest number of concurrent streams
+        max_batch_size: Windows per forward pass
+        window: Frames per window
+        tick: Idle sleep of the inference thread in seconds
+        source_policy: SourcePolicy every added source must pass; None trusts all sources
+    """
+
+    def __init__(self, registry_fn=None, max_streams=16, max_batch_size=16, window=config.CLIP_LEN, tick=0.02,
+                 source_policy=None):
+        if registry_fn is None:
+            from crime_detection.registry import get_registry as registry_fn
+        self.registry_fn = registry_fn
+        self.source_policy = source_policy
+        self.max_streams = max_streams
+        self.max_batch_size = max_batch_size
+        self.window = window
+        self.tick = tick
+        self.streams = {}
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_stream(self, source, stream_id=None, stride=config.CLIP_LEN // 2, threshold=0.8, cooldown=10.0,
+                   loop=False, gate=None):
+        """
+        Start reading a source and scoring it every `stride` frames.
+
+        Returns:
+            The stream id
+        """
+        if stride <= 0:
+            raise ValueError("stride must be positive")
+        if self.source_policy is not None:
+            source = self.source_policy.check(source)
+        stream_id = stream_id or uuid.uuid4().hex[:12]
+        self._reap()
+        with self._lock:
+            if stream_id in self.streams:
+                raise ValueError(f"Stream {stream_id} already exists")
+            if len(self.streams) >= self.max_streams:
+                raise StreamLimitReached(f"At most {self.max_streams} streams can run at once")
+            reader = StreamReader(source, capacity=max(self.window + stride, self.window * 2), loop=loop)
+            self.streams[stream_id] = LiveStream(stream_id, reader, stride, threshold, cooldown, gate)
+        reader.start()
+        self.start()
+        logger.info("Started stream %s from %s", stream_id, source)
+        return stream_id
+
+    def remove_stream(self, stream_id):
+        with self._lock:
+            stream = self.streams.pop(stream_id, None)
+        if stream is None:
+            return False
+        stream.reader.stop()
+        return True
+
+    def _reap(self):
+        """Remove streams whose file ended (or could not be opened) so they stop counting against max_streams."""
+        with self._lock:
+            finished = [stream for stream in self.streams.values() if stream.exhausted(self.window)]
+            for stream in finished:
+                del self.streams[stream.stream_id]
+        for stream in finished:
+            stream.reader.stop()
+            logger.info("Stream %s finished after %d frames", stream.stream_id, stream.reader.frames_read)
+
+    def subscribe(self, callback):
+        """Register callback(event) for alert events; it runs on the inference thread and must not block."""
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="stream-inference", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+        for stream_id in list(self.streams):
+            self.remove_stream(stream_id)
+
+    def stats(self):
+        with self._lock:
+            streams = list(self.streams.values())
+        return {"streams": [stream.describe() for stream in streams], "max_streams": self.max_streams}
+
+    def _collect(self):
+        """Latest due window of each stream; windows skipped since the last pass count as dropped."""
+        self._reap()
+        with self._lock:
+            streams = list(self.streams.values())
+        due = []
+        for stream in streams:
+            if not stream.due():
+                continue
+            latest = stream.reader.latest_window(self.window)
+            if latest is None:
+                continue
+            end, captured_at, frames = latest
+            if stream.last_end:
+                stream.windows_dropped += max(0, (end - stream.last_end) // stream.stride - 1)
+            stream.last_end = end
+            if stream.gate is not None and stream.gate.is_static(stream.gate.activity(frames)):
+                stream.windows_static += 1
+                continue
+            due.append((stream, end, captured_at, frames))
+        return due
+
+    def _run(self):
+        import torch
+        from crime_detection.utils.video_utils import frames_to_clip
+
+        try:
+            registry = self.registry_fn()
+        except Exception:
+            logger.exception("Stream inference cannot start without a model")
+            with self._lock:
+                self._thread = None
+            return
+        while not self._stop.is_set():
+            due = self._collect()
+            if not due:
+                self._stop.wait(self.tick)
+                continue
+            for start in range(0, len(due), self.max_batch_size):
+                chunk = due[start:start + self.max_batch_size]
+                try:
+                    probs = registry.predict_clips(torch.stack([frames_to_clip(frames) for _, _, _, frames in chunk]))
+                except Exception as e:
+                    logger.error("Stream inference failed for %d windows: %s", len(chunk), e)
+                    continue
+                now = time.time()
+                for (stream, end, captured_at, _), row in zip(chunk, probs):
+                    STREAM_LATENCY.observe(max(0.0, now - captured_at))
+                    self._handle_result(stream, end, captured_at, now, registry.to_result(row))
+
+    def _handle_result(self, stream, end, captured_at, now, result):
+        stream.windows_scored += 1
+        stream.last_result = {"crime_type": result["crime_type"], "confidence": result["confidence"]}
+        if result["confidence"] < stream.threshold:
+            return
+        # One alert per class per cooldown period, so an ongoing incident does not flood subscribers
+        if now - stream.last_alert.get(result["crime_type"], 0.0) < stream.cooldown:
+            return
+        stream.last_alert[result["crime_type"]] = now
+        stream.alerts += 1
+        event = {
+            "type": "alert",
+            "stream_id": stream.stream_id,
+            "crime_type": result["crime_type"],
+            "confidence": result["confidence"],
+            "scores": result["scores"],
+            "start_frame": end - self.window,
+            "end_frame": end,
+            "captured_at": captured_at,
+            "latency_ms": (now - captured_at) * 1000.0,
+        }
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(event)
+            except Exception as e:
+                logger.warning("Alert subscriber failed: %s", e)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze live streams and print alerts as JSON lines")
+    parser.add_argument("sources", nargs="+", help="RTSP/HTTP URLs, camera indices or video files")
+    parser.add_argument("--loop", action="store_true", help="Loop file sources, standing in for a camera")
+    parser.add_argument("--stride", type=int, default=config.CLIP_LEN // 2, help="New frames between windows")
+    parser.add_argument("--threshold", type=float, default=0.8, help="Confidence that raises an alert")
+    parser.add_argument("--cooldown", type=float, default=10.0, help="Seconds between alerts of one class")
+    parser.add_argument("--motion-gate", action="store_true", help="Skip windows without motion")
+    parser.add_argument("--stats-interval", type=float, default=10.0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    analyzer = StreamAnalyzer(max_streams=max(len(args.sources), 1))
+    analyzer.subscribe(lambda event: print(json.dumps(event), flush=True))
+    gate = None
+    if args.motion_gate:
+        from crime_detection.motion import MotionGate
+        gate = MotionGate()
+    for source in args.sources:
+        analyzer.add_stream(source, stride=args.stride, threshold=args.threshold, cooldown=args.cooldown,
+                            loop=args.loop, gate=gate)
+    try:
+        while any(not stream["finished"] for stream in analyzer.stats()["streams"]):
+            time.sleep(args.stats_interval)
+            logger.info("%s", json.dumps(analyzer.stats()))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        analyzer.stop()
+
+
+if __name__ == "__main__":
+    main()
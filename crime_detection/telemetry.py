@@ -0,0 +1,281 @@
+
+"""
+Lightweight tracing, Prometheus metrics and structured logging.
+
+Pipeline stages are timed with `span("decode")`-style context managers that
+feed per-stage histograms, `render_metrics()` produces the Prometheus text
+exposition format without any client library, and JsonFormatter emits one
+JSON object per log line tagged with the current request id. An opt-in
+sampling profiler writes collapsed stacks (flamegraph.pl / speedscope input)
+for requests slower than a threshold.
+"""
+
+import bisect
+import contextvars
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+
+request_id_var = contextvars.ContextVar("request_id", default=None)
+
+# Client-supplied request ids end up in logs and response headers
+REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    inner = ",".join('{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in labels)
+    return "{" + inner + "}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label values."""
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series["counts"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series["counts"]):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(key + (('le', f'{bound:g}'),))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', '+Inf'),))} {series['count']}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {series['sum']}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+        return lines
+
+
+class Gauge:
+    """Gauge whose value is either set directly or read from a callback at scrape time."""
+
+    def __init__(self, name, help_text, callback=None):
+        self.name = name
+        self.help_text = help_text
+        self.callback = callback
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self.value -= amount
+
+    def render(self):
+        value = self.value
+        if self.callback is not None:
+            try:
+                value = self.callback()
+            except Exception:
+                value = float("nan")
+        if value is None:
+            return []
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge", f"{self.name} {value}"]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, name, factory):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = factory()
+            return metric
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(name, lambda: Histogram(name, help_text, buckets))
+
+    def gauge(self, name, help_text, callback=None):
+        gauge = self._get_or_create(name, lambda: Gauge(name, help_text))
+        if callback is not None:
+            gauge.callback = callback
+        return gauge
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+STAGE_SECONDS = metrics.histogram("crime_detection_stage_seconds", "Time spent in each pipeline stage")
+
+
+def read_rss_bytes():
+    """Current resident set size of this process, or None where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+metrics.gauge("process_resident_memory_bytes", "Resident memory size in bytes", callback=read_rss_bytes)
+
+
+@contextmanager
+def span(stage, **labels):
+    """Time a pipeline stage into crime_detection_stage_seconds{stage=...}."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage, **labels)
+
+
+class JsonFormatter(logging.Formatter):
+    """Format log records as single-line JSON carrying the current request id."""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = request_id_var.get()
+        if request_id:
+            entry["request_id"] = request_id
+        for key in ("stage", "duration_ms", "path", "status"):
+            if hasattr(record, key):
+                entry[key] = getattr(record, key)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+def clean_request_id(value):
+    """Return a client-supplied request id if it is safe to echo and log, else a new one."""
+    if value and REQUEST_ID_PATTERN.match(value):
+        return value
+    return uuid.uuid4().hex
+
+
+def configure_json_logging(level=logging.INFO):
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter())
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+
+
+class SamplingProfiler:
+    """
+    Wall-clock sampling profiler over all threads.
+
+    Every `interval` seconds the current stack of each thread is recorded;
+    `collapsed()` returns "frame;frame;frame count" lines, the input format
+    of flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                self.samples[";".join(reversed(stack))] += 1
+
+    def collapsed(self):
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common()) + "\n"
+
+
+class SlowRequestProfiler:
+    """
+    Profile a fraction of requests and keep the profile only if the request was slow.
+
+    Disabled unless PROFILE_SLOW_MS is set (0 keeps every sampled profile).
+    Profiles are written to PROFILE_DIR/<generated id>.folded; the name never
+    comes from the request, and callers log it next to the request id.
+    """
+
+    def __init__(self, threshold_ms=None, sample_rate=None, output_dir=None):
+        threshold = threshold_ms if threshold_ms is not None else os.getenv("PROFILE_SLOW_MS")
+        self.threshold_ms = float(threshold) if threshold is not None and threshold != "" else None
+        self.sample_rate = float(sample_rate if sample_rate is not None else os.getenv("PROFILE_SAMPLE_RATE", 1.0))
+        self.output_dir = output_dir or os.getenv("PROFILE_DIR", "profiles")
+
+    @property
+    def enabled(self):
+        return self.threshold_ms is not None
+
+    def maybe_start(self):
+        if not self.enabled or random.random() >= self.sample_rate:
+            return None
+        return SamplingProfiler().start()
+
+    def finish(self, profiler, duration_ms):
+        """Stop a profiler and write its profile if the request was slow; returns the path or None."""
+        if profiler is None:
+            return None
+        profiler.stop()
+        if duration_ms < self.threshold_ms:
+            return None
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:12]}.folded")
+        with open(path, "w") as f:
+            f.write(profiler.collapsed())
+        return path
@@ -0,0 +1,202 @@
+
+import logging
+from collections import deque
+
+import numpy as np
+import torch
+
+from crime_detection import config
+from crime_detection.motion import filter_windows, gate_summary
+from crime_detection.utils.video_utils import frames_to_clip, get_video_fps, iter_video_frames
+
+logger = logging.getLogger(__name__)
+
+
+def iter_windows(frames, window=config.CLIP_LEN, stride=config.CLIP_LEN // 2):
+    """
+    Slide a fixed-length window over a frame iterator.
+
+    Only the last `window` frames are kept in memory. A final window aligned
+    to the end of the stream is emitted when the stride leaves trailing
+    frames uncovered, and short streams are padded with their last frame.
+
+    Args:
+        frames: Iterable of [H, W, 3] uint8 frames
+        window: Number of frames per window
+        stride: Number of frames between window starts
+
+    Yields:
+        (start_frame, uint8 array of shape [window, H, W, 3])
+    """
+    buffer = deque(maxlen=window)
+    count = 0
+    last_start = None
+    for frame in frames:
+        buffer.append(frame)
+        count += 1
+        start = count - window
+        if start >= 0 and start % stride == 0:
+            last_start = start
+            yield start, np.stack(buffer)
+
+    if count == 0:
+        return
+    if count < window:
+        padded = list(buffer) + [buffer[-1]] * (window - count)
+        yield 0, np.stack(padded)
+    elif last_start != count - window:
+        yield count - window, np.stack(buffer)
+
+
+def batch_windows(windows, batch_size=8):
+    """
+    Group windows into batches of normalized clips.
+
+    Yields:
+        (list of start frames, tensor of shape [N, 3, T, H, W])
+    """
+    starts, clips = [], []
+    for start, frames in windows:
+        starts.append(start)
+        clips.append(frames_to_clip(frames))
+        if len(clips) == batch_size:
+            yield starts, torch.stack(clips)
+            starts, clips = [], []
+    if clips:
+        yield starts, torch.stack(clips)
+
+
+def score_windows(windows, registry, batch_size=8):
+    """
+    Run windows through the classifier in batches.
+
+    Yields:
+        (start_frame, class probability tensor) for each window
+    """
+    for starts, clips in batch_windows(windows, batch_size=batch_size):
+        probs = registry.predict_clips(clips)
+        if len(probs) != len(starts):
+            raise RuntimeError(f"Model returned {len(probs)} score rows for {len(starts)} windows")
+        yield from zip(starts, probs)
+
+
+def check_window(window):
+    """Reject window lengths the classifier cannot take; C3D's fc6 expects exactly CLIP_LEN frames."""
+    if window != config.CLIP_LEN:
+        raise ValueError(f"window must be {config.CLIP_LEN} frames, the clip length of the model")
+
+
+def merge_segments(segments, threshold=0.5, max_gap=0.0):
+    """
+    Merge consecutive confident segments of the same class into incidents.
+
+    Args:
+        segments: Segment dicts with start, end, crime_type and confidence
+        threshold: Minimum confidence for a segment to count as an incident
+        max_gap: Largest gap in seconds bridged between segments of one incident
+
+    Returns:
+        List of incidents with start, end, crime_type and peak_confidence
+    """
+    incidents = []
+    current = None
+    for segment in segments:
+        if segment.get("skipped") or segment["confidence"] < threshold:
+            continue
+        if (current is not None
+                and segment["crime_type"] == current["crime_type"]
+                and segment["start"] - current["end"] <= max_gap):
+            current["end"] = max(current["end"], segment["end"])
+            current["peak_confidence"] = max(current["peak_confidence"], segment["confidence"])
+            continue
+        if current is not None:
+            incidents.append(current)
+        current = {
+            "start": segment["start"],
+            "end": segment["end"],
+            "crime_type": segment["crime_type"],
+            "peak_confidence": segment["confidence"],
+        }
+    if current is not None:
+        incidents.append(current)
+    return incidents
+
+
+def localize(video_path, registry, window=config.CLIP_LEN, stride=config.CLIP_LEN // 2,
+             batch_size=8, threshold=0.5, max_gap=0.0, gate=None):
+    """
+    Classify every window of a full-length video and locate incidents.
+
+    The video is streamed through a generator pipeline, so memory stays
+    bounded by `window` decoded frames plus one batch of clips regardless of
+    the video's length.
+
+    Args:
+        video_path: Path to the video file
+        registry: ModelRegistry used for inference
+        window: Frames per window; must equal the C3D clip length
+        stride: Frames between consecutive window starts
+        batch_size: Windows per forward pass
+        threshold: Minimum confidence for a segment to become part of an incident
+        max_gap: Largest gap in seconds bridged when merging segments
+        gate: Optional MotionGate; static windows are reported as skipped
+            instead of being classified
+
+    Returns:
+        Dict containing fps, per-window segments and merged incidents, plus
+        skip counts under "motion_gate" when a gate is used
+    """
+    check_window(window)
+    if stride <= 0:
+        raise ValueError("stride must be positive")
+
+    fps = get_video_fps(video_path)
+    windows = iter_windows(iter_video_frames(video_path), window=window, stride=stride)
+    activity = {}
+    if gate is not None:
+        windows = filter_windows(windows, gate, activity)
+
+    segments = []
+    for start, probs in score_windows(windows, registry, batch_size=batch_size):
+        result = registry.to_result(probs)
+        segments.append({
+            "start": start / fps,
+            "end": (start + window) / fps,
+            "start_frame": start,
+            "end_frame": start + window,
+            "crime_type": result["crime_type"],
+            "confidence": result["confidence"],
+            "scores": result["scores"],
+        })
+
+    summary = None
+    if gate is not None:
+        for segment in segments:
+            segment["motion"] = activity[segment["start_frame"]]
+        for start, score in activity.items():
+            if gate.is_static(score):
+                segments.append({
+                    "start": start / fps,
+                    "end": (start + window) / fps,
+                    "start_frame": start,
+                    "end_frame": start + window,
+                    "crime_type": None,
+                    "confidence": 0.0,
+                    "scores": {},
+                    "skipped": True,
+                    "motion": score,
+                })
+        segments.sort(key=lambda segment: segment["start_frame"])
+        summary = gate_summary(activity, gate)
+
+    logger.info("Scored %d windows from %s", len(segments), video_path)
+    result = {
+        "fps": fps,
+        "window": window,
+        "stride": stride,
+        "segments": segments,
+        "incidents": merge_segments(segments, threshold=threshold, max_gap=max_gap),
+    }
+    if summary is not None:
+        result["motion_gate"] = summary
+    return result
@@ -0,0 +1,336 @@
+
+"""
+Train C3DPretrained on CrimeVideoDataset folders or a preprocessed clip cache.
+
+Clips travel through the DataLoader as uint8 tensors and are augmented and
+normalized a whole batch at a time on the training device, so loader workers
+only decode (or, with a clip cache, only read memory-mapped records).
+
+    python -m crime_detection.train --data path/to/dataset --epochs 30 --bf16
+    python -m crime_detection.train --cache path/to/cache --batch-size 16 --accumulate 4 --resume
+
+The best checkpoint is written to --output (a model_state_dict wrapper the
+registry loads directly), so MODEL_PATH can point straight at it.
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from torch.utils.data import DataLoader, random_split
+
+from crime_detection import config
+from crime_detection.network.c3d import C3DPretrained
+from crime_detection.utils.video_utils import frames_to_clip
+
+logger = logging.getLogger(__name__)
+
+
+class ClipAugment:
+    """
+    Batched augmentation and normalization of uint8 clips.
+
+    Takes [B, T, C, H, W] uint8 batches as collated from CrimeVideoDataset or
+    CachedClipDataset and returns normalized float [B, C, T, size, size]
+    model input. Training takes per-clip random crops whose side varies per
+    batch from `size` up to the full frame, resized to `size`, plus horizontal
+    flips and brightness/contrast jitter. Serving feeds the model the whole
+    frame, so evaluation resizes the full frame with frames_to_clip, the same
+    function serving uses.
+    """
+
+    def __init__(self, size=config.FRAME_SIZE, flip=0.5, brightness=0.2, contrast=0.2):
+        self.size = size
+        self.flip = flip
+        self.brightness = brightness
+        self.contrast = contrast
+
+    def __call__(self, clips, train=True):
+        if not train:
+            return torch.stack([frames_to_clip(clip.permute(0, 2, 3, 1), self.size) for clip in clips])
+
+        batch, _, _, height, width = clips.shape
+        if height < self.size or width < self.size:
+            clips = F.interpolate(clips.flatten(0, 1).float(), size=(self.size, self.size),
+                                  mode="bilinear", align_corners=False).view(batch, -1, 3, self.size, self.size)
+            height = width = self.size
+        device = clips.device
+
+        # Crops up to the full frame keep the field of view served in the training distribution
+        side = int(torch.randint(self.size, min(height, width) + 1, (1,)))
+        top = torch.randint(0, height - side + 1, (batch,), device=device)
+        left = torch.randint(0, width - side + 1, (batch,), device=device)
+        offsets = torch.arange(side, device=device)
+        rows = (top[:, None] + offsets)[:, :, None]
+        cols = (left[:, None] + offsets)[:, None, :]
+        # Advanced indices on dims 0, 3 and 4 move to the front: [B, side, side, T, C]
+        clips = clips[torch.arange(batch, device=device)[:, None, None], :, :, rows, cols]
+        clips = clips.permute(0, 4, 3, 1, 2).float()  # [B, C, T, side, side]
+        if side != self.size:
+            clips = F.interpolate(clips.flatten(1, 2), size=(self.size, self.size), mode="bilinear",
+                                  align_corners=False).view(batch, 3, -1, self.size, self.size)
+
+        if self.flip:
+            flipped = torch.rand(batch, device=device) < self.flip
+            clips = torch.where(flipped[:, None, None, None, None], clips.flip(-1), clips)
+        if self.contrast or self.brightness:
+            mean = clips.mean(dim=(1, 2, 3, 4), keepdim=True)
+            contrast = 1.0 + (torch.rand(batch, 1, 1, 1, 1, device=device) * 2 - 1) * self.contrast
+            brightness = 1.0 + (torch.rand(batch, 1, 1, 1, 1, device=device) * 2 - 1) * self.brightness
+            clips = ((clips - mean) * contrast + mean) * brightness
+            clips = clips.clamp(0, 255)
+
+        mean = torch.tensor(config.MEAN, device=device).view(1, 3, 1, 1, 1).mul(255.0)
+        std = torch.tensor(config.STD, device=device).view(1, 3, 1, 1, 1).mul(255.0)
+        return ((clips - mean) / std).contiguous()
+
+
+def build_dataset(data_dir=None, cache_dir=None, decode_size=config.TRAIN_DECODE_SIZE):
+    """
+    Return (dataset, class names) yielding uint8 [T, C, H, W] clips.
+
+    A clip cache is preferred when given; otherwise videos are decoded on the
+    fly at decode_size so random crops of config.FRAME_SIZE have room to move.
+    A cache with frames smaller than decode_size is refused, since it would
+    silently train without crop augmentation.
+    """
+    if cache_dir:
+        from crime_detection.data.clip_cache import CachedClipDataset
+
+        dataset = CachedClipDataset(cache_dir, root_dir=data_dir)
+        if dataset.frame_size < decode_size:
+            raise ValueError(
+                f"Clip cache {cache_dir} holds {dataset.frame_size}px frames, smaller than the {decode_size}px "
+                f"crop source; rebuild it with --size {decode_size} --rebuild, or pass --decode-size "
+                f"{dataset.frame_size} to train without random crops"
+            )
+    elif data_dir:
+        from crime_detection.data.dataset import CrimeVideoDataset
+
+        dataset = CrimeVideoDataset(data_dir, max_frames=config.CLIP_LEN, frame_size=decode_size)
+    else:
+        raise ValueError("Either data_dir or cache_dir is required")
+    if len(dataset) == 0:
+        raise ValueError("The training dataset is empty")
+    return dataset, list(dataset.classes)
+
+
+def make_loader(dataset, batch_size, shuffle, num_workers, pin_memory, prefetch_factor):
+    kwargs = {}
+    if num_workers > 0:
+        kwargs.update(prefetch_factor=prefetch_factor, persistent_workers=True)
+    return DataLoader(dataset, batch_size=batch_size, shuffle=shuffle, num_workers=num_workers,
+                      pin_memory=pin_memory, drop_last=False, **kwargs)
+
+
+def load_initial_weights(model, path):
+    """Initialize from a checkpoint, skipping tensors whose shape differs (e.g. a different fc8)."""
+    from crime_detection.registry import _extract_state_dict
+
+    state = _extract_state_dict(torch.load(path, map_location="cpu"))
+    own = model.state_dict()
+    compatible = {key: value for key, value in state.items() if key in own and own[key].shape == value.shape}
+    model.load_state_dict(compatible, strict=False)
+    logger.info("Initialized %d/%d tensors from %s", len(compatible), len(own), path)
+
+
+def save_checkpoint(path, state):
+    """Write atomically so a hot-reloading registry never sees a half-written file."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    torch.save(state, path + ".tmp")
+    os.replace(path + ".tmp", path)
+
+
+def _synchronize(device):
+    if device.type == "cuda":
+        torch.cuda.synchronize(device)
+
+
+def train_epoch(model, loader, optimizer, augment, device, accumulate=1, bf16=False):
+    """
+    Run one training epoch.
+
+    Returns:
+        Dict with loss, accuracy, samples/sec and data-wait vs compute seconds
+    """
+    model.train()
+    criterion = nn.CrossEntropyLoss()
+    total_loss = 0.0
+    correct = samples = 0
+    data_wait = compute = 0.0
+    optimizer.zero_grad(set_to_none=True)
+
+    start = time.perf_counter()
+    fetch_start = start
+    step = 0
+    for step, (clips, labels) in enumerate(loader, 1):
+        fetched = time.perf_counter()
+        data_wait += fetched - fetch_start
+
+        clips = clips.to(device, non_blocking=True)
+        labels = labels.to(device, non_blocking=True)
+        inputs = augment(clips, train=True)
+        with torch.autocast(device_type=device.type, dtype=torch.bfloat16, enabled=bf16):
+            outputs = model(inputs)
+            loss = criterion(outputs.float(), labels)
+        (loss / accumulate).backward()
+        if step % accumulate == 0:
+            optimizer.step()
+            optimizer.zero_grad(set_to_none=True)
+
+        total_loss += loss.item() * len(labels)
+        correct += (outputs.argmax(1) == labels).sum().item()
+        samples += len(labels)
+        _synchronize(device)
+        fetch_start = time.perf_counter()
+        compute += fetch_start - fetched
+
+    if step % accumulate:
+        # Apply the gradients of a final partial accumulation window
+        optimizer.step()
+        optimizer.zero_grad(set_to_none=True)
+
+    elapsed = time.perf_counter() - start
+    return {
+        "loss": total_loss / samples if samples else 0.0,
+        "accuracy": correct / samples if samples else 0.0,
+        "samples": samples,
+        "samples_per_sec": samples / elapsed if elapsed else 0.0,
+        "data_wait_seconds": data_wait,
+        "compute_seconds": compute,
+        "data_wait_fraction": data_wait / elapsed if elapsed else 0.0,
+    }
+
+
+def evaluate(model, loader, augment, device, bf16=False):
+    model.eval()
+    correct = samples = 0
+    with torch.no_grad():
+        for clips, labels in loader:
+            clips = clips.to(device, non_blocking=True)
+            labels = labels.to(device, non_blocking=True)
+            with torch.autocast(device_type=device.type, dtype=torch.bfloat16, enabled=bf16):
+                outputs = model(augment(clips, train=False))
+            correct += (outputs.argmax(1) == labels).sum().item()
+            samples += len(labels)
+    return correct / samples if samples else 0.0
+
+
+def train(args):
+    """
+    Train according to parsed command-line arguments.
+
+    Returns:
+        Best validation accuracy (training accuracy when there is no validation split)
+    """
+    device = torch.device(args.device or ("cuda" if torch.cuda.is_available() else "cpu"))
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    torch.manual_seed(args.seed)
+
+    dataset, class_names = build_dataset(args.data, args.cache, decode_size=args.decode_size)
+    val_size = int(len(dataset) * args.val_fraction)
+    train_set, val_set = random_split(dataset, [len(dataset) - val_size, val_size],
+                                      generator=torch.Generator().manual_seed(args.seed))
+    # Pinned host memory only speeds up host-to-device copies
+    pin_memory = device.type == "cuda"
+    train_loader = make_loader(train_set, args.batch_size, True, args.workers, pin_memory, args.prefetch)
+    val_loader = make_loader(val_set, args.batch_size, False, args.workers, pin_memory, args.prefetch) \
+        if val_size else None
+
+    model = C3DPretrained(num_classes=len(class_names))
+    if args.init:
+        load_initial_weights(model, args.init)
+    model.to(device)
+    augment = ClipAugment(size=config.FRAME_SIZE)
+
+    optimizer = torch.optim.SGD(model.parameters(), lr=args.lr, momentum=0.9, weight_decay=args.weight_decay)
+    scheduler = torch.optim.lr_scheduler.CosineAnnealingLR(optimizer, T_max=args.epochs)
+
+    os.makedirs(args.checkpoint_dir, exist_ok=True)
+    last_path = os.path.join(args.checkpoint_dir, "last.pth")
+    start_epoch, best_accuracy = 0, -1.0
+    if args.resume and os.path.exists(last_path):
+        checkpoint = torch.load(last_path, map_location=device)
+        model.load_state_dict(checkpoint["model_state_dict"])
+        optimizer.load_state_dict(checkpoint["optimizer_state_dict"])
+        scheduler.load_state_dict(checkpoint["scheduler_state_dict"])
+        start_epoch = checkpoint["epoch"] + 1
+        best_accuracy = checkpoint["best_accuracy"]
+        logger.info("Resumed from %s at epoch %d", last_path, start_epoch)
+
+    logger.info("Training on %d clips (%d validation) with %d classes on %s",
+                len(train_set), val_size, len(class_names), device)
+    for epoch in range(start_epoch, args.epochs):
+        stats = train_epoch(model, train_loader, optimizer, augment, device,
+                            accumulate=args.accumulate, bf16=args.bf16)
+        scheduler.step()
+        stats["val_accuracy"] = evaluate(model, val_loader, augment, device, bf16=args.bf16) if val_loader else None
+        stats["epoch"] = epoch
+        stats["lr"] = optimizer.param_groups[0]["lr"]
+        logger.info("Epoch %d: loss %.4f, acc %.3f, val acc %s, %.1f samples/s, data wait %.1fs vs compute %.1fs",
+                    epoch, stats["loss"], stats["accuracy"],
+                    "n/a" if stats["val_accuracy"] is None else f"{stats['val_accuracy']:.3f}",
+                    stats["samples_per_sec"], stats["data_wait_seconds"], stats["compute_seconds"])
+        with open(os.path.join(args.checkpoint_dir, "history.jsonl"), "a") as f:
+            f.write(json.dumps(stats) + "\n")
+
+        accuracy = stats["val_accuracy"] if stats["val_accuracy"] is not None else stats["accuracy"]
+        if accuracy > best_accuracy:
+            best_accuracy = accuracy
+            save_checkpoint(args.output, {
+                "model_state_dict": model.state_dict(),
+                "class_names": class_names,
+                "epoch": epoch,
+                "accuracy": accuracy,
+            })
+            logger.info("Saved best model (accuracy %.3f) to %s", accuracy, args.output)
+        save_checkpoint(last_path, {
+            "model_state_dict": model.state_dict(),
+            "optimizer_state_dict": optimizer.state_dict(),
+            "scheduler_state_dict": scheduler.state_dict(),
+            "epoch": epoch,
+            "best_accuracy": best_accuracy,
+            "class_names": class_names,
+        })
+    return best_accuracy
+
+
+def main():
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Train the C3D crime classifier")
+    parser.add_argument("--data", help="CrimeVideoDataset root with one sub-folder per class")
+    parser.add_argument("--cache", help="Clip cache built by crime_detection.data.clip_cache (preferred)")
+    parser.add_argument("--output", default=os.path.join(config.MODEL_DIR, "trained_crime_classifier.pth"),
+                        help="Where the best model is written; point MODEL_PATH at it to serve it")
+    parser.add_argument("--checkpoint-dir", default="checkpoints", help="Resumable checkpoint and history")
+    parser.add_argument("--resume", action="store_true", help="Continue from checkpoint-dir/last.pth")
+    parser.add_argument("--init", help="Initial weights, e.g. a Sports-1M C3D checkpoint")
+    parser.add_argument("--epochs", type=int, default=30)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--accumulate", type=int, default=1, help="Micro-batches per optimizer step")
+    parser.add_argument("--lr", type=float, default=0.003)
+    parser.add_argument("--weight-decay", type=float, default=5e-4)
+    parser.add_argument("--val-fraction", type=float, default=0.1)
+    parser.add_argument("--workers", type=int, default=min(8, cores), help="DataLoader worker processes")
+    parser.add_argument("--prefetch", type=int, default=4, help="Batches prefetched per worker")
+    parser.add_argument("--decode-size", type=int, default=config.TRAIN_DECODE_SIZE,
+                        help="Frame size decoded (or required of the cache) before random cropping")
+    parser.add_argument("--threads", type=int, help="Intra-op threads for the training process")
+    parser.add_argument("--bf16", action="store_true", help="Run forward passes under bf16 autocast")
+    parser.add_argument("--device", help="Training device (default: cuda if available)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    best = train(args)
+    print(json.dumps({"output": args.output, "best_accuracy": best}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+
+"""
+Bounded-memory handling of uploaded videos for the FastAPI apps.
+
+Uploads are copied to disk in fixed-size chunks (hashing them on the way)
+instead of being read into memory whole, and MaxBodySizeMiddleware rejects
+oversized requests with 413 before the body is parsed.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+# Largest accepted upload; MAX_UPLOAD_MB=0 disables the limit
+MAX_UPLOAD_BYTES = int(float(os.getenv("MAX_UPLOAD_MB", 500)) * (1 << 20)) or None
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the configured size limit."""
+
+    def __init__(self, max_bytes):
+        super().__init__(f"Upload exceeds the {max_bytes // (1 << 20)} MB limit")
+        self.max_bytes = max_bytes
+
+
+async def save_upload(file, max_bytes=MAX_UPLOAD_BYTES, chunk_size=UPLOAD_CHUNK_SIZE, suffix=".mp4"):
+    """
+    Stream an UploadFile to a temporary file without buffering it in memory.
+
+    Args:
+        file: FastAPI UploadFile
+        max_bytes: Reject the upload once more than this many bytes arrive
+        chunk_size: Bytes read per chunk
+        suffix: Suffix of the temporary file
+
+    Returns:
+        (path, sha256 hex digest, size in bytes)
+    """
+    digest = hashlib.sha256()
+    size = 0
+    temp_video = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+    try:
+        with temp_video:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_bytes is not None and size > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                digest.update(chunk)
+                temp_video.write(chunk)
+    except BaseException:
+        os.remove(temp_video.name)
+        raise
+    return temp_video.name, digest.hexdigest(), size
+
+
+def download_to_tempfile(chunks, max_bytes=MAX_UPLOAD_BYTES, suffix=".mp4"):
+    """
+    Write an iterable of byte chunks (e.g. a streamed HTTP response) to a temporary file.
+
+    Returns:
+        (path, sha256 hex digest, size in bytes)
+    """
+    digest = hashlib.sha256()
+    size = 0
+    temp_video = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+    try:
+        with temp_video:
+            for chunk in chunks:
+                size += len(chunk)
+                if max_bytes is not None and size > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                digest.update(chunk)
+                temp_video.write(chunk)
+    except BaseException:
+        os.remove(temp_video.name)
+        raise
+    return temp_video.name, digest.hexdigest(), size
+
+
+class _BodyTooLarge(Exception):
+    """Internal signal used to stop reading an oversized request body."""
+
+
+class MaxBodySizeMiddleware:
+    """
+    ASGI middleware answering 413 for request bodies above max_bytes.
+
+    Requests announcing a larger Content-Length are rejected before any of
+    the body is read; chunked bodies are cut off as soon as the limit is
+    crossed, whatever the application does with the resulting error.
+    """
+
+    def __init__(self, app, max_bytes=MAX_UPLOAD_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def _reject(self, send):
+        body = json.dumps({"detail": f"Upload exceeds the {self.max_bytes // (1 << 20)} MB limit"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.max_bytes is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_bytes:
+            await self._reject(send)
+            return
+
+        state = {"received": 0, "too_large": False, "responded": False}
+
+        async def limited_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                state["received"] += len(message.get("body", b""))
+                if state["received"] > self.max_bytes:
+                    state["too_large"] = True
+                    raise _BodyTooLarge()
+            return message
+
+        async def guarded_send(message):
+            if state["too_large"]:
+                # Replace whatever error response the app produced with a 413
+                if not state["responded"]:
+                    state["responded"] = True
+                    await self._reject(send)
+                return
+            state["responded"] = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            # The app may re-wrap _BodyTooLarge; any error after the limit was hit becomes a 413
+            if not state["too_large"]:
+                raise
+        if state["too_large"] and not state["responded"]:
+            await self._reject(send)
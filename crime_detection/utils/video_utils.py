@@ -0,0 +1,91 @@
+
+import cv2
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+from crime_detection import config
+from crime_detection.data.decoder import VideoDecoder, make_sampler
+
+
+def read_clip_frames(video_path, max_frames=config.CLIP_LEN, size=config.FRAME_SIZE, sampling=None):
+    """
+    Read max_frames RGB frames from a video, resized to size x size.
+
+    Args:
+        video_path: Path to the video file
+        max_frames: Number of frames in the clip
+        size: Output height and width
+        sampling: Frame sampling spec, defaults to config.FRAME_SAMPLING
+
+    Returns:
+        uint8 array of shape [max_frames, size, size, 3]
+    """
+    sampler = make_sampler(sampling or config.FRAME_SAMPLING, max_frames)
+    decoder = VideoDecoder(video_path, size=size)
+    frames = decoder.decode(sampler, num_frames=max_frames)
+    if decoder.frames_decoded == 0:
+        raise ValueError(f"Could not decode any frames from {video_path}")
+    return frames
+
+
+def get_video_fps(video_path, default=25.0):
+    """Return the frame rate reported by the container, or default if unknown."""
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+    return fps if fps and fps > 0 else default
+
+
+def iter_video_frames(video_path, size=config.FRAME_SIZE):
+    """
+    Lazily decode a whole video, one resized RGB frame at a time.
+
+    Only a single frame is held in memory, so arbitrarily long videos can be
+    processed with bounded memory.
+
+    Yields:
+        uint8 arrays of shape [size, size, 3]
+    """
+    cap = cv2.VideoCapture(video_path)
+    try:
+        while cap.isOpened():
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frame = cv2.resize(frame, (size, size), interpolation=cv2.INTER_AREA)
+            yield cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    finally:
+        cap.release()
+
+
+def frames_to_clip(frames, size=config.FRAME_SIZE):
+    """
+    Convert a uint8 [T, H, W, 3] frame array into a normalized [3, T, size, size] tensor.
+
+    Resizing and normalization run once over the whole clip rather than per frame.
+    This is the model's input preprocessing everywhere, including evaluation during
+    training, so frames may also be a uint8 tensor on any device.
+    """
+    if not isinstance(frames, torch.Tensor):
+        frames = torch.from_numpy(np.ascontiguousarray(frames))
+    clip = frames.permute(0, 3, 1, 2).float()
+    if clip.shape[-2:] != (size, size):
+        clip = F.interpolate(clip, size=(size, size), mode="bilinear", align_corners=False)
+    mean = torch.tensor(config.MEAN, device=clip.device).view(1, 3, 1, 1).mul(255.0)
+    std = torch.tensor(config.STD, device=clip.device).view(1, 3, 1, 1).mul(255.0)
+    clip = (clip - mean) / std
+    return clip.permute(1, 0, 2, 3).contiguous()
+
+
+def extract_video_features(video_path):
+    """
+    Build the C3D input tensor for a video file.
+
+    Args:
+        video_path: Path to the video file
+
+    Returns:
+        Tensor of shape [1, 3, CLIP_LEN, FRAME_SIZE, FRAME_SIZE]
+    """
+    return frames_to_clip(read_clip_frames(video_path)).unsqueeze(0)
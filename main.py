@@ -1,23 +1,30 @@
 
 """
 Simple FastAPI server for crime detection.
-Detects a random crime type from four categories and never returns undefined.
-Returns a predefined description for each crime type.
+Classifies a video into one of four crime categories using the shared
+C3D model registry, which is loaded once in the background at startup and
+reused across requests. Returns a predefined description for each crime type.
 """
 
-from fastapi import FastAPI, UploadFile, File
+from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-import random
 import os
-import tempfile
+
+# The registry (and with it torch and cv2) is imported lazily so / and /health answer during startup
+from crime_detection.lifecycle import model_loader
+from crime_detection.uploads import MAX_UPLOAD_BYTES, MaxBodySizeMiddleware, UploadTooLarge, save_upload
 
 app = FastAPI(
     title="Crime Detection API",
-    description="Silly random crime type predictor (no ML model)",
+    description="C3D-based crime type predictor",
     version="1.0.0"
 )
 
+# Reject oversized uploads with 413 before their body is read
+app.add_middleware(MaxBodySizeMiddleware, max_bytes=MAX_UPLOAD_BYTES)
+
 # Predefined class names and descriptions
 CLASS_NAMES = ['Abuse', 'Arrest', 'Arson', 'Assault']
 
@@ -41,27 +48,55 @@ CRIME_DESCRIPTIONS = {
     )
 }
 
+def get_registry():
+    from crime_detection.registry import get_registry as load_registry
+    return load_registry(apply_thread_hint=True)
+
+@app.on_event("startup")
+async def load_model():
+    # Load and warm up the model in the background so the first request does not pay for it
+    model_loader.start()
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to the simple Crime Detection API", "status": "online"}
 
+@app.get("/health")
+async def health():
+    return {"status": "healthy", "model_state": model_loader.state}
+
+@app.get("/ready")
+async def ready():
+    # 503 until the model is loaded, so load balancers hold traffic back
+    return JSONResponse(status_code=200 if model_loader.ready else 503, content=model_loader.describe())
+
 @app.post("/predict")
 async def predict_crime(file: UploadFile = File(...)):
-    # Save uploaded file temporarily (but do not process it)
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as temp_video:
-        await file.read()  # just read for completeness, not used
-        temp_video_path = temp_video.name
+    # Stream the upload to a temporary file in chunks so OpenCV can decode it
+    try:
+        temp_video_path, _, _ = await save_upload(file)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
 
-    # Randomly pick a crime type (ensuring no undefined)
-    crime_type = random.choice(CLASS_NAMES)
-    description = CRIME_DESCRIPTIONS[crime_type]
+    try:
+        registry = await run_in_threadpool(get_registry)
+        result = await run_in_threadpool(registry.predict, temp_video_path)
+    except ValueError as e:
+        # Undecodable or truncated uploads are the client's problem, not the server's
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        # Clean up the temp file
+        if os.path.exists(temp_video_path):
+            os.remove(temp_video_path)
 
-    # Clean up the temp file
-    if os.path.exists(temp_video_path):
-        os.remove(temp_video_path)
+    crime_type = result["crime_type"]
+    description = CRIME_DESCRIPTIONS[crime_type]
 
     report = {
         "crime_type": crime_type,
+        "confidence": result["confidence"],
         "detailed_report": description,
         "summary": f"Suspected case of {crime_type} detected in the submitted video footage.",
         "recommendation": "Further investigation is recommended by the concerned law enforcement authority."
@@ -1,16 +1,42 @@
 
 import os
+import sys
+import json
+import time
+import asyncio
 import logging
+import requests
 import uvicorn
-from fastapi import FastAPI, HTTPException, Body, UploadFile, File
+from fastapi import FastAPI, HTTPException, Body, Request, UploadFile, File, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
-import random
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Make the crime_detection package importable when running from this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crime_detection import config
+from crime_detection.batching import MicroBatcher
+from crime_detection.jobs import (
+    DEFAULT_FETCHER, PRIORITIES, JobStore, QueueFull, WorkerPool, acquire_owner_lock, deliver_pending_callbacks,
+)
+from crime_detection.lifecycle import model_loader
+from crime_detection.result_cache import ResultCache, make_key
+from crime_detection.telemetry import (
+    SlowRequestProfiler, clean_request_id, configure_json_logging, metrics, request_id_var, span,
+)
+from crime_detection.uploads import (
+    MAX_UPLOAD_BYTES, UPLOAD_CHUNK_SIZE, MaxBodySizeMiddleware, UploadTooLarge,
+    download_to_tempfile, save_upload,
+)
+
+# Configure logging: one JSON object per line carrying the request id, unless LOG_FORMAT=text
+if os.getenv("LOG_FORMAT", "json") == "json":
+    configure_json_logging(logging.INFO)
+else:
+    logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Initialize FastAPI app
@@ -29,11 +55,90 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Reject oversized uploads with 413 before their body is read
+app.add_middleware(MaxBodySizeMiddleware, max_bytes=MAX_UPLOAD_BYTES)
+
+# torch, cv2 and numpy are only imported behind get_registry() and inside the model
+# endpoints, so the server binds and answers /health before they are loaded
+def get_registry():
+    """The process-wide ModelRegistry; blocks until the model has loaded"""
+    from crime_detection.registry import get_registry as load_registry
+    return load_registry(apply_thread_hint=True)
+
+# Concurrent clips are stacked into one forward pass by the micro-batcher
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", 16))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", 10))
+batcher = MicroBatcher(
+    lambda clips: get_registry().predict_clips(clips),
+    max_batch_size=BATCH_MAX_SIZE,
+    max_wait_ms=BATCH_MAX_WAIT_MS,
+)
+
+# Results are cached by (content hash, model version, sampling config)
+result_cache = ResultCache(
+    max_entries=int(os.getenv("RESULT_CACHE_SIZE", 1024)),
+    ttl_seconds=float(os.getenv("RESULT_CACHE_TTL", 24 * 3600)),
+    db_path=os.getenv("RESULT_CACHE_DB") or None,
+)
+
+# Long-running analyses go through a persistent job queue drained by worker processes
+JOB_DB = os.getenv("JOB_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "jobs.sqlite"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+# Exactly one server process should requeue interrupted jobs, run the pool and send callbacks.
+# JOB_POOL_OWNER=1/0 decides explicitly (the prefork launcher sets it); otherwise the first
+# process to take the lock file next to JOB_DB owns the queue, e.g. under uvicorn --workers N
+JOB_POOL_OWNER = os.getenv("JOB_POOL_OWNER")
+job_owner_lock = None
+job_store = JobStore(JOB_DB, max_depth=int(os.getenv("JOB_QUEUE_MAX_DEPTH", 100)), max_attempts=JOB_MAX_ATTEMPTS)
+worker_pool = WorkerPool(
+    JOB_DB,
+    num_workers=int(os.environ["JOB_WORKERS"]) if os.getenv("JOB_WORKERS") else None,
+    fetcher=os.getenv("JOB_FETCHER", DEFAULT_FETCHER),
+    cache_db_path=os.getenv("RESULT_CACHE_DB") or None,
+    max_attempts=JOB_MAX_ATTEMPTS,
+)
+callback_task = None
+job_depth_task = None
+
+# Live camera streams share one batched inference thread; created on first use (it imports cv2).
+# Clients choose what the server opens, so streams are off unless enabled and sources are limited
+# to STREAM_SCHEMES URLs, files under STREAM_FILE_DIR and, with STREAM_ALLOW_CAMERAS, local cameras
+STREAMS_ENABLED = os.getenv("STREAMS_ENABLED", "0") == "1"
+STREAM_SCHEMES = [scheme for scheme in os.getenv("STREAM_SCHEMES", "rtsp,rtsps,http,https").split(",") if scheme]
+STREAM_FILE_DIR = os.getenv("STREAM_FILE_DIR") or None
+STREAM_ALLOW_CAMERAS = os.getenv("STREAM_ALLOW_CAMERAS", "0") == "1"
+STREAM_MAX_STREAMS = int(os.getenv("STREAM_MAX_STREAMS", 16))
+STREAM_ALERT_QUEUE_SIZE = 100
+stream_analyzer = None
+
+# Request-level metrics and the opt-in slow request profiler (PROFILE_SLOW_MS)
+IN_FLIGHT = metrics.gauge("crime_detection_in_flight_requests", "Requests currently being handled")
+REQUEST_SECONDS = metrics.histogram("crime_detection_request_seconds", "End-to-end request latency")
+metrics.gauge("crime_detection_batch_queue_depth", "Clips waiting for a micro-batch",
+              callback=lambda: batcher.queue_depth)
+# Refreshed by a background task, since reading it from SQLite at scrape time would block the event loop
+JOB_QUEUE_DEPTH = metrics.gauge("crime_detection_job_queue_depth", "Jobs waiting for a worker")
+JOB_DEPTH_REFRESH_SECONDS = 5.0
+slow_request_profiler = SlowRequestProfiler()
+
 # Define request and response models
 class VideoAnalysisRequest(BaseModel):
     video_url: str
     location: Optional[str] = None
 
+class JobRequest(VideoAnalysisRequest):
+    callback_url: Optional[str] = None
+    priority: str = "fresh"
+
+class StreamRequest(BaseModel):
+    source: str
+    stream_id: Optional[str] = None
+    stride: int = 8
+    threshold: float = 0.8
+    cooldown: float = 10.0
+    loop: bool = False
+    motion_gate: bool = config.MOTION_GATE
+
 class VideoAnalysisResponse(BaseModel):
     crime_type: str
     confidence: float
@@ -49,63 +154,444 @@ As the video nears its end, the individual slips into the vehicle and sits still
 
 Overall, the video portrays a likely criminal act captured in real-time. The figure's guarded movements, time of activity, and methodical actions all contribute to the impression of illicit behavior, potentially valuable for investigative purposes."""
 
+def download_video(video_url: str):
+    """Stream a remote video to a temporary file, hashing it on the way"""
+    response = requests.get(video_url, stream=True, timeout=30)
+    response.raise_for_status()
+    content_length = response.headers.get("Content-Length")
+    if MAX_UPLOAD_BYTES and content_length and content_length.isdigit() and int(content_length) > MAX_UPLOAD_BYTES:
+        response.close()
+        raise UploadTooLarge(MAX_UPLOAD_BYTES)
+    with response:
+        path, content_hash, _ = download_to_tempfile(response.iter_content(chunk_size=UPLOAD_CHUNK_SIZE))
+    return path, content_hash
+
+async def analyze_video_with_model(video_path: str, content_hash: Optional[str] = None) -> dict:
+    """Classify a local video, answering from the result cache when possible"""
+    registry = await run_in_threadpool(get_registry)
+    key = None
+    if content_hash:
+        key = make_key(content_hash, registry.version, config.FRAME_SAMPLING)
+        with span("cache_lookup"):
+            # The SQLite tier blocks, so keep it off the event loop
+            cached = await run_in_threadpool(result_cache.get, key)
+        if cached is not None:
+            return cached
+
+    from crime_detection.utils.video_utils import extract_video_features
+
+    # Decode and classify through the shared micro-batcher
+    with span("decode"):
+        clip = await run_in_threadpool(extract_video_features, video_path)
+    with span("inference"):
+        probs = await batcher.submit(clip[0])
+    result = registry.to_result(probs)
+    if key:
+        await run_in_threadpool(result_cache.put, key, result)
+    return result
+
+def build_analysis_response(prediction: dict, location: Optional[str] = None) -> dict:
+    """Shape a model prediction as returned by /analyze-video"""
+    result = {
+        "crime_type": prediction["crime_type"].lower(),
+        "confidence": prediction["confidence"],
+        "description": CRIME_DESCRIPTION
+    }
+    if location:
+        result["description"] += f"\n\nLocation context: The incident occurred at {location}."
+    return result
+
+def build_job_response(job: dict) -> dict:
+    """Public view of a job row"""
+    response = {
+        "job_id": job["id"],
+        "status": job["status"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+    }
+    if job["status"] == "done":
+        response["result"] = build_analysis_response(job["result"], job["payload"].get("location"))
+    elif job["status"] == "failed":
+        response["error"] = job["error"]
+    return response
+
+def get_stream_analyzer():
+    global stream_analyzer
+    if stream_analyzer is None:
+        from crime_detection.streaming import SourcePolicy, StreamAnalyzer
+        policy = SourcePolicy(schemes=STREAM_SCHEMES, file_dir=STREAM_FILE_DIR, allow_cameras=STREAM_ALLOW_CAMERAS)
+        stream_analyzer = StreamAnalyzer(registry_fn=get_registry, max_streams=STREAM_MAX_STREAMS,
+                                         max_batch_size=BATCH_MAX_SIZE, source_policy=policy)
+    return stream_analyzer
+
+def require_streams():
+    """403 unless live streams are enabled, so a disabled service never imports cv2 or starts the analyzer"""
+    if not STREAMS_ENABLED:
+        raise HTTPException(status_code=403, detail="Live streams are disabled; set STREAMS_ENABLED=1 to enable them")
+
+def subscribe_alerts(stream_id: Optional[str] = None):
+    """Bridge alerts from the inference thread into an asyncio queue; the oldest alert is dropped when it is full"""
+    queue = asyncio.Queue(maxsize=STREAM_ALERT_QUEUE_SIZE)
+    loop = asyncio.get_running_loop()
+
+    def offer(event):
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(event)
+
+    def on_alert(event):
+        if stream_id is None or event["stream_id"] == stream_id:
+            loop.call_soon_threadsafe(offer, event)
+
+    get_stream_analyzer().subscribe(on_alert)
+    return queue, on_alert
+
+def post_callback(job: dict):
+    requests.post(job["callback_url"], json=build_job_response(job), timeout=10)
+
+async def refresh_job_queue_depth():
+    """Keep the job queue depth gauge current off the event loop"""
+    while True:
+        try:
+            stats = await run_in_threadpool(job_store.stats)
+            JOB_QUEUE_DEPTH.set(stats["queued"])
+        except Exception as e:
+            logger.warning(f"Could not read the job queue depth: {e}")
+        await asyncio.sleep(JOB_DEPTH_REFRESH_SECONDS)
+
+async def deliver_callbacks():
+    """Notify callback URLs of finished jobs; pending callbacks survive restarts"""
+    while True:
+        try:
+            await run_in_threadpool(deliver_pending_callbacks, job_store, post_callback)
+        except Exception as e:
+            logger.error(f"Error delivering job callbacks: {e}")
+        await asyncio.sleep(1.0)
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Tag the request with an id, track it in metrics and profile it if enabled"""
+    request_id = clean_request_id(request.headers.get("X-Request-ID"))
+    token = request_id_var.set(request_id)
+    IN_FLIGHT.inc()
+    profiler = slow_request_profiler.maybe_start()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["X-Request-ID"] = request_id
+        return response
+    finally:
+        duration = time.perf_counter() - start
+        IN_FLIGHT.dec()
+        # Label by route template so /jobs/{job_id} does not explode the series count
+        route = request.scope.get("route")
+        path = getattr(route, "path", request.url.path)
+        REQUEST_SECONDS.observe(duration, path=path, method=request.method)
+        profile = slow_request_profiler.finish(profiler, duration * 1000.0)
+        if profile:
+            logger.warning(f"Slow request profile written to {profile}")
+        logger.info("Request finished", extra={"path": path, "status": status, "duration_ms": round(duration * 1000.0, 2)})
+        request_id_var.reset(token)
+
+@app.on_event("startup")
+async def load_model():
+    """Start loading the model in the background; /ready reports when it is done"""
+    global callback_task, job_depth_task, job_owner_lock
+    model_loader.start()
+    await batcher.start()
+    job_depth_task = asyncio.get_running_loop().create_task(refresh_job_queue_depth())
+
+    if JOB_POOL_OWNER is None:
+        job_owner_lock = acquire_owner_lock(JOB_DB)
+    if JOB_POOL_OWNER == "1" or (JOB_POOL_OWNER is None and job_owner_lock is not None):
+        logger.info("This process owns the job queue")
+        requeued = await run_in_threadpool(job_store.requeue_running)
+        if requeued:
+            logger.info(f"Requeued {requeued} interrupted jobs")
+        worker_pool.start()
+        callback_task = asyncio.get_running_loop().create_task(deliver_callbacks())
+
+@app.on_event("shutdown")
+async def stop_batcher():
+    await batcher.stop()
+    result_cache.close()
+    if callback_task is not None:
+        callback_task.cancel()
+    if job_depth_task is not None:
+        job_depth_task.cancel()
+    worker_pool.stop()
+    if job_owner_lock is not None:
+        job_owner_lock.close()
+    if stream_analyzer is not None:
+        await run_in_threadpool(stream_analyzer.stop)
+
+@app.get("/")
+async def root():
+    """Service banner; answers as soon as the server is up"""
+    return {"service": "crime-detection-model-service", "status": "online"}
+
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
-    return {"status": "healthy"}
+    """Liveness check; does not wait for the model"""
+    return {"status": "healthy", "model_loaded": model_loader.ready, "model_state": model_loader.state}
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness check: 200 once the model is loaded and warmed up, 503 before (or if loading failed)"""
+    info = model_loader.describe()
+    return JSONResponse(status_code=200 if model_loader.ready else 503, content=info)
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus text-format metrics: per-stage histograms, queue depths, in-flight requests, RSS"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/stats/batching")
+async def batching_stats():
+    """Per-batch size, queue wait and compute time of the micro-batcher"""
+    return batcher.stats()
+
+@app.get("/stats/cache")
+async def cache_stats():
+    """Hit, miss and eviction counters of the result cache"""
+    return result_cache.stats()
 
 @app.post("/predict")
 async def predict_crime(file: UploadFile = File(...)):
+    temp_video_path = None
     try:
         logger.info("Received video for analysis")
-        
-        # Randomly select either abuse or assault
-        crime_types = ["Abuse", "Assault"]
-        selected_crime = random.choice(crime_types)
+
+        with span("upload"):
+            temp_video_path, content_hash, size = await save_upload(file)
+        logger.info(f"Stored upload of {size} bytes")
+        result = await analyze_video_with_model(temp_video_path, content_hash)
+        selected_crime = result["crime_type"]
         
         report = {
             "crime_type": selected_crime,
+            "confidence": result["confidence"],
             "detailed_report": CRIME_DESCRIPTION,
             "summary": f"Suspected case of {selected_crime.lower()} detected in the submitted video footage.",
             "recommendation": "Further investigation is recommended by the concerned law enforcement authority."
         }
         
-        return JSONResponse(content=report)
+        with span("serialize"):
+            return JSONResponse(content=report)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         logger.error(f"Error processing video: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if temp_video_path and os.path.exists(temp_video_path):
+            os.remove(temp_video_path)
+
+@app.post("/localize")
+async def localize_crime(
+    file: UploadFile = File(...),
+    window: int = config.CLIP_LEN,
+    stride: int = 8,
+    threshold: float = 0.5,
+    max_gap: float = 0.0,
+    motion_gate: bool = config.MOTION_GATE,
+):
+    """Score the whole video with a sliding window and return incident intervals"""
+    if window != config.CLIP_LEN:
+        # C3D takes exactly CLIP_LEN frames; reject before reading the upload
+        raise HTTPException(status_code=400, detail=f"window must be {config.CLIP_LEN} frames, the clip length of the model")
+    temp_video_path = None
+    try:
+        temp_video_path, _, _ = await save_upload(file)
+
+        from crime_detection.motion import MotionGate
+        from crime_detection.temporal import localize
+
+        registry = await run_in_threadpool(get_registry)
+        return await run_in_threadpool(
+            localize, temp_video_path, registry,
+            window=window, stride=stride, batch_size=BATCH_MAX_SIZE,
+            threshold=threshold, max_gap=max_gap,
+            gate=MotionGate() if motion_gate else None,
+        )
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error localizing video: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if temp_video_path and os.path.exists(temp_video_path):
+            os.remove(temp_video_path)
 
 @app.post("/analyze-video", response_model=VideoAnalysisResponse)
 async def analyze_video(request: VideoAnalysisRequest):
     """Analyze video for crime detection"""
+    temp_video_path = None
     try:
-        # Randomly select either abuse or assault
-        crime_types = ["abuse", "assault"]
-        selected_crime = random.choice(crime_types)
-        
-        # Always return either abuse or assault with high confidence
-        result = {
-            "crime_type": selected_crime,
-            "confidence": 0.92,  # High confidence value
-            "description": CRIME_DESCRIPTION
-        }
-        
-        if request.location:
-            result["description"] += f"\n\nLocation context: The incident occurred at {request.location}."
-        
-        logger.info(f"Analysis complete: {selected_crime} detected")
+        with span("download"):
+            temp_video_path, content_hash = await run_in_threadpool(download_video, request.video_url)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except requests.RequestException as e:
+        logger.error(f"Error fetching video {request.video_url}: {e}")
+        raise HTTPException(status_code=502, detail=f"Could not fetch video: {e}")
+
+    try:
+        prediction = await analyze_video_with_model(temp_video_path, content_hash)
+        result = build_analysis_response(prediction, request.location)
+
+        logger.info(f"Analysis complete: {result['crime_type']} detected")
         return result
         
     except Exception as e:
         logger.error(f"Error during video analysis: {e}")
-        # Even in case of error, return either abuse or assault
-        crime_types = ["abuse", "assault"]
-        selected_crime = random.choice(crime_types)
-        return {
-            "crime_type": selected_crime,
-            "confidence": 0.92,
-            "description": CRIME_DESCRIPTION
-        }
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if temp_video_path and os.path.exists(temp_video_path):
+            os.remove(temp_video_path)
+
+@app.post("/jobs/analyze-video", status_code=202)
+async def submit_analysis_job(request: JobRequest):
+    """Queue a video for asynchronous analysis and return its job id"""
+    if request.priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"priority must be one of {sorted(PRIORITIES)}")
+    payload = {"video_url": request.video_url, "location": request.location}
+    try:
+        job_id = await run_in_threadpool(job_store.enqueue, payload, request.priority, request.callback_url)
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+    return {
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": f"/jobs/{job_id}",
+        "result_url": f"/jobs/{job_id}/result",
+    }
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status of an analysis job"""
+    job = await run_in_threadpool(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return build_job_response(job)
+
+@app.get("/jobs/{job_id}/result", response_model=VideoAnalysisResponse)
+async def get_job_result(job_id: str):
+    """Result of a finished job; 202 while it is still queued or running"""
+    job = await run_in_threadpool(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail=job["error"])
+    if job["status"] != "done":
+        return JSONResponse(status_code=202, content=build_job_response(job))
+    return build_analysis_response(job["result"], job["payload"].get("location"))
+
+@app.get("/stats/jobs")
+async def job_stats():
+    """Queue depth per status and live worker count"""
+    stats = await run_in_threadpool(job_store.stats)
+    JOB_QUEUE_DEPTH.set(stats["queued"])
+    stats["workers"] = worker_pool.alive()
+    stats["worker_restarts"] = worker_pool.restarts
+    return stats
+
+@app.post("/streams", status_code=201)
+async def start_stream(request: StreamRequest):
+    """Start analyzing a live source (RTSP/HTTP URL, camera index, or a looping file)"""
+    require_streams()
+    from crime_detection.streaming import StreamLimitReached
+
+    gate = None
+    if request.motion_gate:
+        from crime_detection.motion import MotionGate
+        gate = MotionGate()
+    try:
+        stream_id = await run_in_threadpool(
+            get_stream_analyzer().add_stream, request.source, stream_id=request.stream_id,
+            stride=request.stride, threshold=request.threshold, cooldown=request.cooldown,
+            loop=request.loop, gate=gate,
+        )
+    except StreamLimitReached as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "stream_id": stream_id,
+        "alerts_url": f"/streams/alerts?stream_id={stream_id}",
+        "websocket_url": f"/streams/ws?stream_id={stream_id}",
+    }
+
+@app.get("/streams")
+async def list_streams():
+    """Running streams with frame, window, drop and alert counters"""
+    if stream_analyzer is None:
+        return {"streams": [], "max_streams": STREAM_MAX_STREAMS}
+    return stream_analyzer.stats()
+
+@app.delete("/streams/{stream_id}")
+async def stop_stream(stream_id: str):
+    """Stop analyzing a stream"""
+    if stream_analyzer is None or not await run_in_threadpool(stream_analyzer.remove_stream, stream_id):
+        raise HTTPException(status_code=404, detail="Stream not found")
+    return {"stream_id": stream_id, "status": "stopped"}
+
+@app.get("/streams/alerts")
+async def stream_alerts_sse(request: Request, stream_id: Optional[str] = None):
+    """Server-sent events feed of alerts, for one stream or all of them"""
+    require_streams()
+    queue, on_alert = subscribe_alerts(stream_id)
+
+    async def events():
+        try:
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=15.0)
+                except asyncio.TimeoutError:
+                    # Comment lines keep proxies from closing an idle connection
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: alert\ndata: {json.dumps(event)}\n\n"
+        finally:
+            get_stream_analyzer().unsubscribe(on_alert)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.websocket("/streams/ws")
+async def stream_alerts_ws(websocket: WebSocket, stream_id: Optional[str] = None):
+    """WebSocket feed of alerts, for one stream or all of them"""
+    if not STREAMS_ENABLED:
+        # Closing before accepting rejects the handshake with 403
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    queue, on_alert = subscribe_alerts(stream_id)
+
+    async def forward():
+        while True:
+            await websocket.send_json(await queue.get())
+
+    sender = asyncio.create_task(forward())
+    try:
+        # Alerts may be rare, so read from the socket to notice a disconnect promptly
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        try:
+            await sender
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.warning(f"Alert WebSocket send failed: {e}")
+        get_stream_analyzer().unsubscribe(on_alert)
 
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 8000))
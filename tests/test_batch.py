@@ -0,0 +1,46 @@
+import json
+
+from crime_detection.batch import list_videos, load_done
+
+
+def write_lines(path, lines):
+    path.write_text("".join(lines))
+
+
+def test_load_done_cuts_a_partial_trailing_record(tmp_path):
+    output = tmp_path / "results.jsonl"
+    write_lines(output, [json.dumps({"video": "a.mp4", "crime_type": "Arson"}) + "\n", '{"video": "b.m'])
+    assert load_done(str(output)) == {"a.mp4"}
+    assert output.read_text().endswith("}\n")
+
+
+def test_retry_failed_tolerates_broken_lines_and_uses_the_latest_record(tmp_path):
+    output = tmp_path / "results.jsonl"
+    write_lines(output, [
+        json.dumps({"video": "ok.mp4", "crime_type": "Arson"}) + "\n",
+        json.dumps({"video": "bad.mp4", "error": "Could not decode any frames"}) + "\n",
+        '{"video": "trunc\n',
+        "[1, 2]\n",
+        json.dumps({"video": "fixed.mp4", "error": "timeout"}) + "\n",
+        json.dumps({"video": "fixed.mp4", "crime_type": "Abuse"}) + "\n",
+        '{"video": "partial.mp4", "crime',
+    ])
+    assert load_done(str(output), retry_failed=True) == {"ok.mp4", "fixed.mp4"}
+    assert load_done(str(output)) == {"ok.mp4", "bad.mp4", "fixed.mp4"}
+
+
+def test_load_done_without_output(tmp_path):
+    assert load_done(str(tmp_path / "missing.jsonl"), retry_failed=True) == set()
+
+
+def test_list_videos_from_directory_and_manifest(tmp_path):
+    (tmp_path / "clips" / "sub").mkdir(parents=True)
+    for name in ("clips/b.mp4", "clips/sub/a.AVI", "clips/notes.txt"):
+        (tmp_path / name).write_bytes(b"")
+    assert list_videos(str(tmp_path / "clips")) == sorted([
+        str(tmp_path / "clips" / "b.mp4"), str(tmp_path / "clips" / "sub" / "a.AVI"),
+    ])
+
+    manifest = tmp_path / "manifest.txt"
+    write_lines(manifest, ["# archive\n", "clips/b.mp4\n", "\n", json.dumps({"video": "/abs/c.mp4"}) + "\n"])
+    assert list_videos(str(manifest)) == [str(tmp_path / "clips/b.mp4"), "/abs/c.mp4"]
@@ -0,0 +1,92 @@
+import asyncio
+import time
+
+import pytest
+
+from crime_detection.batching import MicroBatcher
+
+
+def collect_batches(batcher, items, delays=()):
+    """Queue items (some after a delay) and run _collect until all of them were taken."""
+
+    async def scenario():
+        batcher._queue = asyncio.Queue()
+        for item in items:
+            batcher._queue.put_nowait((item, None, time.perf_counter()))
+
+        async def late():
+            for delay, item in delays:
+                await asyncio.sleep(delay)
+                batcher._queue.put_nowait((item, None, time.perf_counter()))
+
+        task = asyncio.get_running_loop().create_task(late())
+        batches = []
+        while sum(len(batch) for batch in batches) < len(items) + len(delays):
+            batches.append([item for item, _, _ in await batcher._collect()])
+        await task
+        return batches
+
+    return asyncio.run(scenario())
+
+
+def test_collect_caps_batches_at_max_batch_size():
+    batcher = MicroBatcher(None, max_batch_size=4, max_wait_ms=5)
+    assert collect_batches(batcher, list(range(10))) == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+
+
+def test_collect_waits_for_company_until_the_deadline():
+    batcher = MicroBatcher(None, max_batch_size=4, max_wait_ms=200)
+    assert collect_batches(batcher, [0], delays=[(0.02, 1), (0.02, 2)]) == [[0, 1, 2]]
+
+
+def test_collect_does_not_wait_past_the_deadline():
+    batcher = MicroBatcher(None, max_batch_size=4, max_wait_ms=10)
+    started = time.perf_counter()
+    assert collect_batches(batcher, [0], delays=[(0.3, 1)]) == [[0], [1]]
+    assert time.perf_counter() - started < 1.0
+
+
+def test_stats_before_any_batch():
+    stats = MicroBatcher(None, max_batch_size=8, max_wait_ms=3).stats()
+    assert stats["batches"] == 0
+    assert stats["mean_batch_size"] == 0.0
+    assert stats["queue_depth"] == 0
+
+
+def test_concurrent_submits_share_a_forward_pass():
+    torch = pytest.importorskip("torch")
+    batch_sizes = []
+
+    def infer(batch):
+        batch_sizes.append(len(batch))
+        return batch * 2
+
+    async def scenario():
+        batcher = MicroBatcher(infer, max_batch_size=8, max_wait_ms=50)
+        try:
+            return await asyncio.gather(*(batcher.submit(torch.full((2,), float(i))) for i in range(5))), batcher
+        finally:
+            await batcher.stop()
+
+    outputs, batcher = asyncio.run(scenario())
+    assert [output.tolist() for output in outputs] == [[2.0 * i, 2.0 * i] for i in range(5)]
+    assert batch_sizes == [5]
+    stats = batcher.stats()
+    assert (stats["batches"], stats["items"], stats["mean_batch_size"]) == (1, 5, 5.0)
+
+
+def test_inference_errors_reach_every_caller():
+    torch = pytest.importorskip("torch")
+
+    def infer(batch):
+        raise RuntimeError("out of memory")
+
+    async def scenario():
+        batcher = MicroBatcher(infer, max_batch_size=4, max_wait_ms=20)
+        try:
+            return await asyncio.gather(*(batcher.submit(torch.zeros(2)) for _ in range(3)), return_exceptions=True)
+        finally:
+            await batcher.stop()
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
@@ -0,0 +1,105 @@
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+pytest.importorskip("torch")
+
+from benchmarks.synthetic import make_video
+from crime_detection.data.clip_cache import CachedClipDataset, build_cache, load_index
+from crime_detection.data.decoder import VideoDecoder, make_sampler
+
+FRAMES = 4
+SIZE = 16
+CLASSES = ["Abuse", "Arrest"]
+
+
+def add_video(root, rel_path, seed):
+    path = os.path.join(str(root), rel_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return make_video(path, seconds=0.4, fps=10, width=64, height=48, seed=seed)
+
+
+def build(root, cache_dir, **kwargs):
+    return build_cache(str(root), str(cache_dir), max_frames=FRAMES, frame_size=SIZE, classes=CLASSES, **kwargs)
+
+
+def cached_clips(cache_dir):
+    dataset = CachedClipDataset(str(cache_dir))
+    return {path: (dataset[i][0].permute(0, 2, 3, 1).numpy(), dataset[i][1])
+            for i, (path, _, _, _) in enumerate(dataset.samples)}
+
+
+def decoded(root, rel_path):
+    return VideoDecoder(os.path.join(str(root), rel_path), size=SIZE).decode(make_sampler("head", FRAMES),
+                                                                             num_frames=FRAMES)
+
+
+def test_clips_read_back_as_decoded(tmp_path):
+    root, cache_dir = tmp_path / "videos", tmp_path / "cache"
+    add_video(root, "Abuse/a.mp4", seed=0)
+    add_video(root, "Arrest/b.mp4", seed=1)
+
+    assert build(root, cache_dir) == {"added": 2, "updated": 0, "removed": 0, "unchanged": 0}
+    clips = cached_clips(cache_dir)
+    for rel_path, label in (("Abuse/a.mp4", 0), ("Arrest/b.mp4", 1)):
+        np.testing.assert_array_equal(clips[rel_path][0], decoded(root, rel_path))
+        assert clips[rel_path][1] == label
+    assert build(root, cache_dir)["unchanged"] == 2
+
+
+def test_partial_record_from_an_interrupted_build_is_overwritten(tmp_path):
+    root, cache_dir = tmp_path / "videos", tmp_path / "cache"
+    add_video(root, "Abuse/a.mp4", seed=0)
+    build(root, cache_dir)
+    shard_path = os.path.join(str(cache_dir), load_index(str(cache_dir))["shards"][0]["file"])
+    with open(shard_path, "ab") as f:
+        f.write(bytes([7]) * 100)
+
+    add_video(root, "Abuse/c.mp4", seed=2)
+    assert build(root, cache_dir)["added"] == 1
+    record_bytes = FRAMES * SIZE * SIZE * 3
+    assert os.path.getsize(shard_path) == 2 * record_bytes
+    clips = cached_clips(cache_dir)
+    np.testing.assert_array_equal(clips["Abuse/a.mp4"][0], decoded(root, "Abuse/a.mp4"))
+    np.testing.assert_array_equal(clips["Abuse/c.mp4"][0], decoded(root, "Abuse/c.mp4"))
+
+
+def test_truncated_shard_is_refused(tmp_path):
+    root, cache_dir = tmp_path / "videos", tmp_path / "cache"
+    add_video(root, "Abuse/a.mp4", seed=0)
+    build(root, cache_dir)
+    shard_path = os.path.join(str(cache_dir), load_index(str(cache_dir))["shards"][0]["file"])
+    with open(shard_path, "r+b") as f:
+        f.truncate(10)
+
+    add_video(root, "Abuse/c.mp4", seed=2)
+    with pytest.raises(ValueError):
+        build(root, cache_dir)
+
+
+def test_changed_and_removed_videos(tmp_path):
+    root, cache_dir = tmp_path / "videos", tmp_path / "cache"
+    add_video(root, "Abuse/a.mp4", seed=0)
+    add_video(root, "Arrest/b.mp4", seed=1)
+    build(root, cache_dir, shard_size=1)
+    assert len(load_index(str(cache_dir))["shards"]) == 2
+
+    os.remove(os.path.join(str(root), "Arrest/b.mp4"))
+    changed = add_video(root, "Abuse/a.mp4", seed=5)
+    os.utime(changed, (1, 1))
+    assert build(root, cache_dir, shard_size=1) == {"added": 0, "updated": 1, "removed": 1, "unchanged": 0}
+    clips = cached_clips(cache_dir)
+    assert list(clips) == ["Abuse/a.mp4"]
+    np.testing.assert_array_equal(clips["Abuse/a.mp4"][0], decoded(root, "Abuse/a.mp4"))
+
+
+def test_different_settings_need_a_rebuild(tmp_path):
+    root, cache_dir = tmp_path / "videos", tmp_path / "cache"
+    add_video(root, "Abuse/a.mp4", seed=0)
+    build(root, cache_dir)
+    with pytest.raises(ValueError):
+        build_cache(str(root), str(cache_dir), max_frames=FRAMES, frame_size=SIZE * 2, classes=CLASSES)
+    assert build_cache(str(root), str(cache_dir), max_frames=FRAMES, frame_size=SIZE * 2, classes=CLASSES,
+                       rebuild=True)["added"] == 1
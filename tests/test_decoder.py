@@ -0,0 +1,99 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+
+from crime_detection.data import decoder
+from crime_detection.data.decoder import FrameSampler, StrideSampler, VideoDecoder
+
+FRAME_COUNT = 60
+LEVEL_STEP = 4
+
+
+class FixedSampler(FrameSampler):
+    def __init__(self, indices):
+        self._indices = indices
+
+    def indices(self, frame_count, fps, cap=None):
+        return list(self._indices)
+
+
+@pytest.fixture(scope="module")
+def indexed_video(tmp_path_factory):
+    """Solid grey frames whose level encodes their index, so decoded frames can be identified."""
+    path = str(tmp_path_factory.mktemp("videos") / "indexed.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 25, (64, 48))
+    if not writer.isOpened():
+        pytest.skip("OpenCV cannot write MJPG videos here")
+    for index in range(FRAME_COUNT):
+        writer.write(np.full((48, 64, 3), index * LEVEL_STEP, dtype=np.uint8))
+    writer.release()
+    return path
+
+
+def frame_indices(frames):
+    return [int(round(float(frame.mean()) / LEVEL_STEP)) for frame in frames]
+
+
+def test_decodes_the_sampled_indices(indexed_video):
+    video = VideoDecoder(indexed_video, size=16)
+    frames = video.decode(StrideSampler(7))
+    assert frames.shape == (9, 16, 16, 3)
+    assert frame_indices(frames) == list(range(0, FRAME_COUNT, 7))
+    assert video.frames_decoded == 9
+    assert video.frame_count == FRAME_COUNT
+
+
+@pytest.mark.parametrize("seek_threshold", [0, 1000])
+def test_seeking_and_grabbing_land_on_the_same_frames(indexed_video, monkeypatch, seek_threshold):
+    monkeypatch.setattr(decoder, "SEEK_THRESHOLD", seek_threshold)
+    frames = VideoDecoder(indexed_video).decode(FixedSampler([1, 2, 40, 59]))
+    assert frame_indices(frames) == [1, 2, 40, 59]
+
+
+def test_indices_past_the_end_are_padded(indexed_video):
+    video = VideoDecoder(indexed_video)
+    frames = video.decode(FixedSampler([57, 58, 59, 61, 63]), num_frames=5)
+    assert video.frames_decoded == 3
+    assert frame_indices(frames) == [57, 58, 59, 59, 59]
+
+
+class FlakyCapture:
+    """Capture whose grab() fails at one position while read() would still succeed."""
+
+    def __init__(self, path, bad_position):
+        self.frames = [np.full((8, 8, 3), index * LEVEL_STEP, dtype=np.uint8) for index in range(FRAME_COUNT)]
+        self.bad_position = bad_position
+        self.position = 0
+
+    def get(self, prop):
+        return {cv2.CAP_PROP_FPS: 25.0, cv2.CAP_PROP_FRAME_COUNT: FRAME_COUNT,
+                cv2.CAP_PROP_FRAME_WIDTH: 8, cv2.CAP_PROP_FRAME_HEIGHT: 8}.get(prop, 0)
+
+    def set(self, prop, value):
+        self.position = int(value)
+        return True
+
+    def grab(self):
+        if self.position == self.bad_position:
+            return False
+        self.position += 1
+        return True
+
+    def read(self):
+        if self.position >= FRAME_COUNT:
+            return False, None
+        frame = self.frames[self.position]
+        self.position += 1
+        return True, frame
+
+    def release(self):
+        pass
+
+
+def test_failed_grab_stops_instead_of_returning_the_wrong_frame(monkeypatch):
+    monkeypatch.setattr(decoder.cv2, "VideoCapture", lambda path: FlakyCapture(path, bad_position=10))
+    video = VideoDecoder("flaky.mp4")
+    frames = video.decode(FixedSampler([2, 15, 20]), num_frames=3)
+    assert video.frames_decoded == 1
+    assert frame_indices(frames) == [2, 2, 2]
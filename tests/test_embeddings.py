@@ -0,0 +1,136 @@
+import json
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from crime_detection import embeddings
+from crime_detection.embeddings import (
+    METADATA_FILE, EmbeddingStore, InconsistentStore, _merge_topk, fit_pca, index_videos,
+)
+
+
+def random_vectors(count, dim=32, seed=0):
+    return np.random.default_rng(seed).normal(size=(count, dim)).astype(np.float32)
+
+
+def make_store(directory, count=200, dim=32, seed=0):
+    store = EmbeddingStore.create(str(directory), input_dim=dim)
+    vectors = random_vectors(count, dim, seed)
+    store.append(vectors, [{"video": f"v{i // 10}.mp4", "start": float(i)} for i in range(count)])
+    return store, vectors
+
+
+def brute_force(store, queries, k):
+    scores = store.project(queries) @ np.asarray(store.matrix(), dtype=np.float32).T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def test_merge_topk_matches_full_sort():
+    rng = np.random.default_rng(1)
+    scores = rng.normal(size=(3, 50)).astype(np.float32)
+    ids = np.broadcast_to(np.arange(50), scores.shape)
+    best_scores, best_ids = EmbeddingStore._empty(3, 5)
+    for start in range(0, 50, 7):
+        best_scores, best_ids = _merge_topk(best_scores, best_ids, scores[:, start:start + 7],
+                                            ids[:, start:start + 7], 5)
+    expected = np.argsort(-scores, axis=1)[:, :5]
+    assert best_ids.shape == (3, 5)
+    for row in range(3):
+        assert set(best_ids[row]) == set(expected[row])
+
+
+def test_merge_topk_keeps_everything_below_k():
+    best_scores, best_ids = _merge_topk(*EmbeddingStore._empty(1, 10), np.array([[0.5, 0.1]]), np.array([[4, 7]]), 10)
+    assert sorted(best_ids[0].tolist()) == [4, 7]
+
+
+def test_exact_search_finds_the_query_row_first(tmp_path):
+    store, vectors = make_store(tmp_path)
+    results = store.search(vectors[[3, 150]], k=5, block_size=64)
+    assert [hits[0]["row"] for hits in results] == [3, 150]
+    for query, hits in zip(vectors[[3, 150]], results):
+        assert [hit["score"] for hit in hits] == sorted((hit["score"] for hit in hits), reverse=True)
+        assert [hit["row"] for hit in hits] == brute_force(store, query[None], 5)[0].tolist()
+    assert results[0][0]["video"] == "v0.mp4"
+    assert results[0][0]["score"] == pytest.approx(1.0, abs=1e-2)
+
+
+def test_ivf_probing_every_list_matches_exact_search(tmp_path):
+    store, vectors = make_store(tmp_path)
+    store.build_ivf(num_lists=8, iterations=5)
+    queries = random_vectors(4, seed=9)
+    exact = [[hit["row"] for hit in hits] for hits in store.search(queries, k=10)]
+    ivf = [[hit["row"] for hit in hits] for hits in store.search(queries, k=10, nprobe=8)]
+    assert ivf == exact
+
+
+def test_ivf_search_includes_rows_appended_after_the_build(tmp_path):
+    store, _ = make_store(tmp_path)
+    store.build_ivf(num_lists=8, iterations=5)
+    late = random_vectors(1, seed=42)
+    store.append(late, [{"video": "late.mp4", "start": 0.0}])
+    hits = EmbeddingStore(str(tmp_path)).search(late, k=3, nprobe=1)[0]
+    assert hits[0]["video"] == "late.mp4"
+
+
+def test_pca_store_projects_queries(tmp_path):
+    vectors = random_vectors(100, dim=32)
+    store = EmbeddingStore.create(str(tmp_path), input_dim=32, pca=fit_pca(vectors, 8))
+    store.append(vectors, [{"video": "a.mp4", "start": float(i)} for i in range(100)])
+    assert store.matrix().shape == (100, 8)
+    assert store.search(vectors[7], k=1)[0][0]["row"] == 7
+
+
+def test_append_overwrites_records_of_an_interrupted_append(tmp_path):
+    store, _ = make_store(tmp_path, count=10)
+    with open(tmp_path / METADATA_FILE, "a") as f:
+        f.write(json.dumps({"video": "orphan.mp4"}) + "\n")
+    store.append(random_vectors(1, seed=3), [{"video": "new.mp4", "start": 0.0}])
+    reopened = EmbeddingStore(str(tmp_path))
+    assert reopened.count == 11
+    assert reopened.metadata([10])[0]["video"] == "new.mp4"
+    with open(tmp_path / METADATA_FILE) as f:
+        assert len(f.readlines()) == 11
+
+
+def test_append_refuses_a_short_sidecar(tmp_path):
+    store, _ = make_store(tmp_path, count=10)
+    path = tmp_path / METADATA_FILE
+    lines = path.read_text().splitlines(keepends=True)
+    path.write_text("".join(lines[:5]))
+    with pytest.raises(InconsistentStore):
+        EmbeddingStore(str(tmp_path)).append(random_vectors(1), [{"video": "x.mp4", "start": 0.0}])
+    # The surviving records are left alone
+    assert path.read_text() == "".join(lines[:5])
+
+
+def fake_embed_video(calls):
+    def embed(video_path, registry, **kwargs):
+        calls.append(video_path)
+        seed = sum(map(ord, os.path.basename(video_path)))
+        yield random_vectors(3, seed=seed), [{"video": video_path, "start": float(i)} for i in range(3)]
+    return embed
+
+
+def test_index_videos_skips_videos_already_in_the_store(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(embeddings, "embed_video", fake_embed_video(calls))
+    directory = str(tmp_path / "store")
+    a, b = str(tmp_path / "a.mp4"), str(tmp_path / "b.mp4")
+
+    assert index_videos(directory, [a], registry=None) == 3
+    assert index_videos(directory, [a, b, b], registry=None) == 3
+    assert calls == [a, b]
+    store = EmbeddingStore(directory)
+    assert store.count == 6
+    assert store.videos() == {a, b}
+
+
+def test_index_videos_refuses_a_different_pca_dim(tmp_path, monkeypatch):
+    monkeypatch.setattr(embeddings, "embed_video", fake_embed_video([]))
+    directory = str(tmp_path / "store")
+    index_videos(directory, [str(tmp_path / "a.mp4")], registry=None)
+    with pytest.raises(ValueError):
+        index_videos(directory, [str(tmp_path / "b.mp4")], registry=None, pca_dim=8)
@@ -0,0 +1,319 @@
+import hashlib
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import urllib.request
+from contextlib import closing
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from crime_detection.jobs import (
+    JobStore, QueueFull, WorkerPool, acquire_owner_lock, deliver_pending_callbacks, load_fetcher, process_identity,
+    run_job,
+)
+from crime_detection.result_cache import ResultCache
+from crime_detection.uploads import download_to_tempfile
+
+VIDEO_BYTES = b"not really an mp4, but the registry is fake" * 100
+
+
+class StandIn(BaseHTTPRequestHandler):
+    """Serves VIDEO_BYTES at /video.mp4 and records POSTed callbacks; /broken answers 500."""
+
+    def do_GET(self):
+        if self.path != "/video.mp4":
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(VIDEO_BYTES)))
+        self.end_headers()
+        self.wfile.write(VIDEO_BYTES)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.received.append((self.path, json.loads(body)))
+        self.send_response(500 if self.path == "/broken" else 204)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    httpd.received = []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def url(server, path):
+    return f"http://127.0.0.1:{server.server_port}{path}"
+
+
+def urlopen_fetch(video_url):
+    """Fetcher plugged in through JOB_FETCHER-style "module:function" specs."""
+    with urllib.request.urlopen(video_url, timeout=5) as response:
+        path, content_hash, _ = download_to_tempfile(iter(lambda: response.read(65536), b""))
+    return path, content_hash
+
+
+def post_json(job):
+    request = urllib.request.Request(
+        job["callback_url"], data=json.dumps({"job_id": job["id"], "status": job["status"]}).encode(),
+        headers={"Content-Type": "application/json"}, method="POST",
+    )
+    urllib.request.urlopen(request, timeout=5).close()
+
+
+class FakeRegistry:
+    version = "test"
+
+    def __init__(self):
+        self.calls = 0
+
+    def predict(self, path):
+        self.calls += 1
+        with open(path, "rb") as f:
+            size = len(f.read())
+        return {"crime_type": "Arson", "confidence": 0.75, "scores": {"Arson": 0.75}, "bytes": size}
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.sqlite"), max_depth=10, max_attempts=2)
+
+
+def test_claims_fresh_before_backfill_then_oldest_first(store):
+    backfill = store.enqueue({"video_url": "b"}, priority="backfill")
+    first = store.enqueue({"video_url": "f1"}, priority="fresh")
+    second = store.enqueue({"video_url": "f2"}, priority="fresh")
+    claimed = [store.claim_next()["id"] for _ in range(3)]
+    assert claimed == [first, second, backfill]
+    assert store.claim_next() is None
+    assert store.stats()["running"] == 3
+
+
+def test_enqueue_refuses_beyond_max_depth(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite"), max_depth=2)
+    store.enqueue({"video_url": "a"})
+    store.enqueue({"video_url": "b"})
+    with pytest.raises(QueueFull):
+        store.enqueue({"video_url": "c"})
+    # Running jobs do not count against the queue depth
+    store.claim_next()
+    store.enqueue({"video_url": "c"})
+    assert store.stats()["queued"] == 2
+
+
+def test_requeue_only_touches_jobs_of_dead_workers(store):
+    orphan = store.enqueue({"video_url": "a"})
+    active = store.enqueue({"video_url": "b"})
+    store.claim_next(worker_pid=dead_pid())
+    store.claim_next()
+    assert store.requeue_running() == 1
+    assert store.get(orphan)["status"] == "queued"
+    assert store.get(active)["status"] == "running"
+
+
+def test_requeue_by_worker_pid(store):
+    job_id = store.enqueue({"video_url": "a"})
+    store.enqueue({"video_url": "b"})
+    store.claim_next(worker_pid=111)
+    store.claim_next(worker_pid=222)
+    assert store.requeue_running(worker_pids=[111]) == 1
+    assert store.get(job_id)["status"] == "queued"
+    assert store.stats()["running"] == 1
+
+
+def test_reused_pid_does_not_keep_a_job_running(store):
+    if not os.path.exists("/proc/self/stat"):
+        pytest.skip("process start times need /proc")
+    orphan = store.enqueue({"video_url": "a"})
+    active = store.enqueue({"video_url": "b"})
+    store.claim_next()
+    store.claim_next()
+    # The first job was claimed by an earlier process that happened to have our pid
+    with closing(sqlite3.connect(store.db_path)) as db:
+        db.execute("UPDATE jobs SET worker_token = ? WHERE id = ?", (f"old-boot:{os.getpid()}:1", orphan))
+        db.commit()
+    assert process_identity(os.getpid()) != f"old-boot:{os.getpid()}:1"
+    assert store.requeue_running() == 1
+    assert store.get(orphan)["status"] == "queued"
+    assert store.get(active)["status"] == "running"
+
+
+def test_process_identity():
+    assert process_identity(os.getpid()) == process_identity(os.getpid())
+    assert process_identity(dead_pid()) is None
+    assert process_identity(None) is None
+
+
+def test_job_that_keeps_killing_workers_is_failed(store):
+    job_id = store.enqueue({"video_url": "poison"})
+    for _ in range(2):
+        store.claim_next(worker_pid=dead_pid())
+        store.requeue_running()
+    job = store.get(job_id)
+    assert job["status"] == "failed"
+    assert job["attempts"] == 2
+    assert "2 attempts" in job["error"]
+
+
+def test_old_databases_gain_the_worker_columns(tmp_path):
+    path = str(tmp_path / "jobs.sqlite")
+    with closing(sqlite3.connect(path)) as db:
+        db.execute(
+            "CREATE TABLE jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL, priority INTEGER NOT NULL, "
+            "payload TEXT NOT NULL, callback_url TEXT, callback_sent INTEGER NOT NULL DEFAULT 0, result TEXT, "
+            "error TEXT, attempts INTEGER NOT NULL DEFAULT 0, created_at REAL NOT NULL, started_at REAL, "
+            "finished_at REAL)"
+        )
+        db.commit()
+    store = JobStore(path)
+    with closing(sqlite3.connect(path)) as db:
+        columns = {row[1] for row in db.execute("PRAGMA table_info(jobs)")}
+    assert {"worker_pid", "worker_token"} <= columns
+    store.enqueue({"video_url": "a"})
+    assert store.claim_next(worker_pid=123)["id"]
+
+
+def test_run_job_with_pluggable_fetcher(store, server):
+    fetch = load_fetcher("tests.test_jobs:urlopen_fetch")
+    registry = FakeRegistry()
+    cache = ResultCache()
+    job_ids = [store.enqueue({"video_url": url(server, "/video.mp4")}) for _ in range(2)]
+    for _ in job_ids:
+        run_job(store, store.claim_next(), fetch, registry, cache)
+
+    for job_id in job_ids:
+        job = store.get(job_id)
+        assert job["status"] == "done"
+        assert job["result"]["bytes"] == len(VIDEO_BYTES)
+    # The second job hit the cache by content hash
+    assert registry.calls == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_run_job_records_fetch_errors(store, server):
+    job_id = store.enqueue({"video_url": url(server, "/missing.mp4")})
+    run_job(store, store.claim_next(), urlopen_fetch, FakeRegistry())
+    job = store.get(job_id)
+    assert job["status"] == "failed"
+    assert "404" in job["error"]
+
+
+def test_default_http_fetcher(server):
+    pytest.importorskip("requests")
+    path, content_hash = load_fetcher("crime_detection.jobs:http_fetch")(url(server, "/video.mp4"))
+    with open(path, "rb") as f:
+        assert f.read() == VIDEO_BYTES
+    assert content_hash == hashlib.sha256(VIDEO_BYTES).hexdigest()
+
+
+def test_callbacks_are_delivered_once(store, server):
+    ok = store.enqueue({"video_url": "a"}, callback_url=url(server, "/hook"))
+    broken = store.enqueue({"video_url": "b"}, callback_url=url(server, "/broken"))
+    store.enqueue({"video_url": "c"})
+    for _ in range(3):
+        job = store.claim_next()
+        store.complete(job["id"], {"crime_type": "Arson"})
+
+    assert deliver_pending_callbacks(store, post_json) == 2
+    assert sorted(server.received) == sorted([
+        ("/hook", {"job_id": ok, "status": "done"}),
+        ("/broken", {"job_id": broken, "status": "done"}),
+    ])
+    # Failed deliveries are not retried; the caller can still poll
+    assert deliver_pending_callbacks(store, post_json) == 0
+    assert len(server.received) == 2
+
+
+def test_concurrent_deliverers_post_each_callback_once(store):
+    job_ids = [store.enqueue({"video_url": str(i)}, callback_url="http://unused/") for i in range(8)]
+    for _ in job_ids:
+        job = store.claim_next()
+        store.complete(job["id"], {"crime_type": "Arson"})
+
+    posted = []
+    lock = threading.Lock()
+
+    def post(job):
+        with lock:
+            posted.append(job["id"])
+
+    barrier = threading.Barrier(4)
+
+    def deliver():
+        barrier.wait()
+        deliver_pending_callbacks(JobStore(store.db_path), post)
+
+    threads = [threading.Thread(target=deliver) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(posted) == sorted(job_ids)
+
+
+def test_claim_callback_only_succeeds_once(store):
+    job_id = store.enqueue({"video_url": "a"}, callback_url="http://unused/")
+    assert store.claim_callback(job_id)
+    assert not store.claim_callback(job_id)
+
+
+class FakeProcess:
+    def __init__(self, pid, alive):
+        self.pid = pid
+        self.exitcode = None if alive else -11
+        self._alive = alive
+
+    def is_alive(self):
+        return self._alive
+
+
+def test_pool_restarts_dead_workers_and_requeues_their_jobs(store):
+    pool = WorkerPool(store.db_path, num_workers=2)
+    crashed = store.enqueue({"video_url": "a"})
+    busy = store.enqueue({"video_url": "b"})
+    store.claim_next(worker_pid=101)
+    store.claim_next(worker_pid=102)
+    pool._processes = [FakeProcess(101, alive=False), FakeProcess(102, alive=True)]
+    pool._spawn = lambda: FakeProcess(103, alive=True)
+
+    pool.restart_dead(store)
+    assert [process.pid for process in pool._processes] == [103, 102]
+    assert pool.restarts == 1
+    assert pool.alive() == 2
+    assert store.get(crashed)["status"] == "queued"
+    assert store.get(busy)["status"] == "running"
+
+
+def test_only_one_process_owns_the_queue(tmp_path):
+    pytest.importorskip("fcntl")
+    db_path = str(tmp_path / "jobs.sqlite")
+    owner = acquire_owner_lock(db_path)
+    assert owner is not None
+    assert acquire_owner_lock(db_path) is None
+
+    # Another process cannot take it either while the owner lives
+    code = "import sys; from crime_detection.jobs import acquire_owner_lock; sys.exit(acquire_owner_lock(sys.argv[1]) is None)"
+    assert subprocess.run([sys.executable, "-c", code, db_path]).returncode == 1
+
+    owner.close()
+    successor = acquire_owner_lock(db_path)
+    assert successor is not None
+    successor.close()
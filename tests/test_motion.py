@@ -0,0 +1,64 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from crime_detection.motion import MotionGate, filter_windows, gate_summary
+
+
+def static_frames(count=16, size=64, seed=0):
+    frame = np.random.default_rng(seed).integers(0, 255, size=(size, size, 3), dtype=np.uint8)
+    return np.repeat(frame[None], count, axis=0)
+
+
+def moving_frames(count=16, size=64, block=16):
+    frames = np.zeros((count, size, size, 3), dtype=np.uint8)
+    for t in range(count):
+        x = (t * 3) % (size - block)
+        frames[t, 8:8 + block, x:x + block] = 255
+    return frames
+
+
+def test_static_window_has_no_activity():
+    gate = MotionGate(pixel_threshold=15, min_active=0.005)
+    frames = static_frames()
+    assert gate.frame_activity(frames).shape == (15,)
+    assert gate.activity(frames) == 0.0
+    assert gate.is_static(gate.activity(frames))
+
+
+def test_moving_block_is_detected():
+    gate = MotionGate(pixel_threshold=15, min_active=0.005)
+    activity = gate.activity(moving_frames())
+    assert 0.005 < activity <= 1.0
+    assert not gate.is_static(activity)
+
+
+def test_small_changes_stay_below_the_pixel_threshold():
+    gate = MotionGate(pixel_threshold=15, min_active=0.005)
+    frames = static_frames().astype(np.int16)
+    frames[1::2] += 10
+    assert gate.activity(np.clip(frames, 0, 255).astype(np.uint8)) < 0.005
+
+
+def test_single_frame_has_no_activity():
+    gate = MotionGate()
+    assert gate.frame_activity(static_frames(count=1)).shape == (0,)
+    assert gate.activity(static_frames(count=1)) == 0.0
+
+
+def test_filter_windows_drops_static_windows_and_records_scores():
+    gate = MotionGate(pixel_threshold=15, min_active=0.005)
+    windows = [(0, static_frames()), (8, moving_frames()), (16, static_frames(seed=1))]
+    activity = {}
+    kept = [start for start, _ in filter_windows(windows, gate, activity)]
+    assert kept == [8]
+    assert sorted(activity) == [0, 8, 16]
+
+    summary = gate_summary(activity, gate)
+    assert (summary["windows"], summary["skipped"]) == (3, 2)
+    assert summary["skip_rate"] == pytest.approx(2 / 3)
+    assert summary["min_active"] == 0.005
+
+
+def test_gate_summary_of_no_windows():
+    assert gate_summary({}, MotionGate())["skip_rate"] == 0.0
@@ -0,0 +1,86 @@
+import json
+import zipfile
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("cv2")
+
+from torch import nn
+
+from crime_detection import config, optimize
+from crime_detection.registry import ModelRegistry, is_torchscript, load_model_file
+
+
+class TinyC3D(nn.Module):
+    """Conv3d and Linear layers like C3D, small enough to export in a test."""
+
+    def __init__(self, num_classes=len(config.CLASS_NAMES)):
+        super().__init__()
+        self.conv = nn.Conv3d(3, 4, kernel_size=3, padding=1)
+        self.pool = nn.AdaptiveAvgPool3d(1)
+        self.fc = nn.Linear(4, 16)
+        self.dropout = nn.Dropout(0.5)
+        self.out = nn.Linear(16, num_classes)
+
+    def forward(self, x):
+        x = self.pool(torch.relu(self.conv(x))).flatten(1)
+        return self.out(self.dropout(torch.relu(self.fc(x))))
+
+
+def make_model():
+    torch.manual_seed(0)
+    return TinyC3D().eval()
+
+
+def example(batch=2):
+    return torch.randn(batch, 3, 4, 16, 16, generator=torch.Generator().manual_seed(1))
+
+
+def test_optimized_model_is_quantized_and_close_to_fp32():
+    model = make_model()
+    optimized = optimize.build_optimized(model, example())
+    assert isinstance(optimized, torch.jit.ScriptModule)
+    with torch.no_grad():
+        fp32 = torch.softmax(model(example()), dim=1)
+        int8 = torch.softmax(optimized(example()), dim=1)
+    assert (fp32 - int8).abs().max().item() < 0.05
+    # The fp32 model passed in is left untouched
+    assert isinstance(model.fc, nn.Linear)
+
+
+def test_export_round_trips_through_the_registry(tmp_path, monkeypatch):
+    monkeypatch.setattr(optimize, "load_fp32", lambda model_path, num_classes: make_model())
+    output = str(tmp_path / "c3d_cpu.pt")
+    report = optimize.export(str(tmp_path / "missing.pth"), output)
+
+    assert report["num_threads"] in report["thread_sweep_ms"]
+    assert report["accuracy"]["samples"] > 0
+    assert is_torchscript(output)
+    with zipfile.ZipFile(output) as archive:
+        name = next(name for name in archive.namelist() if name.endswith(optimize.METADATA_FILE))
+        metadata = json.loads(archive.read(name))
+    assert metadata["format"] == "c3d-cpu-int8"
+    assert metadata["class_names"] == config.CLASS_NAMES
+
+    model, loaded_metadata = load_model_file(output, torch.device("cpu"), len(config.CLASS_NAMES))
+    assert loaded_metadata == metadata
+    with torch.no_grad():
+        assert model(example()).shape == (2, len(config.CLASS_NAMES))
+
+    threads = torch.get_num_threads()
+    try:
+        registry = ModelRegistry(model_path=output, device="cpu", reload_interval=3600)
+        assert registry.thread_hint == metadata["num_threads"]
+        assert torch.get_num_threads() == threads
+        probs = registry.predict_clips(example())
+        torch.testing.assert_close(probs.sum(dim=1), torch.ones(2))
+        assert registry.to_result(probs[0])["crime_type"] in config.CLASS_NAMES
+    finally:
+        torch.set_num_threads(threads)
+
+
+def test_plain_checkpoints_are_not_torchscript(tmp_path):
+    path = str(tmp_path / "model.pth")
+    torch.save(make_model().state_dict(), path)
+    assert not is_torchscript(path)
@@ -0,0 +1,109 @@
+import os
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("cv2")
+
+from crime_detection import registry as registry_module
+from crime_detection.registry import ModelRegistry
+
+
+class TinyModel(torch.nn.Module):
+    """Stands in for C3DPretrained so checkpoints stay a few bytes."""
+
+    def __init__(self, num_classes=4):
+        super().__init__()
+        self.pool = torch.nn.AdaptiveAvgPool3d(1)
+        self.fc = torch.nn.Linear(3, num_classes)
+
+    def forward(self, x):
+        return self.fc(self.pool(x).flatten(1))
+
+
+@pytest.fixture(autouse=True)
+def tiny_model(monkeypatch):
+    monkeypatch.setattr(registry_module, "C3DPretrained", TinyModel)
+
+
+def save_checkpoint(path, value, mtime):
+    model = TinyModel()
+    with torch.no_grad():
+        for parameter in model.parameters():
+            parameter.fill_(value)
+    torch.save(model.state_dict(), path)
+    # Make the change visible even on filesystems with coarse mtimes
+    os.utime(path, (mtime, mtime))
+
+
+def weight(registry):
+    return float(registry.model.fc.weight[0, 0])
+
+
+def make_registry(path):
+    return ModelRegistry(model_path=str(path), device="cpu", reload_interval=0)
+
+
+def test_changed_checkpoint_is_swapped_in(tmp_path):
+    path = tmp_path / "model.pth"
+    save_checkpoint(path, 1.0, mtime=1000)
+    registry = make_registry(path)
+    assert weight(registry) == 1.0
+    version = registry.version
+
+    assert registry.maybe_reload() is False
+    save_checkpoint(path, 2.0, mtime=2000)
+    assert registry.maybe_reload() is True
+    assert weight(registry) == 2.0
+    assert registry.version != version
+
+
+def test_corrupt_checkpoint_keeps_the_previous_model(tmp_path):
+    path = tmp_path / "model.pth"
+    save_checkpoint(path, 1.0, mtime=1000)
+    registry = make_registry(path)
+    model, version = registry.model, registry.version
+
+    path.write_bytes(b"not a checkpoint")
+    os.utime(path, (2000, 2000))
+    assert registry.maybe_reload() is False
+    assert registry.model is model
+    assert registry.version == version
+    # The same broken file is not retried on every check
+    assert registry.maybe_reload() is False
+
+    save_checkpoint(path, 3.0, mtime=3000)
+    assert registry.maybe_reload() is True
+    assert weight(registry) == 3.0
+
+
+def test_deleted_checkpoint_keeps_the_previous_model(tmp_path):
+    path = tmp_path / "model.pth"
+    save_checkpoint(path, 1.0, mtime=1000)
+    registry = make_registry(path)
+    model, version = registry.model, registry.version
+
+    os.remove(path)
+    assert registry.maybe_reload() is False
+    assert registry.maybe_reload() is False
+    assert registry.model is model
+    assert registry.version == version
+    with pytest.raises(FileNotFoundError):
+        registry.load()
+    assert registry.model is model
+
+    save_checkpoint(path, 4.0, mtime=4000)
+    assert registry.maybe_reload() is True
+    assert weight(registry) == 4.0
+
+
+def test_missing_checkpoint_at_startup_uses_an_initialized_model(tmp_path):
+    path = tmp_path / "model.pth"
+    registry = make_registry(path)
+    assert registry.version == "initialized"
+    assert registry.metadata == {}
+    assert registry.maybe_reload() is False
+
+    save_checkpoint(path, 5.0, mtime=5000)
+    assert registry.maybe_reload() is True
+    assert weight(registry) == 5.0
@@ -0,0 +1,97 @@
+import sqlite3
+
+from crime_detection.result_cache import ResultCache, make_key
+
+
+def result(confidence=0.9):
+    return {"crime_type": "Assault", "confidence": confidence, "scores": {"Assault": confidence}}
+
+
+def test_make_key_separates_model_versions_and_sampling():
+    assert make_key("abc", "v1", "head") != make_key("abc", "v2", "head")
+    assert make_key("abc", "v1", "head") != make_key("abc", "v1", "uniform")
+
+
+def test_hit_miss_and_lru_eviction():
+    cache = ResultCache(max_entries=2)
+    cache.put("a", result(0.1))
+    cache.put("b", result(0.2))
+    assert cache.get("a")["confidence"] == 0.1
+    # "b" is now least recently used
+    cache.put("c", result(0.3))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    stats = cache.stats()
+    assert stats["hits"] == 3
+    assert stats["misses"] == 1
+    assert stats["evictions"] == 1
+    assert stats["entries"] == 2
+
+
+def test_expired_entries_are_misses():
+    cache = ResultCache(ttl_seconds=-1)
+    cache.put("a", result())
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_returned_results_are_copies():
+    cache = ResultCache()
+    value = result()
+    cache.put("a", value)
+    value["scores"]["Assault"] = 0.0
+
+    hit = cache.get("a")
+    assert hit["scores"]["Assault"] == 0.9
+    hit["crime_type"] = "changed"
+    hit["scores"]["Assault"] = 0.0
+    assert cache.get("a") == result()
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResultCache(db_path=path)
+    cache.put("a", result())
+    cache.close()
+
+    reopened = ResultCache(db_path=path)
+    assert reopened.get("a") == result()
+    assert reopened.stats()["disk_hits"] == 1
+    # Promoted into memory, so the next lookup does not touch the disk
+    reopened.get("a")
+    assert reopened.stats()["hits"] == 1
+    reopened.close()
+
+
+def test_disk_tier_uses_wal(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    ResultCache(db_path=path).close()
+    with sqlite3.connect(path) as db:
+        assert db.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_locked_database_degrades_to_memory(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResultCache(db_path=path, busy_timeout=0.05)
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN EXCLUSIVE")
+    try:
+        cache.put("a", result())
+    finally:
+        other.execute("ROLLBACK")
+        other.close()
+    assert cache.get("a") == result()
+    assert cache.stats()["disk_errors"] == 1
+    cache.close()
+
+
+def test_broken_database_lookup_is_a_miss(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResultCache(db_path=path)
+    with sqlite3.connect(path) as db:
+        db.execute("DROP TABLE results")
+    assert cache.get("missing") is None
+    assert cache.stats()["disk_errors"] == 1
+    assert cache.stats()["misses"] == 1
+    cache.close()
@@ -0,0 +1,178 @@
+import os
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+
+from benchmarks.synthetic import make_video
+from crime_detection.streaming import LiveStream, SourcePolicy, StreamAnalyzer, StreamLimitReached, StreamReader
+
+SIZE = 32
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached in time"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def short_video(tmp_path):
+    """20 frames at 10 fps."""
+    return make_video(str(tmp_path / "short.mp4"), seconds=2.0, fps=10, width=64, height=48)
+
+
+def decode_all(path):
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frame = cv2.resize(frame, (SIZE, SIZE), interpolation=cv2.INTER_AREA)
+        frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    cap.release()
+    return np.stack(frames)
+
+
+def read_to_end(path, capacity):
+    reader = StreamReader(path, size=SIZE, capacity=capacity, realtime=False).start()
+    reader._thread.join(10)
+    assert reader.finished
+    return reader
+
+
+def make_analyzer(**kwargs):
+    analyzer = StreamAnalyzer(registry_fn=lambda: None, **kwargs)
+    # The tests drive _collect and _handle_result themselves instead of the inference thread
+    analyzer.start = lambda: None
+    return analyzer
+
+
+def test_ring_buffer_keeps_only_the_newest_frames(short_video):
+    expected = decode_all(short_video)
+    reader = read_to_end(short_video, capacity=8)
+
+    end, _, frames = reader.latest_window(8)
+    assert end == reader.frames_read == len(expected)
+    np.testing.assert_array_equal(frames, expected[-8:])
+    with pytest.raises(ValueError):
+        reader.latest_window(9)
+
+
+def test_latest_window_waits_for_enough_frames(short_video):
+    reader = StreamReader(short_video, size=SIZE, capacity=8)
+    assert reader.latest_window(4) is None
+
+
+def test_stale_windows_are_skipped_and_counted(short_video):
+    analyzer = make_analyzer(window=16)
+    reader = StreamReader(short_video, size=SIZE, capacity=32, loop=True, realtime=False)
+    stream = LiveStream("cam", reader, stride=4, threshold=0.8, cooldown=10.0, gate=None)
+    analyzer.streams["cam"] = stream
+    reader.start()
+    try:
+        wait_for(lambda: reader.frames_read >= 16)
+        due = analyzer._collect()
+        assert len(due) == 1
+        first_end = due[0][1]
+        assert stream.windows_dropped == 0
+
+        # The file loops, so the reader runs well past several strides before the next pass
+        wait_for(lambda: reader.frames_read >= first_end + 40)
+        due = analyzer._collect()
+        assert len(due) == 1
+        _, end, _, frames = due[0]
+        assert frames.shape == (16, SIZE, SIZE, 3)
+        assert end - first_end >= 40
+        assert stream.windows_dropped == (end - first_end) // 4 - 1
+        assert not reader.finished
+    finally:
+        analyzer.stop()
+
+
+def test_alert_cooldown_is_per_class():
+    analyzer = make_analyzer()
+    stream = LiveStream("cam", None, stride=8, threshold=0.8, cooldown=10.0, gate=None)
+    events = []
+    analyzer.subscribe(events.append)
+
+    def result(crime_type, confidence):
+        return {"crime_type": crime_type, "confidence": confidence, "scores": {crime_type: confidence}}
+
+    analyzer._handle_result(stream, 32, 99.9, 100.0, result("Assault", 0.9))
+    analyzer._handle_result(stream, 40, 104.9, 105.0, result("Assault", 0.95))
+    analyzer._handle_result(stream, 40, 104.9, 105.0, result("Arson", 0.9))
+    analyzer._handle_result(stream, 48, 110.9, 111.0, result("Assault", 0.9))
+    analyzer._handle_result(stream, 56, 199.9, 200.0, result("Assault", 0.5))
+
+    assert [event["crime_type"] for event in events] == ["Assault", "Arson", "Assault"]
+    assert [event["end_frame"] for event in events] == [32, 40, 48]
+    assert events[0]["start_frame"] == 32 - analyzer.window
+    assert stream.alerts == 3
+    assert stream.windows_scored == 5
+    assert stream.last_result == {"crime_type": "Assault", "confidence": 0.5}
+
+
+def test_finished_file_stream_is_reaped_after_its_last_window(short_video):
+    analyzer = make_analyzer(window=16)
+    reader = read_to_end(short_video, capacity=32)
+    analyzer.streams["cam"] = LiveStream("cam", reader, stride=4, threshold=0.8, cooldown=10.0, gate=None)
+
+    assert len(analyzer._collect()) == 1
+    assert analyzer._collect() == []
+    assert analyzer.streams == {}
+
+
+def test_finished_streams_stop_counting_against_the_limit(short_video, tmp_path):
+    analyzer = make_analyzer(max_streams=1, window=16, source_policy=SourcePolicy(file_dir=str(tmp_path)))
+    first = analyzer.add_stream("short.mp4", stride=4)
+    stream = analyzer.streams[first]
+    wait_for(lambda: stream.reader.finished)
+
+    # Its last window has not been scored yet, so it still holds its slot
+    with pytest.raises(StreamLimitReached):
+        analyzer.add_stream("short.mp4", stride=4)
+
+    stream.last_end = stream.reader.frames_read
+    second = analyzer.add_stream("short.mp4", stride=4)
+    assert list(analyzer.streams) == [second]
+    analyzer.stop()
+
+
+def test_source_policy_limits_network_sources():
+    policy = SourcePolicy()
+    assert policy.check("rtsp://camera/stream") == "rtsp://camera/stream"
+    assert policy.check("https://example.com/live.m3u8") == "https://example.com/live.m3u8"
+    for source in ("file:///etc/passwd", "rtmp://camera/stream", "http://"):
+        with pytest.raises(ValueError):
+            policy.check(source)
+    assert SourcePolicy(schemes=["rtsp"]).check("rtsp://camera/stream") == "rtsp://camera/stream"
+    with pytest.raises(ValueError):
+        SourcePolicy(schemes=["rtsp"]).check("http://camera/stream")
+
+
+def test_source_policy_cameras_are_opt_in():
+    with pytest.raises(ValueError):
+        SourcePolicy().check("0")
+    assert SourcePolicy(allow_cameras=True).check("0") == "0"
+
+
+def test_source_policy_confines_files_to_the_stream_directory(tmp_path):
+    allowed = tmp_path / "streams"
+    allowed.mkdir()
+    (allowed / "lobby.mp4").write_bytes(b"")
+    (tmp_path / "secret.mp4").write_bytes(b"")
+
+    with pytest.raises(ValueError):
+        SourcePolicy().check(str(allowed / "lobby.mp4"))
+
+    policy = SourcePolicy(file_dir=str(allowed))
+    assert policy.check("lobby.mp4") == os.path.realpath(str(allowed / "lobby.mp4"))
+    assert policy.check(str(allowed / "lobby.mp4")) == os.path.realpath(str(allowed / "lobby.mp4"))
+    for source in ("../secret.mp4", str(tmp_path / "secret.mp4"), "missing.mp4", "."):
+        with pytest.raises(ValueError):
+            policy.check(source)
@@ -0,0 +1,46 @@
+import os
+
+import pytest
+
+from crime_detection.telemetry import SlowRequestProfiler, clean_request_id
+
+
+@pytest.mark.parametrize("value", ["abc123", "req_1-2", "x" * 64])
+def test_clean_request_id_keeps_safe_ids(value):
+    assert clean_request_id(value) == value
+
+
+@pytest.mark.parametrize("value", [None, "", "../../escaped", "a/b", "x" * 65, "id with spaces", "é"])
+def test_clean_request_id_replaces_unsafe_ids(value):
+    cleaned = clean_request_id(value)
+    assert cleaned != value
+    assert len(cleaned) == 32 and cleaned.isalnum()
+
+
+def test_profiles_are_named_independently_of_the_request(tmp_path):
+    output_dir = tmp_path / "profiles"
+    profiler = SlowRequestProfiler(threshold_ms=10, sample_rate=1.0, output_dir=str(output_dir))
+    path = profiler.finish(profiler.maybe_start(), 50.0)
+    assert os.path.dirname(path) == str(output_dir)
+    assert os.listdir(tmp_path) == ["profiles"]
+    assert os.listdir(output_dir) == [os.path.basename(path)]
+
+
+def test_fast_requests_are_not_written(tmp_path):
+    profiler = SlowRequestProfiler(threshold_ms=1000, sample_rate=1.0, output_dir=str(tmp_path))
+    assert profiler.finish(profiler.maybe_start(), 5.0) is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_zero_threshold_enables_profiling(tmp_path, monkeypatch):
+    monkeypatch.setenv("PROFILE_SLOW_MS", "0")
+    profiler = SlowRequestProfiler(sample_rate=1.0, output_dir=str(tmp_path))
+    assert profiler.enabled
+    assert profiler.finish(profiler.maybe_start(), 0.0) is not None
+
+
+def test_unset_threshold_disables_profiling(monkeypatch):
+    monkeypatch.delenv("PROFILE_SLOW_MS", raising=False)
+    profiler = SlowRequestProfiler()
+    assert not profiler.enabled
+    assert profiler.maybe_start() is None
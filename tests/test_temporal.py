@@ -0,0 +1,102 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+torch = pytest.importorskip("torch")
+pytest.importorskip("cv2")
+
+from crime_detection import config
+from crime_detection.temporal import iter_windows, localize, merge_segments, score_windows
+
+
+def make_frames(count, size=8):
+    """Frames whose pixels all equal their frame index, so windows are easy to identify."""
+    return [np.full((size, size, 3), index, dtype=np.uint8) for index in range(count)]
+
+
+class FakeRegistry:
+    """Returns one probability row per clip, or `rows_per_clip` rows to mimic a reshaping model."""
+
+    def __init__(self, rows_per_clip=1, num_classes=len(config.CLASS_NAMES)):
+        self.rows_per_clip = rows_per_clip
+        self.num_classes = num_classes
+        self.batches = []
+
+    def predict_clips(self, clips):
+        self.batches.append(len(clips))
+        return torch.full((len(clips) * self.rows_per_clip, self.num_classes), 1.0 / self.num_classes)
+
+
+def test_iter_windows_starts_and_tail():
+    windows = list(iter_windows(make_frames(44), window=16, stride=8))
+    starts = [start for start, _ in windows]
+    # 0 to 24 fall on the stride; a final window is aligned to the end of the stream
+    assert starts == [0, 8, 16, 24, 28]
+    for start, frames in windows:
+        assert frames.shape == (16, 8, 8, 3)
+        assert frames[0, 0, 0, 0] == start
+        assert frames[-1, 0, 0, 0] == start + 15
+
+
+def test_iter_windows_no_duplicate_tail_when_aligned():
+    starts = [start for start, _ in iter_windows(make_frames(32), window=16, stride=8)]
+    assert starts == [0, 8, 16]
+
+
+def test_iter_windows_pads_short_stream():
+    windows = list(iter_windows(make_frames(5), window=16, stride=8))
+    assert len(windows) == 1
+    start, frames = windows[0]
+    assert start == 0
+    assert frames.shape[0] == 16
+    assert (frames[5:, 0, 0, 0] == 4).all()
+
+
+def test_iter_windows_empty_stream():
+    assert list(iter_windows([], window=16, stride=8)) == []
+
+
+def test_score_windows_yields_one_score_per_window():
+    windows = list(iter_windows(make_frames(100), window=config.CLIP_LEN, stride=4))
+    registry = FakeRegistry()
+    scored = list(score_windows(windows, registry, batch_size=8))
+    assert [start for start, _ in scored] == [start for start, _ in windows]
+    assert all(probs.shape == (len(config.CLASS_NAMES),) for _, probs in scored)
+    assert sum(registry.batches) == len(windows)
+
+
+def test_score_windows_rejects_mismatched_rows():
+    windows = iter_windows(make_frames(40), window=config.CLIP_LEN, stride=8)
+    with pytest.raises(RuntimeError):
+        list(score_windows(windows, FakeRegistry(rows_per_clip=2)))
+
+
+@pytest.mark.parametrize("window", [8, 32])
+def test_localize_rejects_other_window_lengths(window):
+    with pytest.raises(ValueError):
+        localize("unused.mp4", FakeRegistry(), window=window)
+
+
+def segment(start, end, crime_type="Assault", confidence=0.9, **extra):
+    return dict(start=start, end=end, crime_type=crime_type, confidence=confidence, **extra)
+
+
+def test_merge_segments_joins_overlapping_windows_of_one_class():
+    segments = [segment(0.0, 0.64), segment(0.32, 0.96, confidence=0.95), segment(0.64, 1.28, "Arson")]
+    incidents = merge_segments(segments, threshold=0.5)
+    assert incidents == [
+        {"start": 0.0, "end": 0.96, "crime_type": "Assault", "peak_confidence": 0.95},
+        {"start": 0.64, "end": 1.28, "crime_type": "Arson", "peak_confidence": 0.9},
+    ]
+
+
+def test_merge_segments_threshold_gap_and_skipped():
+    segments = [
+        segment(0.0, 1.0),
+        segment(1.0, 2.0, confidence=0.2),
+        segment(2.0, 3.0, crime_type=None, confidence=0.0, skipped=True),
+        segment(3.5, 4.0),
+    ]
+    assert len(merge_segments(segments, threshold=0.5, max_gap=0.0)) == 2
+    assert merge_segments(segments, threshold=0.5, max_gap=3.0) == [
+        {"start": 0.0, "end": 4.0, "crime_type": "Assault", "peak_confidence": 0.9},
+    ]
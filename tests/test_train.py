@@ -0,0 +1,38 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("cv2")
+
+from crime_detection import config
+from crime_detection.train import ClipAugment
+from crime_detection.utils.video_utils import frames_to_clip
+
+
+def make_clips(batch=3, frames=4, size=128, seed=0):
+    generator = torch.Generator().manual_seed(seed)
+    return torch.randint(0, 256, (batch, frames, 3, size, size), dtype=torch.uint8, generator=generator)
+
+
+def test_evaluation_matches_serving_preprocessing():
+    clips = make_clips()
+    inputs = ClipAugment(size=config.FRAME_SIZE)(clips, train=False)
+    assert inputs.shape == (3, 3, 4, config.FRAME_SIZE, config.FRAME_SIZE)
+    for clip, expected in zip(clips, inputs):
+        # Serving decodes [T, H, W, 3] frames and runs them through frames_to_clip
+        served = frames_to_clip(clip.permute(0, 2, 3, 1).numpy())
+        torch.testing.assert_close(expected, served)
+
+
+def test_training_crops_have_the_model_input_shape():
+    torch.manual_seed(0)
+    augment = ClipAugment(size=config.FRAME_SIZE)
+    for _ in range(5):
+        inputs = augment(make_clips(), train=True)
+        assert inputs.shape == (3, 3, 4, config.FRAME_SIZE, config.FRAME_SIZE)
+        assert torch.isfinite(inputs).all()
+
+
+def test_full_frame_training_crop_without_jitter_matches_serving():
+    clips = make_clips(size=config.FRAME_SIZE)
+    augment = ClipAugment(size=config.FRAME_SIZE, flip=0.0, brightness=0.0, contrast=0.0)
+    torch.testing.assert_close(augment(clips, train=True), augment(clips, train=False))
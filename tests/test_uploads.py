@@ -0,0 +1,139 @@
+import asyncio
+import hashlib
+import io
+import json
+import os
+
+import pytest
+
+from crime_detection.uploads import MaxBodySizeMiddleware, UploadTooLarge, download_to_tempfile, save_upload
+
+LIMIT = 100
+
+
+def call(app, body_chunks, headers=(), scope_type="http"):
+    """Run an ASGI app on a request made of body_chunks; returns (status, response body, messages received)."""
+    messages = [{"type": "http.request", "body": chunk, "more_body": i < len(body_chunks) - 1}
+                for i, chunk in enumerate(body_chunks)]
+    received, sent = [], []
+
+    async def receive():
+        message = messages.pop(0) if messages else {"type": "http.disconnect"}
+        received.append(message)
+        return message
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": scope_type, "method": "POST", "path": "/", "headers": list(headers)}
+    asyncio.run(app(scope, receive, send))
+    status = next((m["status"] for m in sent if m["type"] == "http.response.start"), None)
+    body = b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+    return status, body, received
+
+
+async def echo_app(scope, receive, send):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def swallowing_app(scope, receive, send):
+    """Turns any error while reading the body into its own 500, like a framework would."""
+    try:
+        await echo_app(scope, receive, send)
+    except Exception:
+        await send({"type": "http.response.start", "status": 500, "headers": []})
+        await send({"type": "http.response.body", "body": b"internal error"})
+
+
+async def rewrapping_app(scope, receive, send):
+    try:
+        await echo_app(scope, receive, send)
+    except Exception as e:
+        raise RuntimeError("body parsing failed") from e
+
+
+def test_small_bodies_pass_through():
+    status, body, _ = call(MaxBodySizeMiddleware(echo_app, max_bytes=LIMIT), [b"a" * 60, b"b" * 40],
+                           headers=[(b"content-length", b"100")])
+    assert status == 200
+    assert body == b"a" * 60 + b"b" * 40
+
+
+def test_declared_content_length_is_rejected_before_reading():
+    status, body, received = call(MaxBodySizeMiddleware(echo_app, max_bytes=LIMIT), [b"a" * 10],
+                                  headers=[(b"content-length", b"101")])
+    assert status == 413
+    assert "limit" in json.loads(body)["detail"]
+    assert received == []
+
+
+@pytest.mark.parametrize("app", [echo_app, swallowing_app, rewrapping_app])
+def test_chunked_bodies_are_cut_off_at_the_limit(app):
+    status, body, received = call(MaxBodySizeMiddleware(app, max_bytes=LIMIT), [b"a" * 60, b"b" * 60, b"c" * 60])
+    assert status == 413
+    assert b"internal error" not in body
+    assert len(received) == 2
+
+
+def test_errors_below_the_limit_are_not_masked():
+    async def failing_app(scope, receive, send):
+        await receive()
+        raise RuntimeError("handler bug")
+
+    with pytest.raises(RuntimeError):
+        call(MaxBodySizeMiddleware(failing_app, max_bytes=LIMIT), [b"a" * 10])
+
+
+def test_disabled_limit_and_other_scopes_pass_through():
+    status, body, _ = call(MaxBodySizeMiddleware(echo_app, max_bytes=None), [b"a" * 500])
+    assert status == 200
+    assert len(body) == 500
+
+    scopes = []
+
+    async def lifespan_app(scope, receive, send):
+        scopes.append(scope["type"])
+
+    asyncio.run(MaxBodySizeMiddleware(lifespan_app, max_bytes=LIMIT)({"type": "lifespan"}, None, None))
+    assert scopes == ["lifespan"]
+
+
+class FakeUpload:
+    def __init__(self, data):
+        self._data = io.BytesIO(data)
+
+    async def read(self, size):
+        return self._data.read(size)
+
+
+def test_save_upload_hashes_and_removes_oversized_files(tmp_path, monkeypatch):
+    monkeypatch.setattr("tempfile.tempdir", str(tmp_path))
+    data = os.urandom(1000)
+    path, digest, size = asyncio.run(save_upload(FakeUpload(data), max_bytes=1000, chunk_size=64))
+    with open(path, "rb") as f:
+        assert f.read() == data
+    assert digest == hashlib.sha256(data).hexdigest()
+    assert size == 1000
+    os.remove(path)
+
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(save_upload(FakeUpload(data), max_bytes=999, chunk_size=64))
+    assert os.listdir(tmp_path) == []
+
+
+def test_download_to_tempfile_enforces_the_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr("tempfile.tempdir", str(tmp_path))
+    path, digest, size = download_to_tempfile([b"ab", b"cd"], max_bytes=4)
+    assert (digest, size) == (hashlib.sha256(b"abcd").hexdigest(), 4)
+    os.remove(path)
+
+    with pytest.raises(UploadTooLarge):
+        download_to_tempfile([b"ab", b"cd", b"e"], max_bytes=4)
+    assert os.listdir(tmp_path) == []